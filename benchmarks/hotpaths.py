@@ -0,0 +1,221 @@
+"""
+Benchmarks of the decoding, conversion and resource construction hot paths.
+
+The stages of turning a data points response into resources are timed on synthetic Omnia-shaped payloads, without
+any web API access. Wall time, peak memory and retained memory blocks (still allocated when the stage returns, i.e.
+held by its result) of each stage are compared against the baseline stored in `baseline.json`. Temporary
+allocations show in the peak memory only.
+
+    python benchmarks/hotpaths.py --save                # store the results as the baseline
+    python benchmarks/hotpaths.py                       # compare with the baseline
+    python benchmarks/hotpaths.py --sizes 1000 10000    # fewer data points
+
+The exit status is 1 if any stage regressed beyond the tolerances. Wall times depend on the machine, and peak memory
+and retained blocks on the Python, numpy and pandas versions. The baseline is therefore not under version control,
+store one with `--save` on the machine the benchmarks are run on before comparing.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from omnia_timeseries_sdk._utils import decode_items, from_datetime_string, from_datetime_strings, \
+    make_serializable, to_snake_case
+from omnia_timeseries_sdk.resources import DataPoints, DataPointsList
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SIZES = (1000, 10000, 100000, 1000000)
+
+
+def make_payload(n: int, seed: int = 0):
+    """
+    Response body with `n` data points of one time series, as returned by the web API.
+
+    Parameters
+    ----------
+    n : int
+        Number of data points.
+    seed : int, optional
+        Seed of the random values, the payload is identical for equal seeds.
+
+    Returns
+    -------
+    bytes
+        JSON encoded response body.
+    """
+    rng = np.random.RandomState(seed)
+    steps = np.cumsum(rng.randint(1, 2000, size=n)).astype("timedelta64[ms]")
+    time = np.datetime64("2020-01-01T00:00:00", "ms") + steps
+    datapoints = [dict(time=t, value=v, status=192)
+                  for t, v in zip(np.datetime_as_string(time, unit="ms", timezone="UTC").tolist(),
+                                  rng.normal(100., 10., size=n).round(6).tolist())]
+    item = dict(id="c8f0a2f4-2f0b-4b6e-8a8b-3c4b1f1f5d2e", name="benchmark", unit="bar", datapoints=datapoints)
+    return json.dumps(dict(data=dict(items=[item]), continuationToken=None)).encode("utf-8")
+
+
+def make_inputs(n: int):
+    """Input of each stage, produced by running the preceding stages once."""
+    payload = make_payload(n)
+    raw = json.loads(payload)
+    item = decode_items(raw["data"]["items"])[0]
+    times = item["datapoints"]["time"]
+    dps = DataPoints(id=item["id"], name=item["name"], unit=item["unit"], time=from_datetime_strings(times),
+                     value=item["datapoints"]["value"], status=item["datapoints"]["status"])
+    dumped = dict(dps.dump(), time=dps.time, value=dps.value, status=dps.status)
+    return dict(payload=payload, raw=raw, item=item, times=times, parsed=from_datetime_strings(times), dps=dps,
+                dumped=dumped)
+
+
+# stages of the data points path, each taking the stage inputs
+STAGES = OrderedDict([
+    ("json.loads", lambda x: json.loads(x["payload"])),
+    ("to_snake_case", lambda x: to_snake_case(x["raw"]["data"]["items"])),
+    ("decode_items", lambda x: decode_items(x["raw"]["data"]["items"])),
+    ("from_datetime_string", lambda x: [from_datetime_string(_) for _ in x["times"]]),
+    ("from_datetime_strings", lambda x: from_datetime_strings(x["times"])),
+    ("DataPoints.__init__", lambda x: DataPoints(id=x["item"]["id"], name=x["item"]["name"], unit=x["item"]["unit"],
+                                                 time=x["parsed"], value=x["item"]["datapoints"]["value"],
+                                                 status=x["item"]["datapoints"]["status"])),
+    ("DataPointsList.to_pandas", lambda x: DataPointsList([x["dps"]]).to_pandas()),
+    ("make_serializable", lambda x: make_serializable(dict(x["dumped"]))),   # converts the dict in place
+])
+
+
+def measure(stage, inputs: dict, repeat: int):
+    """
+    Measure a stage.
+
+    Parameters
+    ----------
+    stage : Callable
+        Stage taking the inputs.
+    inputs : dict
+        Stage inputs, see `make_inputs`.
+    repeat : int
+        Number of timed runs.
+
+    Returns
+    -------
+    dict
+        Fastest wall time ('time', seconds), peak traced memory ('peak', bytes) and number of memory blocks
+        allocated by the stage which are still alive when it returns, i.e. held by its result ('retained').
+    """
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        timings = list()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = stage(inputs)
+            timings.append(time.perf_counter() - start)
+            del result
+    finally:
+        if enabled:
+            gc.enable()
+
+    # separate run, tracing slows the stage down
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = stage(inputs)
+        peak = tracemalloc.get_traced_memory()[1]
+        retained = sum(_.count for _ in tracemalloc.take_snapshot().statistics("filename"))
+    finally:
+        tracemalloc.stop()
+    del result
+
+    return dict(time=min(timings), peak=peak, retained=retained)
+
+
+def compare(results: dict, baseline: dict, time_tolerance: float, memory_tolerance: float, min_time: float = 0.):
+    """
+    Stages which regressed compared to the baseline.
+
+    Parameters
+    ----------
+    results, baseline : dict
+        Measurements per stage and size.
+    time_tolerance, memory_tolerance : float
+        Allowed relative increase of wall time, and of peak memory and retained blocks.
+    min_time : float, optional
+        Increases of wall time (seconds) smaller than this are regarded as noise.
+
+    Returns
+    -------
+    List[str]
+        Description of each regression.
+    """
+    regressions = list()
+    for name, sizes in results.items():
+        for size, m in sizes.items():
+            b = baseline.get(name, dict()).get(size)
+            if b is None:
+                continue
+            for key, tolerance in (("time", time_tolerance), ("peak", memory_tolerance),
+                                   ("retained", memory_tolerance)):
+                if key not in b or (key == "time" and m[key] - b[key] < min_time):
+                    continue
+                if b[key] > 0 and m[key] > b[key] * (1. + tolerance):
+                    regressions.append(f"{name} ({size} data points): {key} {m[key]:.4g} > {b[key]:.4g} "
+                                       f"(+{100. * (m[key] / b[key] - 1.):.0f} %)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark decoding, conversion and resource construction.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="numbers of data points")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES), help="stages to run")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs of each stage")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline file")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.5, help="allowed relative increase of wall time")
+    parser.add_argument("--min-time", type=float, default=0.001,
+                        help="increases of wall time (seconds) regarded as noise")
+    parser.add_argument("--memory-tolerance", type=float, default=0.1,
+                        help="allowed relative increase of peak memory and retained blocks")
+    args = parser.parse_args(argv)
+
+    results = OrderedDict((name, OrderedDict()) for name in args.stages)
+    print(f"{'stage':<26}{'data points':>12}{'time (ms)':>12}{'peak (MiB)':>12}{'retained':>10}")
+    for n in args.sizes:
+        inputs = make_inputs(n)
+        for name in args.stages:
+            m = measure(STAGES[name], inputs, args.repeat)
+            results[name][str(n)] = m
+            print(f"{name:<26}{n:>12}{1e3 * m['time']:>12.2f}{m['peak'] / 2 ** 20:>12.2f}{m['retained']:>10}")
+        del inputs
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(dict(python=platform.python_version(), numpy=np.__version__, pandas=pd.__version__,
+                           machine=platform.machine(), results=results), f, indent=2)
+        print(f"Stored baseline {args.baseline}.")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline {args.baseline}, store one with --save.")
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline["results"], args.time_tolerance, args.memory_tolerance,
+                          min_time=args.min_time)
+    versions = (platform.python_version(), np.__version__, pd.__version__)
+    if versions != (baseline.get("python"), baseline.get("numpy"), baseline.get("pandas")):
+        print(f"The baseline was stored with Python {baseline.get('python')}, numpy {baseline.get('numpy')} and "
+              f"pandas {baseline.get('pandas')}, memory measurements may differ.")
+
+    for r in regressions:
+        print(f"REGRESSION {r}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,27 @@
 """
 Python SDK for Omnia Timeseries API
 """
-from pkg_resources import get_distribution, DistributionNotFound
 from .client import OmniaClient
+from .aio import AsyncOmniaClient
 
 
-# version at runtime from distribution/package info
-__version__ = get_distribution("omnia_timeseries_sdk").version
+def __getattr__(name):
+    # version at runtime from distribution/package info, resolved on first access as the lookup is slow (PEP 562)
+    if name != "__version__":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        # Python 3.7
+        from pkg_resources import get_distribution, DistributionNotFound as PackageNotFoundError
+
+        def version(name):
+            return get_distribution(name).version
+
+    try:
+        v = version("omnia_timeseries_sdk")
+    except PackageNotFoundError:
+        v = "unknown"
+    globals()["__version__"] = v
+    return v
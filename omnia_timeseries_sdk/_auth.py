@@ -0,0 +1,184 @@
+"""
+Access token management.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from .exceptions import OmniaAuthenticationError
+
+EXPIRY_SKEW = 30.   # seconds a token is regarded expired before its actual expiry, allowing for clock skew
+
+
+class TokenManager(object):
+    """
+    Acquire access tokens, hold them in memory and refresh them before they expire.
+
+    Parameters
+    ----------
+    authority : str
+        Identity provider URL.
+    resource_id : str
+        Omnia resource identifier.
+    client_id : str
+        Client identifier.
+    client_secret : str, optional
+        Shared secret for service-to-service authentication. Authenticates by user impersonation (device code) if
+        not given.
+    refresh_margin : float, optional
+        Time (seconds) before expiry the token is refreshed in the background.
+    shared_cache : SharedCache, optional
+        Cache shared with other processes. A token acquired by one process is reused by the others, and only one
+        process at a time acquires a token.
+
+    Notes
+    -----
+    The token is shared by all threads of the client. Only one thread acquires a token at a time while the others
+    wait for it, and a valid token is returned without locking. Tokens are refreshed in the background
+    `refresh_margin` seconds before they expire, using the refresh token for user impersonation, so requests do
+    not stall on authentication.
+
+    """
+    def __init__(self, authority: str, resource_id: str, client_id: str, client_secret: str = None,
+                 refresh_margin: float = 300., shared_cache=None):
+        self.authority = authority
+        self.resource_id = resource_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self.shared_cache = shared_cache
+        self._token = None
+        self._rejected = None
+        self._refresh_token = None
+        self._expires_on = 0.
+        self._lock = threading.Lock()
+        self._timer = None
+
+    @property
+    def expires_on(self):
+        """float: Expiry of the current token (seconds since epoch), 0 if there is no token."""
+        return self._expires_on
+
+    def get_token(self):
+        """
+        Valid access token, acquired if missing or expired.
+
+        Returns
+        -------
+        str
+            Access token.
+
+        Raises
+        ------
+        OmniaAuthenticationError
+            If a token cannot be acquired.
+        """
+        token, expires_on = self._token, self._expires_on
+        if token is not None and time.time() < expires_on - EXPIRY_SKEW:
+            return token
+
+        with self._lock:
+            # another thread may have acquired a token while waiting for the lock
+            if self._token is None or time.time() >= self._expires_on - EXPIRY_SKEW:
+                self._acquire(refresh=False)
+            return self._token
+
+    def invalidate(self):
+        """Drop the current token, e.g. if it was rejected by the web API."""
+        with self._lock:
+            self._rejected = self._token
+            self._token = None
+            self._expires_on = 0.
+
+    def close(self):
+        """Cancel background refresh."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _acquire(self, refresh: bool):
+        """Acquire a new token and schedule its refresh. Call with `_lock` held."""
+        if self.shared_cache is None:
+            return self._authenticate(refresh)
+
+        key = f"token:{self.authority}:{self.resource_id}:{self.client_id}"
+        with self.shared_cache.lock(key):
+            # another process may have acquired a new token in the meantime
+            shared = self.shared_cache.get(key)
+            if (shared is not None and shared["token"] not in (self._token, self._rejected) and
+                    time.time() < shared["expires_on"] - EXPIRY_SKEW):
+                logging.debug("Reusing access token acquired by another process.")
+                self._token, self._expires_on = shared["token"], shared["expires_on"]
+                self._schedule_refresh()
+                return
+
+            self._authenticate(refresh)
+            if self._token is not None and self._token != self._rejected:
+                self.shared_cache.set(key, dict(token=self._token, expires_on=self._expires_on),
+                                      ttl=self._expires_on - time.time())
+
+    def _authenticate(self, refresh: bool):
+        """Acquire a new token from the identity provider and schedule its refresh. Call with `_lock` held."""
+        import adal     # loaded on first use, it is slow to import
+        context = adal.AuthenticationContext(self.authority)
+        try:
+            if self.client_secret is not None:
+                logging.info("Authenticating with shared client secret (service-to-service).")
+                data = context.acquire_token_with_client_credentials(self.resource_id, self.client_id,
+                                                                     self.client_secret)
+            elif self._refresh_token is not None:
+                logging.debug("Refreshing access token.")
+                data = context.acquire_token_with_refresh_token(self._refresh_token, self.client_id, self.resource_id)
+            elif refresh:
+                # user interaction is needed, leave it to the next request
+                return
+            else:
+                logging.info("Authenticating by user impersonation without any shared secret.")
+                code = context.acquire_user_code(self.resource_id, self.client_id)
+                print(f"\nUSER INTERACTION REQUIRED\n{code['message']}\n")
+                data = context.acquire_token_with_device_code(self.resource_id, code, self.client_id)
+        except adal.adal_error.AdalError:
+            if self.client_secret is None and self._refresh_token is not None and not refresh:
+                # the refresh token has expired, authenticate by user impersonation instead
+                self._refresh_token = None
+                return self._authenticate(refresh=False)
+
+            logging.error("Unable to acquire a valid access token.", exc_info=True)
+            if refresh:
+                return
+            raise OmniaAuthenticationError()
+
+        self._token = data.get("accessToken")
+        self._refresh_token = data.get("refreshToken", self._refresh_token)
+        self._expires_on = _expires_on(data)
+        logging.debug("Acquired valid access token.")
+        self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        """Refresh the token in the background before it expires. Call with `_lock` held."""
+        if self._timer is not None:
+            self._timer.cancel()
+
+        delay = self._expires_on - self.refresh_margin - time.time()
+        if delay <= 0:
+            self._timer = None
+            return
+
+        self._timer = threading.Timer(delay, self._refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _refresh(self):
+        with self._lock:
+            self._timer = None
+            self._acquire(refresh=True)
+
+
+def _expires_on(data: dict):
+    """Expiry (seconds since epoch) of acquired token."""
+    if data.get("expiresIn") is not None:
+        return time.time() + float(data["expiresIn"])
+
+    # adal reports local time
+    return datetime.strptime(data.get("expiresOn"), "%Y-%m-%d %H:%M:%S.%f").timestamp()
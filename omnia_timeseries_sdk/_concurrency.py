@@ -0,0 +1,197 @@
+"""
+Concurrent execution helpers.
+"""
+import logging
+import threading
+import time
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+
+ON_ERROR_POLICIES = ("raise", "skip", "collect")
+
+
+def map_concurrently(func: Callable, items: Iterable, max_workers: int = 8, on_error: str = "raise"):
+    """
+    Apply function to items on a pool of threads, keeping the order of the items.
+
+    Parameters
+    ----------
+    func : Callable
+        Function taking a single item.
+    items : Iterable
+        Items to apply the function to.
+    max_workers : int, optional
+        Maximum number of threads. Items are processed sequentially if 1.
+    on_error : {'raise', 'skip', 'collect'}, optional
+        Failure policy. 'raise' re-raises the first failure (in item order), 'skip' logs and leaves out failed
+        items and 'collect' leaves out failed items and returns their errors. Defaults to 'raise'.
+
+    Returns
+    -------
+    tuple
+        List of results of the successful items in input order and list of (item, exception) for failed items.
+
+    """
+    if on_error not in ON_ERROR_POLICIES:
+        raise ValueError(f"Invalid failure policy '{on_error}'. Choose one of {', '.join(ON_ERROR_POLICIES)}.")
+
+    items = list(items)
+
+    def call(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            if on_error == "raise":
+                raise
+            return None, e
+
+    if max_workers is None or max_workers <= 1 or len(items) <= 1:
+        outcomes = [call(item) for item in items]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+            futures = [executor.submit(call, item) for item in items]
+            outcomes = [f.result() for f in futures]
+
+    results, errors = list(), list()
+    for item, (result, error) in zip(items, outcomes):
+        if error is None:
+            results.append(result)
+        else:
+            if on_error == "skip":
+                logging.warning(f"Skipping '{item}' which failed. {error}")
+            errors.append((item, error))
+
+    return results, errors
+
+
+class AdaptiveConcurrencyLimiter(object):
+    """
+    Limit the number of concurrent requests, adapting the limit to server latency and throttling (AIMD).
+
+    Parameters
+    ----------
+    initial_limit : int, optional
+        Initial number of concurrent requests.
+    min_limit : int, optional
+        Lower bound of the limit.
+    max_limit : int, optional
+        Upper bound of the limit.
+    decrease_factor : float, optional
+        Factor the limit is multiplied with on throttling or latency spikes.
+    latency_tolerance : float, optional
+        Latency above this multiple of the median latency is regarded as a spike.
+    window : int, optional
+        Number of recent latencies kept for the median and percentiles.
+
+    Notes
+    -----
+    The limit grows additively, by one for every `limit` successful requests, while latency stays flat. It is cut
+    multiplicatively when a request is throttled (429 or 503) or its latency spikes. Requests started before the last
+    decrease do not trigger another one, so a burst of failures only cuts the limit once. Latency should be the time
+    to the first byte of the response, the time spent downloading the body depends on its size rather than on load.
+
+    Usage
+        start = limiter.acquire()
+        ... carry out request ...
+        limiter.release(start, latency=..., throttled=..., failed=...)
+
+    """
+    def __init__(self, initial_limit: int = 8, min_limit: int = 1, max_limit: int = 64, decrease_factor: float = 0.5,
+                 latency_tolerance: float = 3., window: int = 200):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("The limits must satisfy 1 <= min_limit <= initial_limit <= max_limit.")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._latencies = deque(maxlen=window)
+        self._last_decrease = float("-inf")
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        """int: Current maximum number of concurrent requests."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        """int: Number of requests in flight."""
+        return self._in_flight
+
+    def acquire(self):
+        """
+        Wait until a request may be started.
+
+        Returns
+        -------
+        float
+            Start time, to be passed on to `release`.
+        """
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+            return time.monotonic()
+
+    def release(self, start: float, latency: float = None, throttled: bool = False, failed: bool = False):
+        """
+        Register a completed request and adapt the limit.
+
+        Parameters
+        ----------
+        start : float
+            Start time returned by `acquire`.
+        latency : float, optional
+            Request latency in seconds. Defaults to the time since `start`.
+        throttled : bool, optional
+            Whether the server throttled the request or was unavailable.
+        failed : bool, optional
+            Whether the request failed without a response, e.g. on connection errors. Frees the slot without adapting
+            the limit.
+        """
+        latency = time.monotonic() - start if latency is None else latency
+        with self._condition:
+            self._in_flight -= 1
+            if failed:
+                self._condition.notify_all()
+                return
+
+            spike = (len(self._latencies) >= 10 and
+                     latency > self.latency_tolerance * float(np.median(self._latencies)))
+            if not throttled:
+                self._latencies.append(latency)
+
+            if throttled or spike:
+                if start > self._last_decrease:
+                    self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+                    self._last_decrease = time.monotonic()
+                    logging.debug(f"Concurrency limit decreased to {self.limit}.")
+            else:
+                self._limit = min(float(self.max_limit), self._limit + 1. / self._limit)
+
+            self._condition.notify_all()
+
+    def latency_percentiles(self, percentiles: tuple = (50, 90, 99)):
+        """
+        Percentiles of recent request latencies.
+
+        Parameters
+        ----------
+        percentiles : tuple, optional
+            Percentiles to compute, between 0 and 100.
+
+        Returns
+        -------
+        dict
+            Latency in seconds per percentile, empty if no requests have completed.
+        """
+        with self._condition:
+            latencies = list(self._latencies)
+
+        if not latencies:
+            return dict()
+        return dict(zip(percentiles, np.percentile(latencies, percentiles).tolist()))
@@ -6,13 +6,43 @@ import os
 
 class Config(object):
     datetime_format = "%Y-%m-%dT%H:%M:%S.%fZ"  # example datetime string "2019-10-14T09:46:49.606Z"
-    host = "api.gateway.equinor.com"
+    host = "api.gateway.equinor.com"   # optionally with port like 'localhost:8080'
+    scheme = "https"            # 'http' for local test servers, see mock_server
+    authenticate = True         # acquire access tokens from the identity provider, disable for local test servers
     base_url = "plant"
     idp_base_url = "login.microsoftonline.com"
     idp_tenant = os.getenv("EquinorAzureADTenantId", "3aa4a235-b6e2-48d5-9195-7fcf05b459b0")
     default_resource_id = "141369bd-3dca-4b55-825b-56ad4a69b1fc"
     default_client_id = "67da184b-6bde-43fd-a155-30ed4ff162d2"
     log_level = "info"
+    trace_body_length = 1000    # characters of request and response bodies included in debug traces, None for all
+    token_refresh_margin = 300.  # seconds before expiry the access token is refreshed in the background
+    pool_maxsize = 10           # maximum number of idle connections kept per host
+    pool_idle_timeout = 60.     # seconds before an idle connection is closed instead of reused
+    timeout = None              # socket timeout in seconds, None means the global default
+    async_max_concurrency = 32  # maximum number of concurrent requests from AsyncOmniaClient
+    max_workers = 8             # default number of threads when fanning out requests over multiple time series
+    max_retries = 3             # retries of throttled (429) or transiently failing requests, 0 disables retries
+    retry_backoff_factor = 0.5  # base delay in seconds of the exponential backoff (with jitter) between retries
+    retry_max_backoff = 30.     # maximum delay in seconds between retries, also caps delays requested by the server
+    retry_statuses = (429, 500, 502, 503, 504)  # status codes retried for idempotent requests
+    adaptive_concurrency = True         # adapt the number of concurrent requests to server latency and throttling
+    concurrency_initial_limit = 8       # initial number of concurrent requests
+    concurrency_min_limit = 1           # lower bound of the adaptive concurrency limit
+    concurrency_max_limit = 64          # upper bound of the adaptive concurrency limit
+    write_batch_size = 50000            # maximum number of datapoints per write request
+    write_max_body_size = 10 * 2 ** 20  # maximum size (bytes) of a write request body
+    writer_flush_size = 10000           # buffered writer flushes when this many datapoints are buffered
+    writer_flush_interval = 5.          # buffered writer flushes at least this often (seconds)
+    writer_max_buffer = 1000000         # maximum number of datapoints held by the buffered writer
+    spool_segment_size = 16 * 2 ** 20   # write spool starts a new segment file beyond this size (bytes)
+    spool_drain_interval = 1.           # seconds between attempts to drain an empty or failing write spool
+    datapoint_cache_dir = None          # directory of the on-disk datapoint cache, None disables the cache
+    datapoint_cache_max_age = 60.       # seconds recent cached datapoints are trusted before being fetched again
+    datapoint_cache_settle_time = 3600.  # datapoints older than this (seconds) when fetched are cached for good
+    metadata_cache_ttl = 300.           # seconds time series metadata are cached
+    metadata_cache_maxsize = 10000      # maximum number of cached time series metadata, 0 disables the cache
+    shared_cache_dir = None             # directory of token and metadata cache shared by processes, None disables
 
 
 class TestConfig(Config):
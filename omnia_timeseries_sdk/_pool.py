@@ -0,0 +1,191 @@
+"""
+HTTP connection pooling.
+"""
+import http.client
+import logging
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from .exceptions import OmniaClientConnectionError
+
+# errors indicating that a kept-alive socket was closed by the server while idling in the pool
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError,
+                           BrokenPipeError, ConnectionAbortedError)
+
+# timings holds the time (seconds) spent connecting, waiting for the response and downloading the body
+Response = namedtuple("Response", ["status", "reason", "headers", "data", "timings"], defaults=(None,))
+
+
+class ConnectionPool(object):
+    """
+    Thread-safe pool of reusable HTTP(S) connections kept per host.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Maximum number of idle connections kept per host. More connections may be open concurrently, but surplus
+        connections are closed instead of returned to the pool.
+    idle_timeout : float, optional
+        Idle connections older than this (seconds) are closed instead of reused.
+    timeout : float, optional
+        Socket timeout (seconds) of new connections. Defaults to the global default socket timeout.
+    connection_class : type, optional
+        Connection factory, defaults to http.client.HTTPSConnection.
+
+    Notes
+    -----
+    Connections are handed out last-in-first-out, so the warmest connection is reused first and the surplus ages
+    out. A request on a reused connection which fails because the server has closed the socket is transparently
+    retried once on a fresh connection.
+
+    """
+    def __init__(self, maxsize: int = 10, idle_timeout: float = 60., timeout: float = None,
+                 connection_class=http.client.HTTPSConnection):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.connection_class = connection_class
+        self._idle = defaultdict(deque)  # host -> deque of (connection, time returned to pool)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(_) for _ in self._idle.values())
+
+    def _new_connection(self, host: str):
+        """Open a new connection."""
+        if self.timeout is None:
+            return self.connection_class(host)
+        else:
+            return self.connection_class(host, timeout=self.timeout)
+
+    def get(self, host: str):
+        """
+        Check out a connection to host, reusing an idle one if available.
+
+        Parameters
+        ----------
+        host : str
+            Host name, optionally with port like 'localhost:8080'.
+
+        Returns
+        -------
+        tuple
+            Connection and a flag telling whether it was reused from the pool.
+        """
+        expired = list()
+        connection = None
+        with self._lock:
+            idle = self._idle[host]
+            now = time.monotonic()
+            # evict connections that have idled for too long, the oldest are to the left
+            while idle and now - idle[0][1] > self.idle_timeout:
+                expired.append(idle.popleft()[0])
+            if idle:
+                connection = idle.pop()[0]
+
+        for c in expired:
+            c.close()
+
+        if connection is not None:
+            return connection, True
+
+        try:
+            return self._new_connection(host), False
+        except Exception:
+            logging.error("Unable to create connection.", exc_info=True)
+            raise OmniaClientConnectionError()
+
+    def put(self, host: str, connection):
+        """
+        Return a connection to the pool. The connection is closed if the pool is full.
+
+        Parameters
+        ----------
+        host : str
+            Host name.
+        connection : http.client.HTTPConnection
+            Connection checked out from this pool.
+        """
+        with self._lock:
+            idle = self._idle[host]
+            if len(idle) < self.maxsize:
+                idle.append((connection, time.monotonic()))
+                return
+
+        connection.close()
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            connections = [c for idle in self._idle.values() for c, _ in idle]
+            self._idle.clear()
+
+        for c in connections:
+            c.close()
+
+    def request(self, host: str, method: str, url: str, body=None, headers: dict = None):
+        """
+        Carry out a request on a pooled connection and read the full response.
+
+        Parameters
+        ----------
+        host : str
+            Host name.
+        method : str
+            Request method.
+        url : str
+            Request url (path and query).
+        body : str or bytes, optional
+            Request body.
+        headers : dict, optional
+            Request headers.
+
+        Returns
+        -------
+        Response
+            Status, reason, headers, the raw response body and timings of the request stages.
+
+        Raises
+        ------
+        OmniaClientConnectionError
+            If the request fails on a fresh connection.
+        """
+        headers = dict() if headers is None else headers
+        while True:
+            connection, reused = self.get(host)
+            try:
+                start = time.perf_counter()
+                if not reused:
+                    # connect explicitly, which otherwise happens on the first request, to time it separately
+                    connection.connect()
+                sent = time.perf_counter()
+                connection.request(method, url, body=body, headers=headers)
+                r = connection.getresponse()
+                received = time.perf_counter()
+                data = r.read()
+                timings = dict(connect=sent - start, wait=received - sent, download=time.perf_counter() - received)
+            except STALE_CONNECTION_ERRORS:
+                connection.close()
+                if reused:
+                    logging.debug("Pooled connection was closed by server. Reconnecting...")
+                    continue
+                logging.error("Request failed", exc_info=True)
+                raise OmniaClientConnectionError()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                logging.error("Request failed", exc_info=True)
+                raise OmniaClientConnectionError()
+
+            if r.will_close:
+                connection.close()
+            else:
+                self.put(host, connection)
+
+            return Response(r.status, r.reason, r.headers, data, timings)
@@ -0,0 +1,144 @@
+"""
+Retry policy for throttled and transient request failures.
+"""
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+class RetryPolicy(object):
+    """
+    Retry policy with exponential backoff, full jitter and support for the Retry-After header.
+
+    Parameters
+    ----------
+    max_retries : int, optional
+        Maximum number of retries after the first attempt. Zero disables retries.
+    backoff_factor : float, optional
+        Base delay in seconds. The n'th retry waits a random time between 0 and `backoff_factor * 2 ** n` seconds.
+    max_backoff : float, optional
+        Upper limit of the delay in seconds, also applied to delays requested by the server through Retry-After.
+    statuses : tuple, optional
+        Response status codes which are retried for idempotent requests.
+    methods : tuple, optional
+        Idempotent request methods.
+
+    Notes
+    -----
+    Requests which are not idempotent are only retried on status 429 (Too Many Requests), which means the request
+    was rejected before it was processed. Requests which failed to connect are retried like status 503.
+
+    """
+    def __init__(self, max_retries: int = 3, backoff_factor: float = 0.5, max_backoff: float = 30.,
+                 statuses: tuple = (429, 500, 502, 503, 504), methods: tuple = IDEMPOTENT_METHODS):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+        self.methods = methods
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Create retry policy from client configuration.
+
+        Parameters
+        ----------
+        config : object
+            Client configuration.
+
+        Returns
+        -------
+        RetryPolicy
+            The retry policy.
+        """
+        return cls(max_retries=config.max_retries, backoff_factor=config.retry_backoff_factor,
+                   max_backoff=config.retry_max_backoff, statuses=config.retry_statuses)
+
+    def is_retryable(self, method: str, status: int = 503, idempotent: bool = None):
+        """
+        Tell whether a failed request may be retried.
+
+        Parameters
+        ----------
+        method : str
+            Request method.
+        status : int, optional
+            Response status code.
+        idempotent : bool, optional
+            Whether the request is idempotent. By default decided by the request method.
+
+        Returns
+        -------
+        bool
+            True if the request may be retried.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in self.methods
+
+        if idempotent:
+            return status in self.statuses
+        else:
+            return status == 429
+
+    def backoff(self, retry: int, retry_after: float = None):
+        """
+        Delay before the next attempt.
+
+        Parameters
+        ----------
+        retry : int
+            Retry number, starting at 0.
+        retry_after : float, optional
+            Delay in seconds requested by the server.
+
+        Returns
+        -------
+        float
+            Delay in seconds.
+        """
+        if retry_after is not None:
+            return min(max(retry_after, 0.), self.max_backoff)
+
+        return random.uniform(0., min(self.backoff_factor * 2 ** retry, self.max_backoff))
+
+    def sleep(self, seconds: float):
+        """Wait before next attempt."""
+        time.sleep(seconds)
+
+    @staticmethod
+    def parse_retry_after(value: str):
+        """
+        Parse the value of a Retry-After header.
+
+        Parameters
+        ----------
+        value : str
+            Delay in seconds or HTTP date.
+
+        Returns
+        -------
+        float
+            Delay in seconds, None if missing or invalid.
+        """
+        if value is None:
+            return None
+
+        try:
+            return float(value)
+        except ValueError:
+            pass
+
+        try:
+            t = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        if t is None:
+            return None
+        if t.tzinfo is None:
+            t = t.replace(tzinfo=timezone.utc)
+        return (t - datetime.now(tz=timezone.utc)).total_seconds()
@@ -0,0 +1,87 @@
+"""
+Level-gated tracing of requests and responses.
+"""
+import logging
+
+REDACTED = "[redacted]"
+SENSITIVE_HEADERS = ("authorization",)
+
+
+def enabled():
+    """bool: Whether traces are logged, i.e. the debug level is enabled."""
+    return logging.getLogger().isEnabledFor(logging.DEBUG)
+
+
+def redact_headers(headers: dict):
+    """Copy of headers with credentials replaced, keeping the authentication scheme e.g. 'Bearer [redacted]'."""
+    redacted = dict()
+    for k, v in headers.items():
+        if k.lower() in SENSITIVE_HEADERS and v:
+            scheme, _, credentials = str(v).partition(" ")
+            v = f"{scheme} {REDACTED}" if credentials else REDACTED
+        redacted[k] = v
+    return redacted
+
+
+def summarize_body(body, max_length: int):
+    """
+    Body shortened for logging.
+
+    Parameters
+    ----------
+    body : str or bytes
+        JSON encoded body.
+    max_length : int
+        Maximum number of characters kept, None keeps the whole body.
+
+    Returns
+    -------
+    str
+        The body, truncated and suffixed with its total size if longer than `max_length`. None if there is no body.
+    """
+    if body is None or len(body) == 0:
+        return None
+
+    size = len(body)
+    if max_length is not None and size > max_length:
+        body = body[:max_length]
+    else:
+        max_length = None
+
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+
+    return body if max_length is None else f"{body}... [{size} bytes]"
+
+
+def trace_request(method: str, url: str, headers: dict, body, max_length: int):
+    """
+    Log request at debug level.
+
+    The trace is passed on to log handlers as the record attribute 'trace', a dict with keys 'kind' ('request'),
+    'method', 'url', 'headers' (credentials redacted) and 'body' (summarized, see `summarize_body`).
+    """
+    if not enabled():
+        return
+
+    trace = dict(kind="request", method=method.upper(), url=url, headers=redact_headers(headers),
+                 body=summarize_body(body, max_length))
+    logging.debug("%s %s %s body=%s", trace["method"], trace["url"], trace["headers"], trace["body"],
+                  extra=dict(trace=trace))
+
+
+def trace_response(method: str, url: str, status: int, reason: str, headers: dict, body, max_length: int):
+    """
+    Log response at debug level.
+
+    The trace is passed on to log handlers as the record attribute 'trace', a dict with keys 'kind' ('response'),
+    'method', 'url', 'status', 'reason', 'headers', 'size' (bytes) and 'body' (summarized, see `summarize_body`).
+    """
+    if not enabled():
+        return
+
+    trace = dict(kind="response", method=method.upper(), url=url, status=status, reason=reason,
+                 headers=redact_headers(dict(headers or dict())), size=len(body or b""),
+                 body=summarize_body(body, max_length))
+    logging.debug("[%s] %s %s %s (%d bytes) body=%s", trace["status"], trace["reason"], trace["method"],
+                  trace["url"], trace["size"], trace["body"], extra=dict(trace=trace))
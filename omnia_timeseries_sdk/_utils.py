@@ -1,17 +1,22 @@
 """
 Utility functions
 """
+import json
 import numpy as np
 from collections import OrderedDict, defaultdict
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import uuid
 import re
+from functools import lru_cache
 from ._config import Config
 
 # compile regex for camel case to snake case
 first_cap_re = re.compile('(.)([A-Z][a-z]+)')
 all_cap_re = re.compile('([a-z0-9])([A-Z])')
 
+# compile regex splitting date time strings into date time, fraction of seconds and UTC offset
+datetime_string_re = re.compile(r"^([^.]*?)(\.\d+)?([+-]\d{2}:\d{2})?$")
+
 
 def make_serializable(d):
     """
@@ -70,6 +75,20 @@ def make_serializable(d):
     return d
 
 
+@lru_cache(maxsize=1024)
+def snake_case_key(s):
+    """Convert camelCase string to snake_case. Translations are memoized."""
+    s1 = first_cap_re.sub(r'\1_\2', s)
+    return all_cap_re.sub(r'\1_\2', s1).lower()
+
+
+@lru_cache(maxsize=1024)
+def camel_case_key(s):
+    """Convert snake_case string to lowerCamelCase. Translations are memoized."""
+    first, *others = s.split('_')
+    return ''.join([first.lower(), *map(str.title, others)])
+
+
 def to_snake_case(d):
     """
     Convert data with camelCase keys to snake_case
@@ -84,19 +103,15 @@ def to_snake_case(d):
     str or list or dict
         Data with snake case keys
     """
-    def snake(s):
-        s1 = first_cap_re.sub(r'\1_\2', s)
-        return all_cap_re.sub(r'\1_\2', s1).lower()
-
     if isinstance(d, str):
-        return snake(d)
+        return snake_case_key(d)
     elif isinstance(d, list):
         return [to_snake_case(_) for _ in d]
     elif isinstance(d, dict):
         dd = dict()
         for k, v in d.items():
             if isinstance(k, str):
-                k = snake(k)
+                k = snake_case_key(k)
 
             if isinstance(v, (list, dict)):
                 v = to_snake_case(v)
@@ -119,19 +134,15 @@ def to_camel_case(d):
     str or list or dict
         Data with camel case keys
     """
-    def camel(s):
-        first, *others = s.split('_')
-        return ''.join([first.lower(), *map(str.title, others)])
-
     if isinstance(d, str):
-        return camel(d)
+        return camel_case_key(d)
     elif isinstance(d, list):
         return [to_camel_case(_) for _ in d]
     elif isinstance(d, dict):
         dd = dict()
         for k, v in d.items():
             if isinstance(k, str):
-                k = camel(k)
+                k = camel_case_key(k)
 
             if isinstance(v, (list, dict)):
                 v = to_camel_case(v)
@@ -140,6 +151,87 @@ def to_camel_case(d):
         return dd
 
 
+def decode_items(items):
+    """
+    Decode items of a Timeseries API response.
+
+    Parameters
+    ----------
+    items : List[dict]
+        Items under 'data' in the response body.
+
+    Returns
+    -------
+    List[dict]
+        Items with snake case keys. Data point arrays under 'datapoints' are decoded into columns like
+        {'time': [...], 'value': [...], 'status': [...]} without converting the keys of each data point.
+
+    Notes
+    -----
+    The keys of data points are always 'time', 'value' and 'status', converting them point by point is expensive
+    for large responses.
+    """
+    decoded = list()
+    for item in items:
+        dps = item.get("datapoints") if isinstance(item, dict) else None
+        if dps is None:
+            decoded.append(to_snake_case(item))
+        else:
+            d = {snake_case_key(k): to_snake_case(v) if isinstance(v, (list, dict)) else v
+                 for k, v in item.items() if k != "datapoints"}
+            d["datapoints"] = decode_datapoints(dps)
+            decoded.append(d)
+
+    return decoded
+
+
+def decode_datapoints(dps):
+    """
+    Decode list of data points into columns.
+
+    Parameters
+    ----------
+    dps : List[dict]
+        Data points like [{'time': ..., 'value': ..., 'status': ...}, ...]
+
+    Returns
+    -------
+    dict
+        Columns like {'time': [...], 'value': [...], 'status': [...]}
+    """
+    return dict(
+        time=[dp.get("time") for dp in dps],
+        value=[dp.get("value") for dp in dps],
+        status=[dp.get("status") for dp in dps],
+    )
+
+
+def extend_items(results, items):
+    """
+    Extend decoded items with the decoded items of the next response page.
+
+    Parameters
+    ----------
+    results : List[dict]
+        Decoded items from previous pages, extended in place.
+    items : List[dict]
+        Decoded items of the next page.
+
+    Notes
+    -----
+    Data points of a time series spread over several pages are joined into the columns of the first item.
+    """
+    for item in items:
+        dps = item.get("datapoints") if isinstance(item, dict) else None
+        previous = next((_ for _ in results if isinstance(_, dict) and _.get("datapoints") is not None and
+                         _.get("id") == item.get("id")), None) if dps is not None else None
+        if previous is None:
+            results.append(item)
+        else:
+            for k, v in dps.items():
+                previous["datapoints"][k].extend(v)
+
+
 def to_omnia_datetime_string(d):
     """
     Convert date time object to formatted date time string.
@@ -147,15 +239,18 @@ def to_omnia_datetime_string(d):
     Parameters
     ----------
     d : datetime
-        Date time object
+        Date time object. Naive date times are assumed to be in UTC.
 
     Returns
     -------
     str
-        Formatted date time string.
+        Formatted date time string (UTC).
     """
     assert isinstance(d, datetime)
 
+    if d.tzinfo is not None:
+        d = d.astimezone(timezone.utc)
+
     return d.strftime(Config.datetime_format)
 
 
@@ -181,13 +276,304 @@ def from_datetime_string(s):
         2008-09-03T20:56:35.450686+05:00
         2008-09-03T20:56:35.450686-10:30
 
+    Date time strings without an offset give naive date time objects.
+
     """
     # datetime.fromisoformat() does not support Z as short notation for Zulu-time aka. +00:00
     s = s.replace("Z", "+00:00")
 
     # datetime.fromisoformat() and .strptime() does only handle 0, 3 or 6 decimal places (microseconds) but I frequently
-    # encounter deviations like 7 decimals. Truncate datetime string to 26 characters (6 decimals).
-    dt, tz = s.split("+")
-    s = "+".join([dt[:26], tz])
+    # encounter deviations like 7 decimals. Truncate or pad the fraction to 6 decimals.
+    m = datetime_string_re.match(s)
+    if m is None:
+        raise ValueError(f"Invalid ISO RFC3339 formatted date time string '{s}'.")
+    dt, fraction, tz = m.groups()
+    if fraction is not None:
+        dt += fraction[:7].ljust(7, "0")
+
+    return datetime.fromisoformat(dt + (tz or ""))
+
+
+def from_datetime_strings(s):
+    """
+    Convert formatted date time strings to numpy datetime64[ns] array in UTC.
+
+    Parameters
+    ----------
+    s : List[str] or numpy.ndarray
+        ISO RFC3339 formatted date time strings
+
+    Returns
+    -------
+    numpy.ndarray
+        Date times as datetime64[ns] in UTC.
+
+    Notes
+    -----
+    Vectorized counterpart of `from_datetime_string`. The strings are processed as an array of ASCII characters,
+    the time zone designators (Z or offsets like +05:00 and -10:30) are cut off and the offsets subtracted after numpy
+    has parsed the local date times. Up to 9 decimal places are kept. Strings without time zone designator are
+    assumed to be in UTC.
+
+    """
+    # one byte per character, the array is a copy which is modified in place below
+    a = s.astype("S") if isinstance(s, np.ndarray) else np.array(s, dtype="S")
+    a = np.ascontiguousarray(a.ravel())
+    n = a.size
+    if n == 0 or a.itemsize == 0:
+        return np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+
+    # one row of zero padded characters per string
+    codes = a.view(np.uint8).reshape(n, -1)
+    length = np.count_nonzero(codes, axis=1)
+    rows = np.arange(n)
+
+    def char(position):
+        return codes[rows, np.maximum(position, 0)].astype(np.int64)
+
+    def digit(position):
+        return char(position) - ord("0")
+
+    zulu = np.isin(char(length - 1), (ord("Z"), ord("z")))
+    sign = char(length - 6)
+    offset = ~zulu & np.isin(sign, (ord("+"), ord("-"))) & (char(length - 3) == ord(":"))
+    minutes = np.where(offset, (digit(length - 5) * 10 + digit(length - 4)) * 60 + digit(length - 2) * 10 +
+                       digit(length - 1), 0)
+    minutes = np.where(sign == ord("-"), -minutes, minutes)
+
+    # cut off time zone designators (at most 6 characters) in place and parse the local date times
+    cut = np.where(zulu, length - 1, np.where(offset, length - 6, length))
+    for k in range(6):
+        position = cut + k
+        inside = position < length
+        codes[rows[inside], position[inside]] = 0
+    local = codes.view(a.dtype).ravel().astype("datetime64[ns]")
+
+    return local - minutes.astype("timedelta64[m]")
+
+
+def to_utc_datetime(t):
+    """
+    Convert date time string or object to timezone aware date time object in UTC.
+
+    Parameters
+    ----------
+    t : str or datetime
+        ISO RFC3339 formatted date time string or date time object. Naive date times are assumed to be in UTC.
+
+    Returns
+    -------
+    datetime
+        Date time object in UTC.
+    """
+    if isinstance(t, str):
+        t = from_datetime_string(t)
+
+    if t.tzinfo is None:
+        return t.replace(tzinfo=timezone.utc)
+    else:
+        return t.astimezone(timezone.utc)
+
+
+def to_datetime64_array(time):
+    """
+    Convert date times to numpy datetime64[ns] array in UTC.
+
+    Parameters
+    ----------
+    time : numpy.ndarray, pandas.Series, pandas.DatetimeIndex or List[Union[str, datetime]]
+        Numpy datetime64 array (assumed in UTC), pandas date times, ISO RFC3339 formatted date time strings or date
+        time objects. Naive date times are assumed to be in UTC.
+
+    Returns
+    -------
+    numpy.ndarray
+        Date times as datetime64[ns].
+    """
+    if hasattr(time, "to_numpy"):
+        # pandas Series or DatetimeIndex, convert time zone aware date times to UTC
+        if hasattr(time, "tz"):
+            if time.tz is not None:
+                time = time.tz_convert("UTC").tz_localize(None)
+        elif hasattr(time, "dt") and getattr(time.dt, "tz", None) is not None:
+            # Series methods act on the index, the accessor acts on the values
+            time = time.dt.tz_convert("UTC").dt.tz_localize(None)
+        time = time.to_numpy()
+
+    if isinstance(time, np.ndarray) and time.dtype.kind == "M":
+        return time.astype("datetime64[ns]", copy=False)
+
+    if (isinstance(time, np.ndarray) and time.dtype.kind == "U") or (len(time) > 0 and isinstance(time[0], str)):
+        return from_datetime_strings(time)
+
+    return np.array([to_utc_datetime(t).replace(tzinfo=None) if t is not None else None for t in time],
+                    dtype="datetime64[ns]")
+
+
+def to_value_array(value):
+    """
+    Convert data point values to numpy array.
+
+    Parameters
+    ----------
+    value : numpy.ndarray or list
+        Data point values.
+
+    Returns
+    -------
+    numpy.ndarray
+        Numeric values as float64, other values (e.g. strings or missing values) as object.
+    """
+    a = np.asarray(value)
+    if a.dtype.kind in "iuf":
+        return a.astype(np.float64, copy=False)
+    elif a.dtype.kind == "O":
+        return a
+    else:
+        return a.astype(object)
+
+
+def to_status_array(status):
+    """
+    Convert data point status codes to numpy array.
+
+    Parameters
+    ----------
+    status : numpy.ndarray or List[int]
+        Status codes.
+
+    Returns
+    -------
+    numpy.ndarray
+        Status codes as int32, or object if some are missing.
+    """
+    a = np.asarray(status)
+    if a.dtype.kind in "iu":
+        return a.astype(np.int32, copy=False)
+    elif a.dtype.kind == "f" and not np.isnan(a).any():
+        return a.astype(np.int32)
+    else:
+        return a.astype(object)
+
+
+def to_datapoint_arrays(time, value=None, status=None):
+    """
+    Convert datapoints to arrays for writing, dropping datapoints with missing value.
+
+    Parameters
+    ----------
+    time : Union[numpy.ndarray, pandas.Series, pandas.DataFrame, list]
+        Date times, see `to_datetime64_array`. Alternatively a pandas Series of values with a datetime index, or a
+        pandas DataFrame with a datetime index and columns 'value' and optionally 'status'.
+    value : Union[numpy.ndarray, pandas.Series, list], optional
+        Datapoint values. Not used if `time` is a pandas Series or DataFrame.
+    status : Union[numpy.ndarray, pandas.Series, list, int], optional
+        Datapoint status codes, or one status code for all datapoints. Defaults to 0.
+
+    Returns
+    -------
+    tuple
+        Time (datetime64[ns], UTC), value and status arrays of equal length.
+    """
+    if hasattr(time, "index") and hasattr(time, "to_numpy") and value is None:
+        # pandas Series or DataFrame indexed by time
+        if hasattr(time, "columns"):
+            status = time["status"] if "status" in time.columns and status is None else status
+            time, value = time.index, time["value"]
+        else:
+            time, value = time.index, time
+
+    if value is None:
+        raise ValueError("The datapoint values must be specified.")
+
+    t = to_datetime64_array(time)
+    v = to_value_array(value.to_numpy() if hasattr(value, "to_numpy") else value)
+    if status is None or np.ndim(status) == 0:
+        s = np.full(len(t), 0 if status is None else status, dtype=np.int32)
+    else:
+        s = to_status_array(status.to_numpy() if hasattr(status, "to_numpy") else status)
+
+    if not len(t) == len(v) == len(s):
+        raise ValueError("The number of items in `time`, `value` and `status` must be equal.")
+    if np.isnat(t).any():
+        raise ValueError("Date times must not be missing (NaT).")
+
+    missing = np.isnan(v) if v.dtype.kind == "f" else np.array([_ is None or _ != _ for _ in v], dtype=bool)
+    if missing.any():
+        t, v, s = t[~missing], v[~missing], s[~missing]
+
+    return t, v, s
+
+
+def from_datetime64(t):
+    """
+    Convert numpy datetime64 (UTC) to timezone aware date time object.
+
+    Parameters
+    ----------
+    t : numpy.datetime64
+        Date time.
+
+    Returns
+    -------
+    datetime
+        Date time object in UTC with microsecond resolution, None if not a time.
+    """
+    t = t.astype("datetime64[us]").item()
+    return t.replace(tzinfo=timezone.utc) if t is not None else None
+
+
+def to_builtin(v):
+    """Convert numpy scalar to the corresponding built-in Python type."""
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def to_datetime_strings(t):
+    """
+    Format date times as ISO RFC3339 date time strings in one vectorized pass.
+
+    Parameters
+    ----------
+    t : numpy.ndarray
+        Date times as datetime64 (UTC).
+
+    Returns
+    -------
+    numpy.ndarray
+        Formatted date time strings (UTC, microseconds), like `to_omnia_datetime_string`.
+    """
+    if np.isnat(t).any():
+        raise ValueError("Date times must not be missing (NaT).")
+    return np.datetime_as_string(t, unit="us", timezone="UTC")
+
+
+def encode_datapoints(time, value, status):
+    """
+    Encode datapoints as a JSON array of objects with time, value and status.
+
+    Parameters
+    ----------
+    time : numpy.ndarray
+        Date times as datetime64 (UTC).
+    value : numpy.ndarray
+        Values, see `to_value_array`.
+    status : numpy.ndarray
+        Status codes, see `to_status_array`.
+
+    Returns
+    -------
+    str
+        JSON array, equivalent to json.dumps of a list of dicts but without building them.
+    """
+    time = to_datetime_strings(time).tolist()
+    if value.dtype.kind == "f" and np.isfinite(value).all():
+        value = map(float.__repr__, value.tolist())
+    else:
+        value = map(json.dumps, value.tolist())
+    if status.dtype.kind in "iu":
+        status = map(int.__repr__, status.tolist())
+    else:
+        status = map(json.dumps, status.tolist())
 
-    return datetime.fromisoformat(s)
+    template = '{"time": "%s", "value": %s, "status": %s}'
+    return "[" + ", ".join(map(template.__mod__, zip(time, value, status))) + "]"
@@ -0,0 +1,195 @@
+"""
+Asyncio Omnia client.
+"""
+import asyncio
+import datetime
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from .client import OmniaClient
+from ._config import Config
+from .resources import TimeSeriesList
+
+
+class AsyncOmniaClient(object):
+    """
+    Asyncio entrypoint into Omnia Python SDK.
+
+    Parameters
+    ----------
+    config : object, optional
+        Client configuration (base url, IDP tenant, date-time format, logging level etc.)
+    max_concurrency : int, optional
+        Maximum number of requests in flight at once. Defaults to `config.async_max_concurrency`.
+
+    Notes
+    -----
+    Requests are carried out by a synchronous OmniaClient on a bounded pool of worker threads, so all coroutines
+    share one connection pool and one access token. Awaiting many coroutines at once, e.g. with asyncio.gather(),
+    fans out up to `max_concurrency` requests without blocking the event loop.
+
+    Resources returned by the coroutines (TimeSeries, DataPoints etc.) are bound to the synchronous client, their
+    methods are blocking.
+
+    See OmniaClient for authentication details.
+
+    """
+    def __init__(self, config=Config, max_concurrency: int = None):
+        self.config = config
+        self.max_concurrency = max_concurrency if max_concurrency is not None else config.async_max_concurrency
+        self.sync_client = OmniaClient(config=config)
+        # keep a warm connection for every concurrent request
+        self.sync_client._pool.maxsize = max(self.sync_client._pool.maxsize, self.max_concurrency)
+        self.time_series = AsyncTimeSeriesAPI(omnia_client=self)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                            thread_name_prefix="omnia-timeseries-sdk")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def _run(self, func, *args, **kwargs):
+        """Run blocking function on the worker threads."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _iterate(self, iterator):
+        """Iterate over blocking iterator on the worker threads."""
+        exhausted = object()
+        while True:
+            item = await self._run(next, iterator, exhausted)
+            if item is exhausted:
+                return
+            yield item
+
+    def close(self):
+        """Shut down worker threads and close pooled connections. Blocks until pending requests are done."""
+        self._executor.shutdown(wait=True)
+        self.sync_client.close()
+
+    async def aclose(self):
+        """Shut down worker threads and close pooled connections without blocking the event loop."""
+        # not on the worker threads, they are being shut down
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def delete(self, resource: str, version: str, endpoint: str, parameters: dict = None, body: dict = None):
+        """DELETE request. See OmniaClient.delete."""
+        return await self._run(self.sync_client.delete, resource, version, endpoint, parameters=parameters,
+                               body=body)
+
+    async def get(self, resource: str, version: str, endpoint: str, parameters: dict = None, body: dict = None):
+        """GET request. See OmniaClient.get."""
+        return await self._run(self.sync_client.get, resource, version, endpoint, parameters=parameters, body=body)
+
+    async def patch(self, resource: str, version: str, endpoint: str, parameters: dict = None, body: dict = None):
+        """PATCH request. See OmniaClient.patch."""
+        return await self._run(self.sync_client.patch, resource, version, endpoint, parameters=parameters,
+                               body=body)
+
+    async def post(self, resource: str, version: str, endpoint: str, parameters: dict = None, body: dict = None):
+        """POST request. See OmniaClient.post."""
+        return await self._run(self.sync_client.post, resource, version, endpoint, parameters=parameters, body=body)
+
+    async def put(self, resource: str, version: str, endpoint: str, parameters: dict = None, body: dict = None):
+        """PUT request. See OmniaClient.put."""
+        return await self._run(self.sync_client.put, resource, version, endpoint, parameters=parameters, body=body)
+
+
+class AsyncTimeSeriesAPI(object):
+    """
+    Asyncio Timeseries API client
+
+    Coroutine counterparts of the TimeSeriesAPI methods, see TimeSeriesAPI for documentation of the parameters.
+
+    Parameters
+    ----------
+    omnia_client : AsyncOmniaClient
+        Asyncio Omnia client
+    """
+    def __init__(self, omnia_client):
+        self._omnia_client = omnia_client
+
+    @property
+    def _api(self):
+        """TimeSeriesAPI: Synchronous timeseries API client."""
+        return self._omnia_client.sync_client.time_series
+
+    async def create(self, name: str, description: str = None, asset_id: str = None, unit: str = None,
+                     external_id: str = None, step: bool = False):
+        """Create a single timeseries object. See TimeSeriesAPI.create."""
+        return await self._omnia_client._run(self._api.create, name, description=description, asset_id=asset_id,
+                                             unit=unit, external_id=external_id, step=step)
+
+    async def update(self, id: str, name: str = None, description: str = None, asset_id: str = None,
+                     unit: str = None, external_id: str = None, step: bool = False):
+        """Update a single timeseries object. See TimeSeriesAPI.update."""
+        return await self._omnia_client._run(self._api.update, id, name=name, description=description,
+                                             asset_id=asset_id, unit=unit, external_id=external_id, step=step)
+
+    async def delete(self, id: str):
+        """Delete time series with given id. See TimeSeriesAPI.delete."""
+        return await self._omnia_client._run(self._api.delete, id)
+
+    async def list(self, name: str = None, external_id: str = None, asset_id: str = None, limit: int = None,
+                   skip: int = None, continuation_token: str = None):
+        """List over all timeseries. See TimeSeriesAPI.list."""
+        return await self._omnia_client._run(self._api.list, name=name, external_id=external_id, asset_id=asset_id,
+                                             limit=limit, skip=skip, continuation_token=continuation_token)
+
+    async def iter_list(self, name: str = None, external_id: str = None, asset_id: str = None, limit: int = None,
+                        skip: int = None):
+        """Iterate over all timeseries page by page. See TimeSeriesAPI.iter_list."""
+        pages = self._api.iter_list(name=name, external_id=external_id, asset_id=asset_id, limit=limit, skip=skip)
+        async for page in self._omnia_client._iterate(pages):
+            yield page
+
+    async def retrieve(self, id: str):
+        """Retrieve a single time series by id. See TimeSeriesAPI.retrieve."""
+        return await self._omnia_client._run(self._api.retrieve, id)
+
+    async def retrieve_multiple(self, ids: List[str]):
+        """Retrieve multiple time series by id concurrently. See TimeSeriesAPI.retrieve_multiple."""
+        timeseries = await asyncio.gather(*[self.retrieve(id) for id in ids])
+        return TimeSeriesList(list(timeseries), omnia_client=self._omnia_client.sync_client)
+
+    async def add_data(self, id: str, time: List, values: List, status: List, asynch: bool = False,
+                       batch_size: int = None, max_workers: int = None, on_error: str = "raise"):
+        """Add or update a timeseries' datapoints. See TimeSeriesAPI.add_data."""
+        return await self._omnia_client._run(self._api.add_data, id, time, values, status, asynch=asynch,
+                                             batch_size=batch_size, max_workers=max_workers, on_error=on_error)
+
+    async def add_data_on_multiple(self, data, status: int = 0, asynch: bool = False, batch_size: int = None,
+                                   max_workers: int = None, on_error: str = "raise"):
+        """Add or update datapoints on multiple timeseries. See TimeSeriesAPI.add_data_on_multiple."""
+        return await self._omnia_client._run(self._api.add_data_on_multiple, data, status=status, asynch=asynch,
+                                             batch_size=batch_size, max_workers=max_workers, on_error=on_error)
+
+    async def delete_data(self, id: str, start_time: str = None, end_time: str = None):
+        """Delete datapoints from a timeseries. See TimeSeriesAPI.delete_data."""
+        return await self._omnia_client._run(self._api.delete_data, id, start_time=start_time, end_time=end_time)
+
+    async def data(self, id: str, start_time: str = None, end_time: str = None, limit=None,
+                   include_outside_points: bool = False, chunk_size: datetime.timedelta = None,
+                   max_workers: int = None):
+        """Retrieves datapoints in a given time window. See TimeSeriesAPI.data."""
+        return await self._omnia_client._run(self._api.data, id, start_time=start_time, end_time=end_time,
+                                             limit=limit, include_outside_points=include_outside_points,
+                                             chunk_size=chunk_size, max_workers=max_workers)
+
+    async def iter_data(self, id: str, start_time: str = None, end_time: str = None, limit=None,
+                        include_outside_points: bool = False):
+        """Iterate over datapoints in a given time window page by page. See TimeSeriesAPI.iter_data."""
+        pages = self._api.iter_data(id, start_time=start_time, end_time=end_time, limit=limit,
+                                    include_outside_points=include_outside_points)
+        async for page in self._omnia_client._iterate(pages):
+            yield page
+
+    async def first_data(self, id: str, after_time: str = None):
+        """Retrieves the first data point of a time series. See TimeSeriesAPI.first_data."""
+        return await self._omnia_client._run(self._api.first_data, id, after_time=after_time)
+
+    async def latest_data(self, id: str, before_time: str = None):
+        """Retrieves the latest data point of a time series. See TimeSeriesAPI.latest_data."""
+        return await self._omnia_client._run(self._api.latest_data, id, before_time=before_time)
@@ -0,0 +1,541 @@
+"""
+Local caches.
+"""
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+import numpy as np
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable
+from .resources import DataPoints, TimeSeries
+from ._config import Config
+from ._utils import to_datetime64_array, to_datetime_strings, to_status_array, make_serializable
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, the shared cache works without locking
+    fcntl = None
+
+NS = 10 ** 9
+
+
+class DatapointCache(object):
+    """
+    On-disk cache of datapoints per time series which fetches only what is missing.
+
+    Parameters
+    ----------
+    directory : str
+        Directory holding one file per time series. Created if it does not exist.
+    max_age : float, optional
+        Time (seconds) recent datapoints are trusted after being fetched. Defaults to `datapoint_cache_max_age` in
+        the client configuration.
+    settle_time : float, optional
+        Datapoints which were older than this (seconds) when fetched are regarded final and never fetched again.
+        Defaults to `datapoint_cache_settle_time` in the client configuration.
+    fetch_limit : int, optional
+        Maximum number of datapoints per fetch. A gap holding more datapoints is fetched in several steps.
+
+    Notes
+    -----
+    The cache records which time intervals of a time series it holds. Requesting a time window fetches only the
+    gaps not yet covered and merges them in, so repeated queries of historical windows become local reads.
+
+    Recent datapoints may still change. The part of a cached interval later than `settle_time` before it was
+    fetched expires after `max_age` seconds and is fetched again when requested.
+
+    Writing or deleting datapoints through the same client invalidates the cached datapoints of the time series.
+
+        client.datapoint_cache = DatapointCache("~/.cache/omnia")
+        ts.data(start_time, end_time)
+
+    """
+    def __init__(self, directory: str, max_age: float = None, settle_time: float = None, fetch_limit: int = 100000):
+        self.directory = os.path.expanduser(directory)
+        self.max_age = Config.datapoint_cache_max_age if max_age is None else max_age
+        self.settle_time = Config.datapoint_cache_settle_time if settle_time is None else settle_time
+        self.fetch_limit = fetch_limit
+        self._lock = threading.Lock()       # guards the locks and invalidation counters below
+        self._locks = dict()                # id -> lock guarding the cache file of the time series
+        self._generations = dict()          # id -> number of invalidations, None for the whole cache
+        os.makedirs(self.directory, exist_ok=True)
+
+    def data(self, id: str, start_time, end_time, fetch: Callable, limit: int = None, omnia_client=None):
+        """
+        Datapoints of a time series in a time window, fetching the parts which are not cached.
+
+        Parameters
+        ----------
+        id : str
+            Time series id.
+        start_time : Union[str, datetime.datetime]
+            Start of the time window (inclusive).
+        end_time : Union[str, datetime.datetime]
+            End of the time window (exclusive).
+        fetch : Callable
+            Function fetching the datapoints of a time window from the web API. Called with start time, end time
+            (ISO RFC3339 formatted date time strings) and limit, returns DataPoints.
+        limit : int, optional
+            Maximum number of datapoints returned.
+        omnia_client : OmniaClient, optional
+            OMNIA client of the returned data points.
+
+        Returns
+        -------
+        DataPoints
+            Data points in the time window.
+        """
+        start, end = to_datetime64_array([start_time, end_time]).view(np.int64).tolist()
+        with self._series_lock(id):
+            entry = self._load(id)
+            generation = self._generation(id)
+        now = time.time()
+
+        # fetch without holding any lock, the fetch may itself fan out over threads reading the cache
+        fetched = list()
+        covered = self._covered(entry, now)
+        n, previous = 0, start  # datapoints from the window start up to the current gap
+        for gap_start, gap_end in _subtract(start, end, covered):
+            n += _count(entry["time"], covered, previous, gap_start)
+            previous = gap_end
+            while gap_start < gap_end and (limit is None or n < limit):
+                # the web API takes microseconds, round up to not fetch datapoints before the gap
+                window = -(-np.array([gap_start, gap_end]) // 1000) * 1000
+                window = to_datetime_strings(window.view("datetime64[ns]")).tolist()
+                step = self.fetch_limit if limit is None else min(self.fetch_limit, limit - n)
+                dps = fetch(window[0], window[1], step)
+                t = dps.time_array.view(np.int64)
+                # the window may hold more datapoints than fetched
+                fetched_end = max(int(t[-1]) + 1, gap_start + 1) if len(dps) >= step else gap_end
+                fetched.append((gap_start, fetched_end, dps))
+                gap_start = fetched_end
+                n += len(dps)
+            if limit is not None and n >= limit:
+                break   # the first `limit` datapoints of the window are covered
+
+        if fetched:
+            with self._series_lock(id):
+                # merge into the latest entry, other threads may have filled other gaps in the meantime
+                if generation == self._generation(id):
+                    entry = self._load(id)
+                for gap_start, gap_end, dps in fetched:
+                    entry = self._insert(entry, gap_start, gap_end, dps, now)
+                # datapoints fetched before an invalidation may be stale, return them but do not cache them
+                if generation == self._generation(id):
+                    self._save(id, entry)
+
+        i, j = np.searchsorted(entry["time"], [start, end])
+        if limit is not None:
+            j = min(j, i + limit)
+        return DataPoints(id=id, name=entry["name"], unit=entry["unit"],
+                          time=entry["time"][i:j].view("datetime64[ns]"), value=entry["value"][i:j],
+                          status=entry["status"][i:j], omnia_client=omnia_client)
+
+    def intervals(self, id: str):
+        """
+        Time intervals of a time series which are cached and not expired.
+
+        Parameters
+        ----------
+        id : str
+            Time series id.
+
+        Returns
+        -------
+        List[tuple]
+            Start (inclusive) and end (exclusive) of each interval as datetime64.
+        """
+        with self._series_lock(id):
+            entry = self._load(id)
+        return [(np.datetime64(s, "ns"), np.datetime64(e, "ns")) for s, e in self._covered(entry, time.time())]
+
+    def invalidate(self, id: str = None):
+        """
+        Remove cached datapoints.
+
+        Parameters
+        ----------
+        id : str, optional
+            Time series id. Removes all time series by default.
+        """
+        with self._lock:
+            self._generations[id] = self._generations.get(id, 0) + 1
+            ids = list(self._locks) if id is None else [id]
+
+        # remove under the series locks to not race with datapoints being saved
+        for _ in ids:
+            with self._series_lock(_):
+                self._remove(self._path(_))
+        if id is None:
+            for _ in os.listdir(self.directory):
+                if _.endswith(".npz"):
+                    self._remove(os.path.join(self.directory, _))
+
+    def _series_lock(self, id: str):
+        """Lock guarding the cache file of a time series."""
+        with self._lock:
+            return self._locks.setdefault(id, threading.Lock())
+
+    def _generation(self, id: str):
+        """Number of invalidations of a time series and of the whole cache, changes on every invalidation."""
+        with self._lock:
+            return self._generations.get(None, 0), self._generations.get(id, 0)
+
+    @staticmethod
+    def _remove(path: str):
+        """Remove a cache file if it exists."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _covered(self, entry: dict, now: float):
+        """Cached intervals with the expired recent parts cut off."""
+        covered = list()
+        for s, e, fetched in entry["intervals"]:
+            if now - fetched > self.max_age:
+                e = min(e, int((fetched - self.settle_time) * NS))
+            if s < e:
+                covered.append((s, e))
+        return covered
+
+    def _insert(self, entry: dict, start: int, end: int, dps: DataPoints, now: float):
+        """Replace the cached datapoints within [start, end) with fetched datapoints."""
+        t = dps.time_array.view(np.int64)
+        inside = (t >= start) & (t < end)
+        keep = (entry["time"] < start) | (entry["time"] >= end)
+        status = dps.status_array if dps.status_array is not None else to_status_array([None] * len(dps))
+
+        t = np.concatenate([entry["time"][keep], t[inside]])
+        order = np.argsort(t, kind="stable")
+        intervals = [(s, e, f) for s, e, f in entry["intervals"] if e <= start or s >= end] + \
+                    [(s, start, f) for s, e, f in entry["intervals"] if s < start < e] + \
+                    [(end, e, f) for s, e, f in entry["intervals"] if s < end < e] + \
+                    [(start, end, now)]
+
+        return dict(time=t[order],
+                    value=np.concatenate([entry["value"][keep], dps.value_array[inside]])[order],
+                    status=np.concatenate([entry["status"][keep], status[inside]])[order],
+                    intervals=self._coalesce(sorted(intervals)),
+                    name=dps.name if dps.name is not None else entry["name"],
+                    unit=dps.unit if dps.unit is not None else entry["unit"])
+
+    def _coalesce(self, intervals: list):
+        """Join adjacent intervals which hold only settled datapoints."""
+        result = list()
+        for s, e, f in intervals:
+            if result:
+                ps, pe, pf = result[-1]
+                if pe == s and pe <= (pf - self.settle_time) * NS and e <= (f - self.settle_time) * NS:
+                    result[-1] = (ps, e, max(pf, f))
+                    continue
+            result.append((s, e, f))
+        return result
+
+    def _path(self, id: str):
+        return os.path.join(self.directory, urllib.parse.quote(id, safe="") + ".npz")
+
+    def _load(self, id: str):
+        """Cached datapoints and intervals of a time series, empty if not cached."""
+        try:
+            with np.load(self._path(id), allow_pickle=False) as f:
+                intervals = [(int(s), int(e), float(fetched)) for (s, e), fetched in zip(f["intervals"], f["fetched"])]
+                return dict(time=f["time"], value=_unpack(f, "value"), status=_unpack(f, "status"),
+                            intervals=intervals, name=str(f["name"]) or None, unit=str(f["unit"]) or None)
+        except FileNotFoundError:
+            return dict(time=np.empty(0, dtype=np.int64), value=np.empty(0, dtype=np.float64),
+                        status=np.empty(0, dtype=np.int32), intervals=list(), name=None, unit=None)
+
+    def _save(self, id: str, entry: dict):
+        """Atomically replace the cached datapoints and intervals of a time series."""
+        intervals = entry["intervals"]
+        columns = dict(time=entry["time"],
+                       intervals=np.array([(s, e) for s, e, _ in intervals], dtype=np.int64).reshape(-1, 2),
+                       fetched=np.array([f for _, _, f in intervals], dtype=np.float64),
+                       name=np.array(entry["name"] or ""), unit=np.array(entry["unit"] or ""))
+        columns.update(_pack("value", entry["value"]))
+        columns.update(_pack("status", entry["status"]))
+
+        path = self._path(id)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, **columns)
+        os.replace(path + ".tmp", path)
+
+
+class MetadataCache(object):
+    """
+    In-memory cache of time series metadata with expiry (TTL) and least recently used eviction (LRU).
+
+    Parameters
+    ----------
+    ttl : float, optional
+        Time (seconds) a time series is cached. Defaults to `metadata_cache_ttl` in the client configuration.
+    maxsize : int, optional
+        Maximum number of cached time series, the least recently used are evicted. Defaults to
+        `metadata_cache_maxsize` in the client configuration.
+    shared_cache : SharedCache, optional
+        Cache shared with other processes, which is looked up on misses and updated along with this cache.
+
+    Notes
+    -----
+    Time series are cached by id and can be looked up by id or external id. The cache is filled by
+    TimeSeriesAPI.list, iter_list, retrieve and create, and invalidated by update and delete. Lookups return copies,
+    so modifying a returned time series does not modify the cache. Time series found in the shared cache have no
+    OMNIA client.
+
+    """
+    def __init__(self, ttl: float = None, maxsize: int = None, shared_cache: "SharedCache" = None):
+        self.ttl = Config.metadata_cache_ttl if ttl is None else ttl
+        self.maxsize = Config.metadata_cache_maxsize if maxsize is None else maxsize
+        self.shared_cache = shared_cache
+        self._entries = OrderedDict()   # id -> (expiry, time series), least recently used first
+        self._external_ids = dict()     # external id -> id
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, id: str):
+        """
+        Look up time series by id.
+
+        Parameters
+        ----------
+        id : str
+            Time series id.
+
+        Returns
+        -------
+        TimeSeries
+            Copy of the cached time series, None if not cached or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(id)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(id)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(id)
+                return copy.copy(entry[1])
+
+        if self.shared_cache is None:
+            return None
+
+        d = self.shared_cache.get(f"timeseries:{id}")
+        if d is None:
+            return None
+
+        ts = TimeSeries(**d)
+        self.put(ts, shared=False)
+        return ts
+
+    def get_by_external_id(self, external_id: str):
+        """
+        Look up time series by external id.
+
+        Parameters
+        ----------
+        external_id : str
+            Id from another (external) system.
+
+        Returns
+        -------
+        TimeSeries
+            Copy of the cached time series, None if not cached or expired.
+        """
+        id = self._external_ids.get(external_id)
+        if id is None and self.shared_cache is not None:
+            id = self.shared_cache.get(f"external_id:{external_id}")
+        return self.get(id) if id is not None else None
+
+    def put(self, ts, shared: bool = True):
+        """
+        Add or replace time series.
+
+        Parameters
+        ----------
+        ts : TimeSeries
+            Time series with id.
+        shared : bool, optional
+            Also add the time series to the shared cache, if any.
+        """
+        if ts.id is None or self.maxsize <= 0:
+            return
+
+        if shared and self.shared_cache is not None:
+            self.shared_cache.set(f"timeseries:{ts.id}", make_serializable(ts.dump()), ttl=self.ttl)
+            if ts.external_id is not None:
+                self.shared_cache.set(f"external_id:{ts.external_id}", ts.id, ttl=self.ttl)
+
+        with self._lock:
+            self._remove(ts.id)
+            self._entries[ts.id] = (time.monotonic() + self.ttl, copy.copy(ts))
+            if ts.external_id is not None:
+                self._external_ids[ts.external_id] = ts.id
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, id: str = None):
+        """
+        Remove time series.
+
+        Parameters
+        ----------
+        id : str, optional
+            Time series id. Removes all time series by default.
+        """
+        with self._lock:
+            if id is None:
+                self._entries.clear()
+                self._external_ids.clear()
+            else:
+                self._remove(id)
+
+        if id is not None and self.shared_cache is not None:
+            self.shared_cache.delete(f"timeseries:{id}")
+
+    def _remove(self, id: str):
+        """Remove time series and its external id. Call with `_lock` held."""
+        entry = self._entries.pop(id, None)
+        if entry is not None and self._external_ids.get(entry[1].external_id) == id:
+            del self._external_ids[entry[1].external_id]
+
+
+class SharedCache(object):
+    """
+    File based cache shared by processes on the same host, e.g. the workers of a service.
+
+    Parameters
+    ----------
+    directory : str
+        Directory holding one file per key. Created, readable for the current user only, if it does not exist.
+
+    Notes
+    -----
+    Values are JSON serializable and written atomically, so they can be read without locking. `lock()` serializes
+    work across processes, e.g. acquiring an access token only once for all workers. Locking relies on fcntl and is
+    not available on Windows.
+
+    """
+    def __init__(self, directory: str):
+        self.directory = os.path.expanduser(directory)
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def get(self, key: str):
+        """
+        Look up value.
+
+        Parameters
+        ----------
+        key : str
+            Key.
+
+        Returns
+        -------
+        Any
+            The value, None if missing or expired.
+        """
+        try:
+            with open(self._path(key), "r") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if entry.get("key") != key or (entry.get("expires") is not None and entry["expires"] < time.time()):
+            return None
+        return entry.get("value")
+
+    def set(self, key: str, value, ttl: float = None):
+        """
+        Store value.
+
+        Parameters
+        ----------
+        key : str
+            Key.
+        value : Any
+            JSON serializable value.
+        ttl : float, optional
+            Time (seconds) the value is valid. Never expires by default.
+        """
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            json.dump(dict(key=key, value=value, expires=time.time() + ttl if ttl is not None else None), f)
+        os.replace(tmp, path)
+
+    def delete(self, key: str):
+        """Remove value, if any."""
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def lock(self, key: str):
+        """
+        Exclusive lock across processes.
+
+        Parameters
+        ----------
+        key : str
+            Name of the lock.
+        """
+        if fcntl is None:
+            yield
+            return
+
+        fd = os.open(self._path(key) + ".lock", os.O_WRONLY | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _path(self, key: str):
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+
+def _subtract(start: int, end: int, intervals: list):
+    """Parts of [start, end) not covered by the sorted intervals."""
+    gaps = list()
+    for s, e in intervals:
+        if e <= start or s >= end:
+            continue
+        if s > start:
+            gaps.append((start, s))
+        start = max(start, e)
+    if start < end:
+        gaps.append((start, end))
+    return gaps
+
+
+def _count(time: np.ndarray, intervals: list, start: int, end: int):
+    """Number of cached datapoints within the intervals, clipped to [start, end)."""
+    n = 0
+    for s, e in intervals:
+        s, e = max(s, start), min(e, end)
+        if s < e:
+            i, j = np.searchsorted(time, [s, e])
+            n += int(j - i)
+    return n
+
+
+def _pack(name: str, a: np.ndarray):
+    """Store numeric arrays as they are and other arrays as JSON, avoiding pickle."""
+    if a.dtype.kind in "iuf":
+        return {name: a}
+    return {name + "_json": np.array(json.dumps(a.tolist()))}
+
+
+def _unpack(f, name: str):
+    if name in f.files:
+        return f[name]
+    return np.array(json.loads(str(f[name + "_json"])), dtype=object)
@@ -3,17 +3,25 @@ Omnia client.
 """
 import os
 import sys
+import time
 import logging
 import json
-import datetime
-import adal
 import http.client
 import urllib.parse
 import urllib.error
+from .cache import DatapointCache, MetadataCache, SharedCache
 from .timeseries import TimeSeriesAPI
+from .spool import WriteSpool
+from .writer import BufferedWriter
+from ._auth import TokenManager
 from ._config import Config
-from ._utils import to_snake_case, to_camel_case
-from .exceptions import OmniaAuthenticationError, OmniaClientConnectionError, OmniaTimeSeriesAPIError
+from ._concurrency import AdaptiveConcurrencyLimiter
+from ._pool import ConnectionPool
+from ._retry import RetryPolicy
+from ._trace import trace_request, trace_response
+from .instrumentation import Instrumentation, new_request_event
+from ._utils import to_camel_case, decode_items, extend_items
+from .exceptions import OmniaClientConnectionError, OmniaTimeSeriesAPIError, OmniaTimeSeriesAuthenticationError
 
 
 class OmniaClient(object):
@@ -34,64 +42,98 @@ class OmniaClient(object):
     Additionally you must set this environmental variable if authenticating with a shared secret (machine-to-machine)
         omniaClientSecret - Shared secret key
 
+    HTTPS connections are pooled and kept alive between requests. Call `close()` or use the client as a context
+    manager to release them.
+
+    Point the client at a local mock of the web API for testing by setting `host`, `scheme` and `authenticate` in
+    the configuration, see MockTimeSeriesServer.config.
+
+    Throttled (429) and transiently failing requests are retried with exponential backoff according to
+    `retry_policy`, see the retry settings in the configuration.
+
+    The number of concurrent requests, e.g. from TimeSeriesList.data or AsyncOmniaClient, is limited by
+    `concurrency_limiter` which adapts to server latency and throttling. Its current `limit` and
+    `latency_percentiles()` tell which throughput the API sustains.
+
+    Datapoints are cached on disk by `datapoint_cache` if `datapoint_cache_dir` is set in the configuration, see
+    DatapointCache.
+
+    Time series metadata are cached in memory by `metadata_cache`, see MetadataCache and the metadata cache settings
+    in the configuration.
+
+    Processes on the same host, e.g. the workers of a service, share access tokens and time series metadata through
+    `shared_cache` if `shared_cache_dir` is set in the configuration, see SharedCache.
+
+    Timings of each request stage, retries, pages and bytes received are reported to the hooks registered with
+    `instrumentation`, see Instrumentation and MetricsAggregator.
+
     """
     def __init__(self, config=Config):
         self.config = config
         self.time_series = TimeSeriesAPI(omnia_client=self)
+        if self.config.scheme not in ("http", "https"):
+            raise ValueError(f"Invalid scheme '{self.config.scheme}'. Choose one of http, https.")
+        connection_class = http.client.HTTPConnection if self.config.scheme == "http" else \
+            http.client.HTTPSConnection
+        self._pool = ConnectionPool(maxsize=self.config.pool_maxsize, idle_timeout=self.config.pool_idle_timeout,
+                                    timeout=self.config.timeout, connection_class=connection_class)
+        self.retry_policy = RetryPolicy.from_config(self.config)
+        self.instrumentation = Instrumentation()
+        if self.config.shared_cache_dir is not None:
+            self.shared_cache = SharedCache(self.config.shared_cache_dir)
+        else:
+            self.shared_cache = None
+        self.token_manager = self._create_token_manager() if self.config.authenticate else None
+        if self.config.adaptive_concurrency:
+            self.concurrency_limiter = AdaptiveConcurrencyLimiter(initial_limit=self.config.concurrency_initial_limit,
+                                                                  min_limit=self.config.concurrency_min_limit,
+                                                                  max_limit=self.config.concurrency_max_limit)
+        else:
+            self.concurrency_limiter = None
+        if self.config.datapoint_cache_dir is not None:
+            self.datapoint_cache = DatapointCache(self.config.datapoint_cache_dir,
+                                                  max_age=self.config.datapoint_cache_max_age,
+                                                  settle_time=self.config.datapoint_cache_settle_time)
+        else:
+            self.datapoint_cache = None
+        if self.config.metadata_cache_maxsize > 0:
+            self.metadata_cache = MetadataCache(ttl=self.config.metadata_cache_ttl,
+                                                maxsize=self.config.metadata_cache_maxsize,
+                                                shared_cache=self.shared_cache)
+        else:
+            self.metadata_cache = None
 
         log_levels = dict(debug=logging.DEBUG, info=logging.INFO, error=logging.ERROR)
         logging.basicConfig(stream=sys.stdout,
                             level=log_levels.get(self.config.log_level, logging.INFO),
                             format="%(levelname)s at line %(lineno)d in %(filename)s - %(message)s")
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     @property
     def idp_url(self):
         """str: Identity provider URL."""
         return f'https://{self.config.idp_base_url}/{self.config.idp_tenant}'
 
-    def _token_request(self):
-        """Requests access token."""
+    def _create_token_manager(self):
+        """Create manager of access tokens from environmental variables."""
         # Set resource id and client id. Default ids for authentication by user impersonation (without shared secret).
         # service-to-service / machine-to-machine authentication using a shared secret requires generally different
         # resource and client ids and a shared secret (client secret). See also
         # https://github.com/equinor/OmniaPlant/wiki/Authentication-&-Authorization
-        resource_id = os.getenv("omniaResourceId", self.config.default_resource_id)
-        client_id = os.getenv("omniaClientId", self.config.default_client_id)
-        client_secret = os.getenv("omniaClientSecret")
-
-        # check if current access token is still valid
-        current_resource_id = os.getenv("currentOmniaResourceId")
-        current_client_id = os.getenv("currentOmniaClientId")
-        token_expires_on = os.getenv("omniaAccessTokenExpiry")
-        if (current_resource_id == resource_id and current_client_id == client_id and token_expires_on is not None
-                and datetime.datetime.now().timestamp() < float(token_expires_on) * 1000):
-            logging.debug("Current access token is still valid.")
-            return
-
-        context = adal.AuthenticationContext(self.idp_url)
-        try:
-            if client_secret is not None:
-                logging.info("Authenticating with shared client secret (service-to-service).")
-                data = context.acquire_token_with_client_credentials(resource_id, client_id, client_secret)
-            else:
-                logging.info("Authenticating by user impersonation without any shared secret.")
-                code = context.acquire_user_code(resource_id, client_id)
-                print(f"\nUSER INTERACTION REQUIRED\n{code['message']}\n")
-                data = context.acquire_token_with_device_code(resource_id, code, client_id)
-        except adal.adal_error.AdalError as e:
-            logging.error("Unable to acquire a valid access token.", exc_info=True)
-            raise OmniaAuthenticationError()
-        else:
-            os.environ["currentOmniaAccessToken"] = data.get("accessToken")
-            os.environ["omniaAccessTokenExpiry"] = str(
-                datetime.datetime.strptime(data.get("expiresOn"), "%Y-%m-%d %H:%M:%S.%f").timestamp())
-            os.environ["currentOmniaClientId"] = data.get("_clientId")
-            os.environ["currentOmniaResourceId"] = data.get("resource")
-            os.environ["omniaAccessTokenExpiryDate"] = data.get("expiresOn")
-            logging.debug("Acquired valid access token.")
+        return TokenManager(self.idp_url,
+                            resource_id=os.getenv("omniaResourceId", self.config.default_resource_id),
+                            client_id=os.getenv("omniaClientId", self.config.default_client_id),
+                            client_secret=os.getenv("omniaClientSecret"),
+                            refresh_margin=self.config.token_refresh_margin,
+                            shared_cache=self.shared_cache)
 
     def _do_request(self, method: str, resource: str, version: str, endpoint: str, parameters: dict = None,
-                    body: dict = None):
+                    body: dict = None, idempotent: bool = None):
         """
         Carry out request.
 
@@ -107,8 +149,11 @@ class OmniaClient(object):
             API resource endpoint e.g.
         parameters : dict, optional
             Request parameters.
-        body : dict, optional
-            Request body.
+        body : dict or str or bytes, optional
+            Request body. Strings and bytes are regarded as JSON encoded and sent as is.
+        idempotent : bool, optional
+            Whether the request may be repeated without side effects, which allows retrying it on any transient
+            failure. By default decided by the request method.
 
         Returns
         -------
@@ -121,9 +166,31 @@ class OmniaClient(object):
             'https://{base_url}/{resource}/{version}?firstparameter=value&anotherparameter=value
 
         """
-        # request new access token
-        self._token_request()
+        results = list()
+        for items in self._iter_pages(method, resource, version, endpoint, parameters=parameters, body=body,
+                                      idempotent=idempotent):
+            if items is None:
+                return
+            extend_items(results, items)
+
+        return results
+
+    def _iter_pages(self, method: str, resource: str, version: str, endpoint: str, parameters: dict = None,
+                    body: dict = None, idempotent: bool = None):
+        """
+        Carry out request and yield the response page by page.
 
+        See `_do_request` for a description of the parameters.
+
+        Yields
+        ------
+        List[dict]
+            Decoded items of each response page as soon as it is received, None if the response has no data.
+
+        Notes
+        -----
+        Each page is retried separately, so a failure during pagination resumes from the last continuation token.
+        """
         url = "/" + "/".join([p for p in [self.config.base_url, resource, version, endpoint] if p.strip()])
         if parameters is not None and isinstance(parameters, dict):
             parameters = to_camel_case({k: v for k, v in parameters.items() if v is not None})
@@ -135,71 +202,236 @@ class OmniaClient(object):
 
         url_with_parameters = f"{url}/?{enc_parameters}"
         headers = dict(
-            Authorization=f"Bearer {os.getenv('currentOmniaAccessToken', '')}",
             Connection="keep-alive",
             Host=self.config.host,
         )
 
-        msg = f"{method.upper()} {url_with_parameters} {http.client.__doc__.split()[0]}"
-        for k, v in headers.items():
-            msg += f"\n{k}: {v}"
-
-        if body is not None:
-            body = to_camel_case({k: v for k, v in body.items() if v is not None})
+        if isinstance(body, (str, bytes)):
+            # already JSON encoded
             headers["Content-Type"] = "application/json"
-            msg += f"\nBody:\n{json.dumps(body, indent=2)}"
-
-        logging.debug(msg)
+        elif body is not None:
+            body = json.dumps(to_camel_case({k: v for k, v in body.items() if v is not None}))
+            headers["Content-Type"] = "application/json"
+        else:
+            body = json.dumps(body)
 
+        event = new_request_event(method.upper(), url)
+        start = time.perf_counter()
         try:
-            connection = http.client.HTTPSConnection(self.config.host)
-        except Exception:
-            logging.error("Request failed", exc_info=True)
-            raise OmniaClientConnectionError()
-
-        results = list()
+            yield from self._iter_responses(method, url_with_parameters, body, headers, limit, idempotent, event)
+        except Exception as e:
+            event["error"] = e
+            raise
+        finally:
+            if self.instrumentation.hooks:
+                event["duration"] = time.perf_counter() - start
+                self.instrumentation.emit(event)
+
+    def _iter_responses(self, method: str, url_with_parameters: str, body: str, headers: dict, limit: int,
+                        idempotent: bool, event: dict):
+        """Send request and follow continuation tokens, yielding the decoded items of each page."""
         query_url = url_with_parameters
         n_items = 0
         while True:
-            connection.request(method, query_url, body=json.dumps(body), headers=headers)
-            r = connection.getresponse()
-            response = json.loads(r.read())
-            msg = response.get("message") or ""
-
-            if not r.status == 200:
-                logging.error(f"Request failed. [{r.status}] {r.reason}. {msg}.")
-                raise OmniaTimeSeriesAPIError(r.status, r.reason, msg)
+            response = self._send(method, query_url, body, headers, idempotent=idempotent, event=event)
+            event["pages"] += 1
+            if response.get("data") is None:
+                yield None
+                return
             else:
-                logging.debug(f"Request succeded. [{r.status}] {r.reason}. {msg}.")
-                if response.get("data") is None:
+                continuation_token = response.get("continuationToken")
+                items = response.get("data").get("items")
+
+                if items is None or len(items) == 0:
                     return
+
+                converted = time.perf_counter()
+                items = decode_items(items)
+                event["stages"]["convert"] += time.perf_counter() - converted
+                yield items
+
+                if items[0].get("datapoints") is not None:
+                    # limit response size based on number of returned data points
+                    # TODO: Not robust because the web API return datapoints as
+                    #  {"data": {"items": [{"datapoints": [{"time": ..., "value": ..., "status: ...}]}, ]}} under items.
+                    #  Should rather return datapoints directly under "items" to be generic, like
+                    #  {"data": {"items": [{"time": ..., "value": ..., "status: ...}, {...}, {...}]}}
+                    n_items += len(items[0].get("datapoints").get("time"))
                 else:
-                    continuation_token = response.get("continuationToken")
-                    items = response.get("data").get("items")
+                    n_items += len(items)
 
-                    if items is None or len(items) == 0:
-                        break
+                if continuation_token is None or (limit is not None and n_items >= limit):
+                    return
+                else:
+                    continuation_token = urllib.parse.quote(continuation_token, safe="")
+                    query_url = f"{url_with_parameters}&continuationToken={continuation_token}"
 
-                    results.extend(items)
+    def _send(self, method: str, url: str, body: str, headers: dict, idempotent: bool = None, event: dict = None):
+        """
+        Send a single request, retrying throttled and transient failures according to the retry policy.
 
-                    if items[0].get("datapoints") is not None:
-                        # limit response size based on number of returned data points
-                        # TODO: Not robust because the web API return datapoints as
-                        #  {"data": {"items": [{"datapoints": [{"time": ..., "value": ..., "status: ...}]}, ]}} under items.
-                        #  Should rather return datapoints directly under "items" to be generic, like
-                        #  {"data": {"items": [{"time": ..., "value": ..., "status: ...}, {...}, {...}]}}
-                        n_items += len(items[0].get("datapoints"))
-                    else:
-                        n_items += len(items)
+        Parameters
+        ----------
+        method : str
+            Request method.
+        url : str
+            Request url (path and query).
+        body : str
+            JSON encoded request body.
+        headers : dict
+            Request headers.
+        idempotent : bool, optional
+            Whether the request may be repeated without side effects. By default decided by the request method.
+        event : dict, optional
+            Request event updated with status, timings, bytes received and retries, see Instrumentation.
 
-                    if continuation_token is None or (limit is not None and n_items >= limit):
-                        break
-                    else:
-                        query_url = f"{url_with_parameters}&continuationToken={continuation_token}"
-                        logging.debug(f"\tFetching next page... {query_url}")
+        Returns
+        -------
+        dict
+            Response body.
+
+        Raises
+        ------
+        OmniaTimeSeriesAPIError
+            If the response status is not 200 OK and retries are exhausted or not allowed.
+        OmniaTimeSeriesAuthenticationError
+            If the access token is rejected even after acquiring a new one.
+        OmniaClientConnectionError
+            If the connection fails and retries are exhausted or not allowed.
+        """
+        policy = self.retry_policy
+        retry = 0
+        reauthenticated = False
+        event = new_request_event(method, url) if event is None else event
+        while True:
+            # the token may have been refreshed since the previous attempt
+            if self.token_manager is not None:
+                headers = dict(headers, Authorization=f"Bearer {self.token_manager.get_token()}")
+            trace_request(method, url, headers, body, self.config.trace_body_length)
+            try:
+                r = self._limited_request(method, url, body, headers)
+            except OmniaClientConnectionError:
+                if retry >= policy.max_retries or not policy.is_retryable(method, 503, idempotent=idempotent):
+                    raise
+                delay = policy.backoff(retry)
+                logging.warning(f"Connection failed. Retrying in {delay:.2f} s ({retry + 1}/{policy.max_retries}).")
+            else:
+                trace_response(method, url, r.status, r.reason, r.headers, r.data, self.config.trace_body_length)
+                event["status"] = r.status
+                event["bytes_received"] += len(r.data)
+                for stage, duration in (r.timings or dict()).items():
+                    event["stages"][stage] += duration
+                decoded = time.perf_counter()
+                try:
+                    response = json.loads(r.data)
+                except ValueError:
+                    response = dict()
+                event["stages"]["decode"] += time.perf_counter() - decoded
+                msg = (response.get("message") if isinstance(response, dict) else None) or ""
+
+                if r.status == 200:
+                    return response
+
+                if r.status == 401 and not reauthenticated and self.token_manager is not None:
+                    # the token was rejected before it expired, acquire a new one and try again once
+                    logging.warning(f"Request failed. [{r.status}] {r.reason}. {msg}. Reauthenticating.")
+                    self.token_manager.invalidate()
+                    reauthenticated = True
+                    continue
+
+                if r.status == 401 and self.token_manager is not None:
+                    # a fresh token was rejected as well, retrying will not help
+                    logging.error(f"Request failed. [{r.status}] {r.reason}. {msg}. Rejected after reauthenticating.")
+                    raise OmniaTimeSeriesAuthenticationError(r.status, r.reason, msg)
+
+                if retry >= policy.max_retries or not policy.is_retryable(method, r.status, idempotent=idempotent):
+                    logging.error(f"Request failed. [{r.status}] {r.reason}. {msg}.")
+                    raise OmniaTimeSeriesAPIError(r.status, r.reason, msg)
+
+                delay = policy.backoff(retry, retry_after=policy.parse_retry_after(r.headers.get("Retry-After")))
+                logging.warning(f"Request failed. [{r.status}] {r.reason}. {msg}. Retrying in {delay:.2f} s "
+                                f"({retry + 1}/{policy.max_retries}).")
+
+            policy.sleep(delay)
+            retry += 1
+            event["retries"] += 1
+
+    def _limited_request(self, method: str, url: str, body: str, headers: dict):
+        """Carry out request on a pooled connection within the concurrency limit."""
+        limiter = self.concurrency_limiter
+        if limiter is None:
+            return self._pool.request(self.config.host, method, url, body=body, headers=headers)
+
+        start = limiter.acquire()
+        try:
+            r = self._pool.request(self.config.host, method, url, body=body, headers=headers)
+        except BaseException:
+            limiter.release(start, failed=True)
+            raise
+
+        # time to first byte, downloading large bodies takes longer regardless of server load
+        latency = r.timings["wait"] if r.timings is not None else None
+        limiter.release(start, latency=latency, throttled=r.status in (429, 503))
+        return r
+
+    def buffered_writer(self, flush_size: int = None, flush_interval: float = None, max_buffer: int = None,
+                        asynch: bool = False):
+        """
+        Create a writer which buffers datapoints and writes them in batches in the background.
+
+        Parameters
+        ----------
+        flush_size : int, optional
+            Flush when this many datapoints are buffered. Defaults to `writer_flush_size` in the configuration.
+        flush_interval : float, optional
+            Flush at least this often (seconds). Defaults to `writer_flush_interval` in the configuration.
+        max_buffer : int, optional
+            Maximum number of buffered datapoints. Defaults to `writer_max_buffer` in the configuration.
+        asynch : bool, optional
+            Let the web API commit the datapoints asynchronously.
+
+        Returns
+        -------
+        BufferedWriter
+            The writer.
+        """
+        return BufferedWriter(self, flush_size=flush_size, flush_interval=flush_interval, max_buffer=max_buffer,
+                              asynch=asynch)
+
+    def write_spool(self, directory: str, segment_size: int = None, batch_size: int = None,
+                    drain_interval: float = None, asynch: bool = False, fsync: bool = True):
+        """
+        Open a durable on-disk spool which writes datapoints to the web API in the background.
 
-        connection.close()
-        return to_snake_case(results)
+        Parameters
+        ----------
+        directory : str
+            Directory holding the spooled datapoints. Reopening the same directory resumes writing after a restart.
+        segment_size : int, optional
+            Maximum size (bytes) of a segment file. Defaults to `spool_segment_size` in the configuration.
+        batch_size : int, optional
+            Maximum number of datapoints written at a time. Defaults to `write_batch_size` in the configuration.
+        drain_interval : float, optional
+            Time (seconds) between attempts when the spool is empty or the web API fails. Defaults to
+            `spool_drain_interval` in the configuration.
+        asynch : bool, optional
+            Let the web API commit the datapoints asynchronously.
+        fsync : bool, optional
+            Force appended datapoints to disk before returning.
+
+        Returns
+        -------
+        WriteSpool
+            The spool.
+        """
+        return WriteSpool(self, directory, segment_size=segment_size, batch_size=batch_size,
+                          drain_interval=drain_interval, asynch=asynch, fsync=fsync)
+
+    def close(self):
+        """Close pooled connections and stop refreshing the access token."""
+        self._pool.close()
+        if self.token_manager is not None:
+            self.token_manager.close()
 
     def delete(self, resource: str, version: str, endpoint: str, parameters: dict = None, body: dict = None):
         """
@@ -261,6 +493,38 @@ class OmniaClient(object):
         """
         return self._do_request("GET", resource, version, endpoint, parameters=parameters, body=body)
 
+    def get_pages(self, resource: str, version: str, endpoint: str, parameters: dict = None, body: dict = None):
+        """
+        GET request yielding the response page by page.
+
+        Parameters
+        ----------
+        resource : str
+            API resource e.g. 'plant/timeseries'
+        version : str
+            API version e.g. 'v1.3'
+        endpoint : str
+            API resource endpoint e.g.
+        parameters : dict, optional
+            Request parameters.
+        body : dict, optional
+            Request body.
+
+        Yields
+        ------
+        List[dict]
+            Items of each response page as soon as it is received.
+
+        Notes
+        -----
+        Unlike `get`, which collects all pages before returning, only one page is held in memory at a time.
+
+        """
+        for items in self._iter_pages("GET", resource, version, endpoint, parameters=parameters, body=body):
+            if items is None:
+                return
+            yield items
+
     def patch(self, resource: str, version: str, endpoint: str, parameters: dict = None, body: dict = None):
         """
         POST request
@@ -291,7 +555,8 @@ class OmniaClient(object):
         """
         return self._do_request("PATCH", resource, version, endpoint, parameters=parameters, body=body)
 
-    def post(self, resource: str, version: str, endpoint: str, parameters: dict = None, body: dict = None):
+    def post(self, resource: str, version: str, endpoint: str, parameters: dict = None, body: dict = None,
+             idempotent: bool = None):
         """
         POST request
 
@@ -305,8 +570,11 @@ class OmniaClient(object):
             API resource endpoint e.g.
         parameters : dict, optional
             Request parameters.
-        body : dict, optional
-            Request body.
+        body : dict or str or bytes, optional
+            Request body. Strings and bytes are regarded as JSON encoded and sent as is.
+        idempotent : bool, optional
+            Whether the request may be repeated without side effects, which allows retrying it on any transient
+            failure. POST requests are by default only retried if throttled.
 
         Returns
         -------
@@ -319,7 +587,8 @@ class OmniaClient(object):
             'https://{base_url}/{resource}/{version}?firstparameter=value&anotherparameter=value
 
         """
-        return self._do_request("POST", resource, version, endpoint, parameters=parameters, body=body)
+        return self._do_request("POST", resource, version, endpoint, parameters=parameters, body=body,
+                                idempotent=idempotent)
 
     def put(self, resource: str, version: str, endpoint: str, parameters: dict = None, body: dict = None):
         """
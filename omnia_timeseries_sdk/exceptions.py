@@ -30,3 +30,20 @@ class OmniaTimeSeriesAPIError(Exception):
     def __str__(self):
         return f"[{self.status}] {self.reason}. {self.msg}."
 
+
+class OmniaTimeSeriesAuthenticationError(OmniaTimeSeriesAPIError, OmniaAuthenticationError):
+    """
+    Omnia Timeseries API authentication error.
+
+    Raised if the API rejects the access token (401 Unauthorized) even after a new one has been acquired.
+    """
+    pass
+
+
+class OmniaBufferFullError(Exception):
+    """
+    Omnia buffered writer error.
+
+    Raised if datapoints can not be appended to a full write buffer within the given timeout.
+    """
+    pass
@@ -0,0 +1,185 @@
+"""
+Request instrumentation and metrics.
+"""
+import logging
+import threading
+import time
+import numpy as np
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Callable
+
+# stages of a request, in order
+REQUEST_STAGES = ("connect", "wait", "download", "decode", "convert")
+
+
+class Instrumentation(object):
+    """
+    Dispatch events describing requests and processing stages to hooks.
+
+    Notes
+    -----
+    A hook is a callable taking one event, a dict with key 'kind'. Request events ('request') are emitted once per
+    request, after all pages and retries, with keys
+
+        method, url             Request method and url (path without query)
+        status                  Status code of the last response, None if no response was received
+        error                   Exception if the request failed, otherwise None
+        duration                Total time (seconds)
+        stages                  Time (seconds) spent in each stage, summed over pages and attempts: 'connect' (TCP and
+                                TLS handshake), 'wait' (server processing until the response headers are received),
+                                'download' (response body), 'decode' (JSON parsing) and 'convert' (conversion of
+                                keys and datapoints)
+        pages, retries          Number of response pages and retried attempts
+        bytes_received          Size of the response bodies (bytes)
+
+    Processing stages outside requests are emitted as stage events ('stage') with keys 'stage', 'duration' and
+    optionally 'items', e.g. building DataPoints from a response (stage 'build').
+
+    Hooks are called on the thread which made the request and must be fast and thread-safe. Exceptions raised by
+    hooks are logged and ignored.
+
+        metrics = MetricsAggregator()
+        client.instrumentation.add_hook(metrics)
+        ...
+        metrics.summary()
+
+    """
+    def __init__(self):
+        self.hooks = list()
+
+    def add_hook(self, hook: Callable):
+        """
+        Register hook.
+
+        Parameters
+        ----------
+        hook : Callable
+            Function called with each event.
+        """
+        self.hooks = self.hooks + [hook]
+
+    def remove_hook(self, hook: Callable):
+        """
+        Unregister hook.
+
+        Parameters
+        ----------
+        hook : Callable
+            Previously registered hook.
+        """
+        self.hooks = [_ for _ in self.hooks if _ is not hook]
+
+    def emit(self, event: dict):
+        """
+        Pass event on to all hooks.
+
+        Parameters
+        ----------
+        event : dict
+            The event.
+        """
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception:
+                logging.error("Instrumentation hook failed.", exc_info=True)
+
+    @contextmanager
+    def stage(self, stage: str, items: int = None):
+        """
+        Time a processing stage and emit a stage event.
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage.
+        items : int, optional
+            Number of items processed.
+        """
+        if not self.hooks:
+            yield
+            return
+
+        start = time.perf_counter()
+        yield
+        self.emit(dict(kind="stage", stage=stage, duration=time.perf_counter() - start, items=items))
+
+
+def new_request_event(method: str, url: str):
+    """Request event with empty counters, see Instrumentation."""
+    return dict(kind="request", method=method, url=url, status=None, error=None, duration=0.,
+                stages={_: 0. for _ in REQUEST_STAGES}, pages=0, retries=0, bytes_received=0)
+
+
+class MetricsAggregator(object):
+    """
+    Hook aggregating events into counters, latency percentiles and throughput.
+
+    Parameters
+    ----------
+    window : int, optional
+        Number of recent durations kept per stage for percentiles.
+
+    Notes
+    -----
+    Register the aggregator with `OmniaClient.instrumentation.add_hook` and export `summary()` to monitoring.
+
+    """
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __call__(self, event: dict):
+        with self._lock:
+            if self._started is None:
+                self._started = time.monotonic() - event["duration"]
+
+            if event["kind"] == "request":
+                self._counters["requests"] += 1
+                self._counters["errors"] += event["error"] is not None
+                self._counters["pages"] += event["pages"]
+                self._counters["retries"] += event["retries"]
+                self._counters["bytes_received"] += event["bytes_received"]
+                self._statuses[event["status"]] += 1
+                self._durations["request"].append(event["duration"])
+                for stage, duration in event["stages"].items():
+                    self._durations[stage].append(duration)
+            else:
+                self._durations[event["stage"]].append(event["duration"])
+
+    def reset(self):
+        """Clear all counters and durations."""
+        with self._lock:
+            self._started = None
+            self._counters = dict(requests=0, errors=0, pages=0, retries=0, bytes_received=0)
+            self._statuses = defaultdict(int)
+            self._durations = defaultdict(lambda: deque(maxlen=self.window))
+
+    def summary(self, percentiles: tuple = (50, 90, 99)):
+        """
+        Aggregated metrics.
+
+        Parameters
+        ----------
+        percentiles : tuple, optional
+            Percentiles of durations to compute, between 0 and 100.
+
+        Returns
+        -------
+        dict
+            Counters ('requests', 'errors', 'pages', 'retries', 'bytes_received'), number of responses per status
+            code ('statuses'), throughput since the first event ('requests_per_second', 'bytes_per_second') and
+            duration percentiles in seconds per stage ('latency'), where stage 'request' is the total duration.
+        """
+        with self._lock:
+            summary = dict(self._counters, statuses=dict(self._statuses))
+            durations = {stage: list(d) for stage, d in self._durations.items()}
+            elapsed = time.monotonic() - self._started if self._started is not None else 0.
+
+        summary["requests_per_second"] = summary["requests"] / elapsed if elapsed > 0 else 0.
+        summary["bytes_per_second"] = summary["bytes_received"] / elapsed if elapsed > 0 else 0.
+        summary["latency"] = {stage: dict(zip(percentiles, np.percentile(d, percentiles).tolist()))
+                              for stage, d in durations.items() if d}
+        return summary
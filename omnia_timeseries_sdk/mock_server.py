@@ -0,0 +1,442 @@
+"""
+Local mock of the Omnia Timeseries API for load and latency testing.
+
+Serves the timeseries v1.5 endpoints used by TimeSeriesAPI from memory, with configurable latency, throttling and
+failure injection. Start it from the command line
+
+    python -m omnia_timeseries_sdk.mock_server --port 8080 --latency 0.05 --throttle-rate 0.01
+
+or from Python, and point the client at it
+
+    with MockTimeSeriesServer(latency=0.05) as server:
+        client = OmniaClient(config=server.config())
+
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from ._config import Config
+from ._utils import encode_datapoints, from_datetime_strings, to_status_array, to_value_array
+
+# metadata of a time series which may be set on create and update
+METADATA_KEYS = ("name", "description", "step", "unit", "assetId", "externalId")
+
+
+class MockTimeSeriesServer(ThreadingHTTPServer):
+    """
+    In-memory mock of the Omnia Timeseries API.
+
+    Parameters
+    ----------
+    host : str, optional
+        Interface to listen on. Defaults to localhost.
+    port : int, optional
+        Port to listen on. Defaults to any free port, see `port`.
+    page_size : int, optional
+        Maximum number of items (time series or data points) per response page. Larger results are paginated with
+        continuation tokens.
+    latency : float, optional
+        Time (seconds) each request takes to process.
+    jitter : float, optional
+        Random extra latency (seconds), uniformly distributed between 0 and `jitter`.
+    max_concurrency : int, optional
+        Maximum number of requests processed concurrently. Surplus requests are throttled (429). Unlimited by
+        default.
+    throttle_rate : float, optional
+        Fraction of requests randomly throttled (429).
+    retry_after : float, optional
+        Delay (seconds) suggested by the Retry-After header of throttled responses, None omits the header.
+    failure_rate : float, optional
+        Fraction of requests randomly failing with `failure_status`.
+    failure_status : int, optional
+        Status code of injected failures. Defaults to 503 Service Unavailable.
+    seed : int, optional
+        Seed of the random throttling and failures.
+
+    Notes
+    -----
+    Access tokens are not checked. The time window of data requests includes the start time and excludes the end
+    time. The limit of data requests caps the total number of data points over all pages.
+
+    Counters of requests and injected faults are available from `stats`.
+
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, page_size: int = 100000, latency: float = 0.,
+                 jitter: float = 0., max_concurrency: int = None, throttle_rate: float = 0., retry_after: float = 1.,
+                 failure_rate: float = 0., failure_status: int = 503, seed: int = None):
+        super().__init__((host, port), _RequestHandler)
+        self.page_size = page_size
+        self.latency = latency
+        self.jitter = jitter
+        self.max_concurrency = max_concurrency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.timeseries = dict()    # id -> metadata (camelCase) and datapoint arrays
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._counters = dict(requests=0, throttled=0, failed=0)
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def port(self):
+        """int: Port the server listens on."""
+        return self.server_address[1]
+
+    @property
+    def stats(self):
+        """dict: Number of requests, injected throttling responses ('throttled') and failures ('failed')."""
+        with self._lock:
+            return dict(self._counters)
+
+    def config(self, base=Config):
+        """
+        Client configuration pointing at the server.
+
+        Parameters
+        ----------
+        base : type, optional
+            Configuration to derive from. Defaults to Config.
+
+        Returns
+        -------
+        type
+            Configuration with host, scheme and authentication set for the server.
+        """
+        host = self.server_address[0]
+        return type("MockServerConfig", (base,), dict(host=f"{host}:{self.port}", scheme="http",
+                                                      authenticate=False))
+
+    def start(self):
+        """Serve requests in a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, kwargs=dict(poll_interval=0.05),
+                                        name="omnia-timeseries-sdk-mock-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving requests and close the socket."""
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def _admit(self):
+        """
+        Simulate processing time and injected faults of a request.
+
+        Returns
+        -------
+        tuple
+            Status code, extra headers and message of an injected fault, None if the request is to be served.
+        """
+        with self._lock:
+            self._counters["requests"] += 1
+            throttled = self.max_concurrency is not None and self._active >= self.max_concurrency
+            if not throttled:
+                self._active += 1
+            draw, delay = self._random.random(), self.latency + self._random.uniform(0., self.jitter)
+
+        if not throttled:
+            try:
+                if delay > 0:
+                    time.sleep(delay)
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+        if throttled or draw < self.throttle_rate:
+            headers = dict() if self.retry_after is None else {"Retry-After": f"{self.retry_after:g}"}
+            with self._lock:
+                self._counters["throttled"] += 1
+            return 429, headers, "Too many requests"
+
+        if draw < self.throttle_rate + self.failure_rate:
+            with self._lock:
+                self._counters["failed"] += 1
+            return self.failure_status, dict(), "Injected failure"
+
+        return None
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Route requests to the timeseries v1.5 endpoints of the mock server."""
+    protocol_version = "HTTP/1.1"   # keep connections alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def _handle(self, method: str):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length > 0 else b""
+
+        fault = self.server._admit()
+        if fault is not None:
+            status, headers, message = fault
+            return self._respond(status, json.dumps(dict(message=message)), headers=headers)
+
+        url = urllib.parse.urlsplit(self.path)
+        parts = [_ for _ in url.path.split("/") if _]
+        i = parts.index("timeseries") if "timeseries" in parts else len(parts)
+        if parts[i + 1:i + 2] != ["v1.5"]:
+            return self._error(404, "Unknown resource")
+        route = parts[i + 2:]
+        parameters = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+        try:
+            request = json.loads(body) if body else None
+        except ValueError:
+            return self._error(400, "Invalid JSON body")
+
+        try:
+            status, response = self._route(method, route, parameters, request)
+        except KeyError as e:
+            return self._error(404, f"Time series {e} not found")
+        except (ValueError, TypeError) as e:
+            return self._error(400, str(e))
+
+        self._respond(status, response)
+
+    def _route(self, method: str, route: list, parameters: dict, body):
+        """Status code and JSON encoded response body."""
+        server = self.server
+        if route == [] and method == "GET":
+            return 200, self._list(parameters)
+        if route == [] and method == "POST":
+            return 200, _items([self._create(body)])
+        if route == ["data"] and method == "POST":
+            with server._lock:
+                for item in body["items"]:
+                    _write(server.timeseries[item["id"]], item["datapoints"])
+            return 200, "{}"
+        if len(route) == 1 and method == "GET":
+            return 200, _items([_metadata(server.timeseries[route[0]])])
+        if len(route) == 1 and method == "PATCH":
+            with server._lock:
+                ts = server.timeseries[route[0]]
+                ts.update({k: v for k, v in body.items() if k in METADATA_KEYS and v is not None},
+                          changedTime=_now())
+                return 200, _items([_metadata(ts)])
+        if len(route) == 1 and method == "DELETE":
+            with server._lock:
+                del server.timeseries[route[0]]
+            return 200, "{}"
+        if route[1:] == ["data"] and method == "GET":
+            return 200, self._data(server.timeseries[route[0]], parameters)
+        if route[1:] == ["data"] and method == "POST":
+            with server._lock:
+                _write(server.timeseries[route[0]], body["datapoints"])
+            return 200, "{}"
+        if route[1:] == ["data"] and method == "DELETE":
+            with server._lock:
+                ts = server.timeseries[route[0]]
+                t = ts["time"]
+                start, end = _window(t, parameters)
+                keep = np.ones(len(t), dtype=bool)
+                keep[start:end] = False
+                ts["time"], ts["value"], ts["status"] = t[keep], ts["value"][keep], ts["status"][keep]
+            return 200, "{}"
+        if route[1:] in (["data", "first"], ["data", "latest"]) and method == "GET":
+            return self._first_or_latest(server.timeseries[route[0]], route[2], parameters)
+
+        return 404, json.dumps(dict(message="Unknown endpoint"))
+
+    def _list(self, parameters: dict):
+        """Page of time series matching the filters."""
+        with self.server._lock:
+            matches = [_metadata(ts) for ts in self.server.timeseries.values()
+                       if all(parameters.get(k) in (None, ts.get(k)) for k in ("name", "externalId", "assetId"))]
+
+        token = _decode_token(parameters.get("continuationToken"))
+        offset = token["offset"] if token else int(parameters.get("skip") or 0)
+        remaining = token["remaining"] if token else _limit(parameters)
+        n = min(len(matches) - offset, self.server.page_size, remaining if remaining is not None else len(matches))
+        n = max(n, 0)
+        remaining = None if remaining is None else remaining - n
+        more = offset + n < len(matches) and remaining != 0
+        next_token = _encode_token(dict(offset=offset + n, remaining=remaining)) if more else None
+        return _items(matches[offset:offset + n], next_token)
+
+    def _create(self, body: dict):
+        ts = {k: body.get(k) for k in METADATA_KEYS}
+        ts.update(id=str(uuid.uuid4()), createdTime=_now(), changedTime=_now(),
+                  time=np.array([], dtype="datetime64[ns]"), value=np.array([], dtype=float),
+                  status=np.array([], dtype=np.int32))
+        with self.server._lock:
+            self.server.timeseries[ts["id"]] = ts
+        return _metadata(ts)
+
+    def _data(self, ts: dict, parameters: dict):
+        """Page of data points within the time window."""
+        with self.server._lock:
+            t, v, s = ts["time"], ts["value"], ts["status"]
+        start, end = _window(t, parameters)
+        if parameters.get("includeOutsidePoints", "").lower() == "true":
+            start, end = max(start - 1, 0), min(end + 1, len(t))
+
+        token = _decode_token(parameters.get("continuationToken"))
+        if token:
+            start = max(start, int(np.searchsorted(t, np.datetime64(token["after"], "ns"), side="right")))
+            remaining = token["remaining"]
+        else:
+            remaining = _limit(parameters)
+
+        n = max(min(end - start, self.server.page_size, remaining if remaining is not None else end - start), 0)
+        remaining = None if remaining is None else remaining - n
+        more = start + n < end and remaining != 0
+        next_token = _encode_token(dict(after=int(t[start + n - 1].astype(np.int64)), remaining=remaining)) \
+            if more else None
+        page = slice(start, start + n)
+        return _datapoints(ts, t[page], v[page], s[page], next_token)
+
+    def _first_or_latest(self, ts: dict, which: str, parameters: dict):
+        with self.server._lock:
+            t, v, s = ts["time"], ts["value"], ts["status"]
+        if which == "first":
+            after = parameters.get("afterTime")
+            i = 0 if after is None else int(np.searchsorted(t, _parse_time(after), side="right"))
+        else:
+            before = parameters.get("beforeTime")
+            i = (len(t) if before is None else int(np.searchsorted(t, _parse_time(before), side="left"))) - 1
+        if not 0 <= i < len(t):
+            return 404, json.dumps(dict(message="No data points found"))
+        return 200, _datapoints(ts, t[i:i + 1], v[i:i + 1], s[i:i + 1])
+
+    def _error(self, status: int, message: str):
+        self._respond(status, json.dumps(dict(message=message)))
+
+    def _respond(self, status: int, body: str, headers: dict = None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or dict()).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime(Config.datetime_format)
+
+
+def _parse_time(s: str):
+    return from_datetime_strings([s])[0]
+
+
+def _limit(parameters: dict):
+    limit = parameters.get("limit")
+    return None if limit is None else int(limit)
+
+
+def _window(t: np.ndarray, parameters: dict):
+    """Index range of data points from start time (inclusive) to end time (exclusive)."""
+    start = parameters.get("startTime")
+    end = parameters.get("endTime")
+    i = 0 if start is None else int(np.searchsorted(t, _parse_time(start), side="left"))
+    j = len(t) if end is None else int(np.searchsorted(t, _parse_time(end), side="left"))
+    return i, j
+
+
+def _write(ts: dict, datapoints: list):
+    """Insert or overwrite data points, keeping them sorted by time."""
+    if not datapoints:
+        return
+    t = from_datetime_strings([dp["time"] for dp in datapoints])
+    v = to_value_array([dp.get("value") for dp in datapoints])
+    s = to_status_array([dp.get("status", 0) for dp in datapoints])
+    t, v, s = np.concatenate([ts["time"], t]), np.concatenate([ts["value"], v]), np.concatenate([ts["status"], s])
+    order = np.argsort(t, kind="stable")
+    t, v, s = t[order], v[order], s[order]
+    # the last written of data points with equal time wins
+    keep = np.append(t[1:] != t[:-1], True)
+    ts["time"], ts["value"], ts["status"] = t[keep], v[keep], s[keep]
+
+
+def _metadata(ts: dict):
+    return {k: v for k, v in ts.items() if k not in ("time", "value", "status")}
+
+
+def _items(items: list, continuation_token: str = None):
+    return json.dumps(dict(data=dict(items=items), continuationToken=continuation_token))
+
+
+def _datapoints(ts: dict, t: np.ndarray, v: np.ndarray, s: np.ndarray, continuation_token: str = None):
+    """Data points response, encoded from the arrays without creating an object per data point."""
+    item = json.dumps(dict(id=ts["id"], name=ts.get("name"), unit=ts.get("unit")))
+    return ('{"data": {"items": [' + item[:-1] + ', "datapoints": ' + encode_datapoints(t, v, s) + '}]}, ' +
+            '"continuationToken": ' + json.dumps(continuation_token) + '}')
+
+
+def _encode_token(state: dict):
+    return base64.urlsafe_b64encode(json.dumps(state).encode("utf-8")).decode("ascii")
+
+
+def _decode_token(token: str):
+    if token is None:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except ValueError:
+        raise ValueError("Invalid continuation token")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local mock of the Omnia Timeseries API.")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on")
+    parser.add_argument("--page-size", type=int, default=100000, help="maximum number of items per page")
+    parser.add_argument("--latency", type=float, default=0., help="processing time of each request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0., help="random extra latency (seconds)")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="concurrent requests before throttling")
+    parser.add_argument("--throttle-rate", type=float, default=0., help="fraction of requests throttled (429)")
+    parser.add_argument("--failure-rate", type=float, default=0., help="fraction of requests failing (503)")
+    parser.add_argument("--seed", type=int, default=None, help="seed of random throttling and failures")
+    args = parser.parse_args(argv)
+
+    server = MockTimeSeriesServer(host=args.host, port=args.port, page_size=args.page_size, latency=args.latency,
+                                  jitter=args.jitter, max_concurrency=args.max_concurrency,
+                                  throttle_rate=args.throttle_rate, failure_rate=args.failure_rate, seed=args.seed)
+    print(f"Serving mock Omnia Timeseries API on http://{args.host}:{server.port}, point the client at it with "
+          f"Config host='{args.host}:{server.port}', scheme='http' and authenticate=False.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
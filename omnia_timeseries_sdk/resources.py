@@ -2,10 +2,12 @@
 Data models of basic OMNIA resources
 """
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
+from datetime import datetime, timedelta, timezone
 from typing import List, Union
-from ._utils import make_serializable, from_datetime_string, to_camel_case
+from ._concurrency import map_concurrently
+from ._utils import make_serializable, from_datetime_string, to_camel_case, to_datetime64_array, to_value_array, \
+    to_status_array, from_datetime64, to_builtin
 
 
 class OmniaResource(object):
@@ -50,6 +52,7 @@ class OmniaResource(object):
         pandas.DataFrame
             The dataframe.
         """
+        import pandas as pd
         ignore = list() if ignore is None else ignore
         dumped = self.dump()
 
@@ -96,6 +99,7 @@ class OmniaResourceList(OmniaResource):
         pandas.DataFrame
             The dataframe.
         """
+        import pandas as pd
         return pd.DataFrame(self.dump())
 
 
@@ -111,8 +115,8 @@ class DataPoint(OmniaResource):
         Name of the time series which the datapoints belong to.
     unit : str, optional
         Physical unit of measure.
-    time : str, optional
-        ISO formatted date time string.
+    time : Union[str, datetime.datetime], optional
+        ISO formatted date time string or date time object.
     value : Union[int, float], optional
         Data point value.
     status : int, optional
@@ -122,12 +126,12 @@ class DataPoint(OmniaResource):
     """
 
     # TODO: Create aggregate properties (max, min, stdev, count etc), defined on init if any
-    def __init__(self, id: str = None, name: str = None, unit: str = None, time: str = None,
+    def __init__(self, id: str = None, name: str = None, unit: str = None, time: Union[str, datetime] = None,
                  value: Union[int, float] = None, status: int = None, omnia_client=None):
         self.id = id
         self.name = name
         self.unit = unit
-        self.time = from_datetime_string(time) if time is not None else None
+        self.time = from_datetime_string(time) if isinstance(time, str) else time
         self.value = value
         self.status = status
         self._omnia_client = omnia_client
@@ -149,7 +153,7 @@ class DataPoint(OmniaResource):
             the changes are committed.
 
         """
-        if self.id is not None:
+        if self.id is None:
             raise ValueError("The id of the parent time series must be specified.")
         else:
             self._omnia_client.time_series.add_data(self.id, [self.time], [self.value], [self.status], asynch=asynch)
@@ -167,47 +171,136 @@ class DataPoints(OmniaResourceList):
         Name of the time series which the datapoints belong to.
     unit : str, optional
         Physical unit of measure.
-    time : List[str], optional
-        ISO formatted date time string
-    values : List[Union[int, float]], optional
+    time : Union[List[Union[str, datetime.datetime]], numpy.ndarray], optional
+        ISO formatted date time strings, date time objects or numpy datetime64 array (UTC).
+    values : Union[List[Union[int, float]], numpy.ndarray], optional
         Data point values
+    status : Union[List[int], numpy.ndarray], optional
+        Data point status codes.
     omnia_client : OmniaClient, optional
         OMNIA client.
 
+    Notes
+    -----
+    The data points are stored column wise in numpy arrays, time as datetime64[ns] (UTC), value as float64 (object
+    if not numeric) and status as int32. DataPoint objects are only created when iterating or indexing.
+
     """
     # TODO: Create aggregate properties (max, min, stdev, count etc), based on DataPoint
-    def __init__(self, id: str = None, name: str = None, unit: str = None, time: List[str] = None,
-                 value: List[Union[int, float]] = None, omnia_client=None):
-        self.resources = [DataPoint(time=t, value=v, id=id, name=name, unit=unit) for t, v in zip(time, value)]
+    def __init__(self, id: str = None, name: str = None, unit: str = None, time: List[Union[str, datetime]] = None,
+                 value: List[Union[int, float]] = None, status: List[int] = None, omnia_client=None):
+        self._time = to_datetime64_array(time if time is not None else [])
+        self._value = to_value_array(value if value is not None else [])
+        self._status = to_status_array(status) if status is not None else None
+        if not len(self._time) == len(self._value):
+            raise ValueError("The number of items in `time` and `value` must be equal.")
+        if self._status is not None and not len(self._status) == len(self._time):
+            raise ValueError("The number of items in `time` and `status` must be equal.")
+
         self.id = id
         self.name = name
         self.unit = unit
         self._omnia_client = omnia_client
 
+    def __len__(self):
+        return len(self._time)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._datapoint(i)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return DataPoints(id=self.id, name=self.name, unit=self.unit, time=self._time[item],
+                              value=self._value[item], status=self._status[item] if self._status is not None else None,
+                              omnia_client=self._omnia_client)
+        return self._datapoint(range(len(self))[item])
+
+    def _datapoint(self, i: int):
+        """Create data point object from the i'th row."""
+        return DataPoint(id=self.id, name=self.name, unit=self.unit, time=from_datetime64(self._time[i]),
+                         value=to_builtin(self._value[i]),
+                         status=to_builtin(self._status[i]) if self._status is not None else None,
+                         omnia_client=self._omnia_client)
+
+    @property
+    def resources(self):
+        """List[DataPoint]: Data point objects."""
+        return list(self)
+
     @property
     def time(self):
         """List[datetime.datetime]: Datapoint's time."""
-        return [r.time for r in self.resources]
+        return [t.replace(tzinfo=timezone.utc) if t is not None else None
+                for t in self._time.astype("datetime64[us]").tolist()]
 
     @property
     def value(self):
         """List[Union[int, float]]: Datapoint's value."""
-        return [r.value for r in self.resources]
+        return self._value.tolist()
 
     @property
     def status(self):
         """List[int]: Datapoints' status."""
-        return [r.status for r in self.resources]
+        return self._status.tolist() if self._status is not None else [None] * len(self)
+
+    @property
+    def time_array(self):
+        """numpy.ndarray: Datapoints' time as datetime64[ns] (UTC)."""
+        return self._time
+
+    @property
+    def value_array(self):
+        """numpy.ndarray: Datapoints' value."""
+        return self._value
+
+    @property
+    def status_array(self):
+        """numpy.ndarray: Datapoints' status, None if unknown."""
+        return self._status
 
     @property
     def first(self):
         """DataPoint: Data point with the earliest time."""
-        return self.resources[0]
+        return self[0]
 
     @property
     def latest(self):
         """DataPoint: Data point with the latest time."""
-        return self.resources[-1]
+        return self[-1]
+
+    @classmethod
+    def merge(cls, dps: List["DataPoints"], omnia_client=None):
+        """
+        Merge data points of the same time series into one sorted instance without duplicates.
+
+        Parameters
+        ----------
+        dps : List[DataPoints]
+            Data points e.g. from adjacent or overlapping time windows.
+        omnia_client : OmniaClient, optional
+            OMNIA client.
+
+        Returns
+        -------
+        DataPoints
+            The merged data points. Id, name and unit are taken from the first instance.
+        """
+        if not dps:
+            return cls(time=[], value=[], omnia_client=omnia_client)
+
+        first = dps[0]
+        time = np.concatenate([_.time_array for _ in dps])
+        value = np.concatenate([_.value_array for _ in dps])
+        if any(_.status_array is None for _ in dps):
+            status = None
+        else:
+            status = np.concatenate([_.status_array for _ in dps])
+
+        # sorted unique times and the index of their first occurrence
+        time, index = np.unique(time, return_index=True)
+        return cls(id=first.id, name=first.name, unit=first.unit, time=time, value=value[index],
+                   status=status[index] if status is not None else None, omnia_client=omnia_client)
 
     def delete(self):
         # TODO: Difficult to implement with current web API
@@ -244,6 +337,7 @@ class DataPoints(OmniaResourceList):
         kwargs
             See pandas.DataFrame.plot for options.
         """
+        import matplotlib.pyplot as plt
         self.to_pandas().plot(**kwargs)
         plt.show()
 
@@ -262,17 +356,15 @@ class DataPoints(OmniaResourceList):
             The dataframe
 
         """
+        import pandas as pd
         # TODO: Add aggregates when ready
         if column_name == "name":
             header = f"{self.name} [{self.unit}]"
         else:
             header = f"{self.id} [{self.unit}]"
 
-        data = {
-            header: self.value
-        }
-
-        df = pd.DataFrame(data, index=pd.DatetimeIndex(data=self.time))
+        index = pd.DatetimeIndex(self._time, copy=False).tz_localize("UTC")
+        df = pd.DataFrame({header: self._value}, index=index, copy=False)
         return df
 
     def update(self, asynch: bool = False):
@@ -288,10 +380,11 @@ class DataPoints(OmniaResourceList):
             the changes are committed.
 
         """
-        if self.id is not None:
+        if self.id is None:
             raise ValueError("The id of the parent time series must be specified.")
         else:
-            self._omnia_client.time_series.add_data(self.id, self.time, self.value, self.status, asynch=asynch)
+            # the arrays are written as they are, without conversion to Python objects
+            self._omnia_client.time_series.add_data(self.id, self._time, self._value, self._status, asynch=asynch)
 
 
 class DataPointsList(OmniaResourceList):
@@ -302,9 +395,14 @@ class DataPointsList(OmniaResourceList):
     ----------
     dps : List[DataPoints]
         Data points
+    omnia_client : OmniaClient, optional
+        OMNIA client.
+    errors : List[tuple], optional
+        Time series id and exception for each time series which failed to retrieve data points.
     """
-    def __init__(self, dps: List[DataPoints], omnia_client=None):
+    def __init__(self, dps: List[DataPoints], omnia_client=None, errors: List[tuple] = None):
         self.resources = dps
+        self.errors = list() if errors is None else errors
         self._omnia_client = omnia_client
 
     def delete(self):
@@ -320,6 +418,7 @@ class DataPointsList(OmniaResourceList):
         kwargs
             See pandas.DataFrame.plot for options
         """
+        import matplotlib.pyplot as plt
         self.to_pandas().plot(**kwargs)
         plt.show()
 
@@ -337,6 +436,7 @@ class DataPointsList(OmniaResourceList):
         pandas.DataFrame
             The dataframe.
         """
+        import pandas as pd
         dfs = [dps.to_pandas(column_name=column_names) for dps in self]
         if dfs:
             df = pd.concat(dfs, axis="columns")
@@ -393,28 +493,40 @@ class TimeSeries(OmniaResource):
         self.changed_time = from_datetime_string(changed_time) if changed_time is not None else None
         self._omnia_client = omnia_client
 
-    def add_data(self, time: list, value: list, status: list, asynch: bool = False):
+    def add_data(self, time, value=None, status=None, asynch: bool = False, batch_size: int = None,
+                 max_workers: int = None):
         """
         Add or update datapoints on this time series.
 
         Parameters
         ----------
-        time : List[datetime.datetime]
-            Datetime of each datapoint.
-        value : List[Union[float, int, str]]
-            Value of each datapoint.
-        status : List[int]
-            Status of each datapoint.
+        time : Union[List[datetime.datetime], numpy.ndarray, pandas.Series, pandas.DataFrame]
+            Datetime of each datapoint, or a pandas Series/DataFrame of datapoints, see TimeSeriesAPI.add_data.
+        value : Union[List[Union[float, int, str]], numpy.ndarray, pandas.Series], optional
+            Value of each datapoint. Datapoints with missing (NaN or None) values are not written.
+        status : Union[List[int], numpy.ndarray, pandas.Series, int], optional
+            Status of each datapoint, or one status for all datapoints. Defaults to 0.
         asynch : bool, optional
             Determines whether the datapoints should be added or updated asynchronoulsy. If you set
             this to true only permission check will be performed and 202 Accepted will be returned.
             If you set this to false or do not supply it, the request will not be returned until
             the changes are committed.
+        batch_size : int, optional
+            Maximum number of datapoints per request. Defaults to `write_batch_size` in the client configuration.
+        max_workers : int, optional
+            Maximum number of concurrent requests. Defaults to `max_workers` in the client configuration.
+
+        Returns
+        -------
+        List[dict]
+            Summary of each batch written, see TimeSeriesAPI.add_data.
 
         """
-        self._omnia_client.time_series.add_data(self.id, time, value, status, asynch=asynch)
+        return self._omnia_client.time_series.add_data(self.id, time, value, status, asynch=asynch,
+                                                       batch_size=batch_size, max_workers=max_workers)
 
-    def data(self, start_time: str = None, end_time: str = None, limit=None, include_outside_points: bool = False):
+    def data(self, start_time: str = None, end_time: str = None, limit=None, include_outside_points: bool = False,
+             chunk_size: timedelta = None, max_workers: int = None, use_cache: bool = True):
         """
         Retrieves datapoints in a given time window according to applied parameters.
 
@@ -429,6 +541,13 @@ class TimeSeries(OmniaResource):
         include_outside_points: bool, optional
             Determines whether or not the points immediately prior to and following the time window should be
             included in result.
+        chunk_size : datetime.timedelta, optional
+            Split the time window into sub-windows of this length which are fetched concurrently.
+        max_workers : int, optional
+            Maximum number of concurrent requests when fetching in chunks. Defaults to `max_workers` in the client
+            configuration.
+        use_cache : bool, optional
+            Read from and fill the datapoint cache of the client, if any. Defaults to True.
 
         Returns
         -------
@@ -442,7 +561,9 @@ class TimeSeries(OmniaResource):
         """
         # TODO: Collect aggregated data (specify aggregates and granularity)
         return self._omnia_client.time_series.data(self.id, start_time=start_time, end_time=end_time, limit=limit,
-                                                   include_outside_points=include_outside_points)
+                                                   include_outside_points=include_outside_points,
+                                                   chunk_size=chunk_size, max_workers=max_workers,
+                                                   use_cache=use_cache)
 
     def delete(self):
         """
@@ -557,15 +678,23 @@ class TimeSeriesList(OmniaResourceList):
     ----------
     timeseries : List[TimeSeries]
         The various time series.
+    omnia_client : OmniaClient, optional
+        OMNIA client.
+    errors : List[tuple], optional
+        Time series id and exception for each time series which failed to be retrieved.
     """
-    def __init__(self, timeseries: List[TimeSeries], omnia_client=None):
+    def __init__(self, timeseries: List[TimeSeries], omnia_client=None, errors: List[tuple] = None):
         self.resources = timeseries
+        self.errors = list() if errors is None else errors
         self._omnia_client = omnia_client
 
-    def data(self, start_time: str = None, end_time: str = None, limit=None, include_outside_points: bool = False):
+    def data(self, start_time: str = None, end_time: str = None, limit=None, include_outside_points: bool = False,
+             max_workers: int = None, on_error: str = "raise"):
         """
         Retrieves datapoints in a given time window according to applied parameters.
 
+        The time series are queried concurrently.
+
         Parameters
         ----------
         start_time: str, optional
@@ -577,15 +706,32 @@ class TimeSeriesList(OmniaResourceList):
         include_outside_points: bool, optional
             Determines whether or not the points immediately prior to and following the time window should be
             included in result.
+        max_workers : int, optional
+            Maximum number of concurrent requests. Defaults to `max_workers` in the client configuration.
+        on_error : {'raise', 'skip', 'collect'}, optional
+            How to handle time series which fail. 'raise' raises the error, 'skip' logs and leaves them out and
+            'collect' leaves them out and stores the time series id and error in `DataPointsList.errors`.
+            Defaults to 'raise'.
 
         Returns
         -------
         DataPointsList
-            List of data points in time window for the various time series.
+            List of data points in time window for the various time series, in the order of this list.
 
         """
-        dps = [ts.data(start_time=start_time, end_time=end_time, limit=limit, include_outside_points=include_outside_points) for ts in self]
-        return DataPointsList(dps, omnia_client=self._omnia_client)
+        # lists built without a client use the client of their time series
+        omnia_client = self._omnia_client if self._omnia_client is not None or len(self) == 0 else \
+            self[0]._omnia_client
+        if max_workers is None:
+            max_workers = omnia_client.config.max_workers if omnia_client is not None else 1
+
+        def data(ts):
+            return ts.data(start_time=start_time, end_time=end_time, limit=limit,
+                           include_outside_points=include_outside_points)
+
+        dps, errors = map_concurrently(data, self, max_workers=max_workers, on_error=on_error)
+        errors = [(ts.id, e) for ts, e in errors] if on_error == "collect" else None
+        return DataPointsList(dps, omnia_client=omnia_client, errors=errors)
 
     def plot(self, start_time: str = None, end_time: str = None, limit=None, include_outside_points: bool = False, **kwargs):
         """
@@ -0,0 +1,314 @@
+"""
+Durable on-disk write spool.
+"""
+import json
+import logging
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from ._utils import to_datetime64_array, to_value_array, to_status_array, from_datetime_strings
+from .exceptions import OmniaTimeSeriesAPIError
+
+SEGMENT_SUFFIX = ".spool"
+CHECKPOINT_FILE = "checkpoint.json"
+REJECTED_FILE = "rejected.jsonl"
+
+
+class WriteSpool(object):
+    """
+    Write-ahead spool of datapoints, drained to the web API in the background.
+
+    Datapoints are appended to segment files in a local directory and return immediately. A background thread replays
+    the segments to the web API in large batches, records how far it got in a checkpoint file and removes segments
+    which have been written completely.
+
+    Parameters
+    ----------
+    omnia_client : OmniaClient
+        OMNIA client.
+    directory : str
+        Directory holding segment files and checkpoint. Created if it does not exist.
+    segment_size : int, optional
+        Start a new segment file when the current one exceeds this size (bytes). Defaults to `spool_segment_size` in
+        the client configuration.
+    batch_size : int, optional
+        Maximum number of datapoints replayed at a time. Defaults to `write_batch_size` in the client configuration.
+    drain_interval : float, optional
+        Time (seconds) between attempts to drain the spool when it is empty or the web API fails. Defaults to
+        `spool_drain_interval` in the client configuration.
+    asynch : bool, optional
+        Let the web API commit the datapoints asynchronously, see TimeSeriesAPI.add_data.
+    fsync : bool, optional
+        Force appended datapoints to disk before returning. Safer but slower. Defaults to True.
+
+    Notes
+    -----
+    Each segment holds one JSON document per line. A record torn by a crash is skipped when the spool is reopened,
+    all complete records are replayed from the last checkpoint. Datapoints acknowledged by the web API right before a
+    crash may be written twice, which is harmless as writing datapoints is idempotent.
+
+    Requests rejected by the web API with a client error (4xx, except 429 Too Many Requests) will not succeed when
+    retried. The records of the time series in such requests are moved to `rejected.jsonl` in the spool directory, so
+    they do not block the datapoints spooled after them. Other failures are retried.
+
+        with client.write_spool("/var/spool/omnia") as spool:
+            spool.append("ts-id", time, values, status)
+
+    """
+    def __init__(self, omnia_client, directory: str, segment_size: int = None, batch_size: int = None,
+                 drain_interval: float = None, asynch: bool = False, fsync: bool = True):
+        config = omnia_client.config
+        self.directory = directory
+        self.segment_size = config.spool_segment_size if segment_size is None else segment_size
+        self.batch_size = config.write_batch_size if batch_size is None else batch_size
+        self.drain_interval = config.spool_drain_interval if drain_interval is None else drain_interval
+        if self.batch_size < 1:
+            raise ValueError("The batch size must be a positive integer.")
+        self.asynch = asynch
+        self.fsync = fsync
+        self._omnia_client = omnia_client
+        self._lock = threading.Lock()           # guards the active segment
+        self._drain_lock = threading.RLock()    # guards the checkpoint and removal of segments
+        self._stop = threading.Event()
+        self._counters = dict(points_appended=0, points_drained=0, points_rejected=0, drain_errors=0)
+
+        os.makedirs(directory, exist_ok=True)
+        self._checkpoint = self._read_checkpoint()
+
+        # always append to a new segment, the last one may end with a record torn by a crash
+        self._active = max(self._segments() + [self._checkpoint[0]]) + 1
+        self._file = open(self._segment_path(self._active), "ab")
+
+        self._thread = threading.Thread(target=self._run, name="omnia-timeseries-sdk-spool", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def append(self, id: str, time, values, status):
+        """
+        Append datapoints of a time series to the spool.
+
+        Parameters
+        ----------
+        id : str
+            Time series id.
+        time : numpy.ndarray or List[datetime.datetime]
+            Datetime of each datapoint.
+        values : numpy.ndarray or List[Union[float, int, str]]
+            Value of each datapoint.
+        status : numpy.ndarray or List[int]
+            Status of each datapoint.
+        """
+        n = len(time)
+        if not n == len(values) == len(status):
+            raise ValueError("The number of items in `time`, `value` and `status` must be equal.")
+        if n == 0:
+            return
+
+        record = json.dumps(dict(id=id,
+                                 time=np.datetime_as_string(to_datetime64_array(time), unit="us",
+                                                            timezone="UTC").tolist(),
+                                 value=to_value_array(values).tolist(),
+                                 status=to_status_array(status).tolist()))
+        line = (record + "\n").encode("utf-8")
+
+        with self._lock:
+            if self._file is None:
+                raise RuntimeError("The spool is closed.")
+
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._counters["points_appended"] += n
+
+            if self._file.tell() >= self.segment_size:
+                self._rotate()
+
+    def drain(self):
+        """
+        Write a batch of spooled datapoints to the web API and advance the checkpoint.
+
+        Returns
+        -------
+        int
+            Number of datapoints written, 0 if the spool is empty.
+        """
+        with self._drain_lock:
+            records, position = self._read_batch()
+            if position is None:
+                return 0
+
+            data = OrderedDict()
+            for r in records:
+                t, v, s = data.setdefault(r["id"], ([], [], []))
+                t.append(from_datetime_strings(r["time"]))
+                v.extend(r["value"])
+                s.extend(r["status"])
+            data = OrderedDict((id, (np.concatenate(t), v, s)) for id, (t, v, s) in data.items())
+
+            summaries = list()
+            if data:
+                summaries = self._omnia_client.time_series.add_data_on_multiple(data, asynch=self.asynch,
+                                                                                batch_size=self.batch_size,
+                                                                                on_error="collect")
+            errors = [_["error"] for _ in summaries if _["error"] is not None]
+            for e in errors:
+                if not _is_permanent(e):
+                    raise e  # replay the whole batch later, writing datapoints is idempotent
+
+            rejected = {id for _ in summaries if _["error"] is not None for id in _["ids"]}
+            if rejected:
+                self._reject([_ for _ in records if _["id"] in rejected])
+
+            n = sum(len(_["time"]) for _ in records if _["id"] not in rejected)
+            self._write_checkpoint(position)
+            self._counters["points_drained"] += n
+            return n
+
+    def flush(self):
+        """Write all spooled datapoints to the web API. Errors are raised."""
+        with self._drain_lock:
+            while self._read_batch()[1] is not None:
+                self.drain()
+
+    def close(self):
+        """Stop the background thread and close the spool. Datapoints not yet written remain on disk."""
+        self._stop.set()
+        self._thread.join()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    @property
+    def stats(self):
+        """
+        dict: Counters of the spool, 'pending_bytes' (spooled but not yet written), 'segments' (segment files),
+        'points_appended', 'points_drained', 'points_rejected' (rejected by the web API) and 'drain_errors'.
+        """
+        checkpoint = self._checkpoint
+        segments, sizes = self._segments(), list()
+        for seq in segments:
+            try:
+                if seq >= checkpoint[0]:
+                    sizes.append(os.path.getsize(self._segment_path(seq)))
+            except FileNotFoundError:
+                pass  # removed by a concurrent drain
+        pending = sum(sizes) - (checkpoint[1] if segments and segments[0] == checkpoint[0] else 0)
+        return dict(pending_bytes=max(pending, 0), segments=len(segments), **self._counters)
+
+    def _run(self):
+        """Drain the spool in the background."""
+        while not self._stop.is_set():
+            try:
+                if self.drain() > 0:
+                    continue
+            except Exception:
+                self._counters["drain_errors"] += 1
+                logging.error("Failed writing spooled datapoints, retrying later.", exc_info=True)
+
+            self._stop.wait(self.drain_interval)
+
+    def _rotate(self):
+        """Seal the active segment and start a new one. Call with `_lock` held."""
+        self._file.close()
+        self._active += 1
+        self._file = open(self._segment_path(self._active), "ab")
+
+    def _reject(self, records: list):
+        """Move records rejected by the web API to the file of rejected records. Call with `_drain_lock` held."""
+        n = sum(len(_["time"]) for _ in records)
+        logging.error(f"The web API rejected {n} spooled datapoints of time series "
+                      f"{', '.join(sorted({_['id'] for _ in records}))}, moving them to {REJECTED_FILE}.")
+        with open(os.path.join(self.directory, REJECTED_FILE), "a") as f:
+            for r in records:
+                f.write(json.dumps(r) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._counters["points_rejected"] += n
+
+    def _read_batch(self):
+        """
+        Read complete records after the checkpoint, up to the batch size.
+
+        Returns
+        -------
+        tuple
+            List of records and the position (segment, offset) after the last record read, None if nothing was read.
+        """
+        with self._lock:
+            active = self._active
+
+        segment, offset = self._checkpoint
+        records, position, n = list(), None, 0
+        for seq in self._segments():
+            if seq < segment:
+                continue
+            if seq > segment:
+                segment, offset = seq, 0
+                position = (segment, offset)
+
+            with open(self._segment_path(seq), "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # incomplete, being written or torn by a crash
+
+                    offset += len(line)
+                    position = (segment, offset)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logging.warning(f"Skipping corrupt record in spool segment {seq}.")
+                        continue
+
+                    records.append(record)
+                    n += len(record["time"])
+                    if n >= self.batch_size:
+                        return records, position
+
+            if seq == active:
+                break
+
+        return records, position
+
+    def _segments(self):
+        """Sequence numbers of segment files, ascending."""
+        return sorted(int(_[:-len(SEGMENT_SUFFIX)]) for _ in os.listdir(self.directory) if _.endswith(SEGMENT_SUFFIX))
+
+    def _segment_path(self, seq: int):
+        return os.path.join(self.directory, f"{seq:016d}{SEGMENT_SUFFIX}")
+
+    def _read_checkpoint(self):
+        """Position (segment, offset) up to which datapoints have been written."""
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT_FILE), "r") as f:
+                c = json.load(f)
+            return c["segment"], c["offset"]
+        except FileNotFoundError:
+            return 0, 0
+
+    def _write_checkpoint(self, position: tuple):
+        """Atomically replace checkpoint and remove segments which have been written completely."""
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(dict(segment=position[0], offset=position[1]), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self._checkpoint = position
+
+        for seq in self._segments():
+            if seq < position[0]:
+                os.remove(self._segment_path(seq))
+
+
+def _is_permanent(e: Exception):
+    """True if the web API rejected the request and retrying it will fail again."""
+    return isinstance(e, OmniaTimeSeriesAPIError) and 400 <= e.status < 500 and e.status not in (408, 429)
@@ -2,9 +2,15 @@
 Timeseries API
 """
 import datetime
+import json
+import logging
+import numpy as np
+from contextlib import nullcontext
 from typing import List
 from .resources import DataPoint, DataPoints, TimeSeries, TimeSeriesList
-from ._utils import to_omnia_datetime_string
+from ._concurrency import map_concurrently
+from ._utils import to_omnia_datetime_string, to_utc_datetime, from_datetime_strings, from_datetime64, \
+    to_datapoint_arrays, encode_datapoints
 
 
 class TimeSeriesAPI(object):
@@ -52,7 +58,7 @@ class TimeSeriesAPI(object):
         body = dict(name=name, description=description, step=step, unit=unit, asset_id=asset_id,
                     external_id=external_id)
         items = self._omnia_client.post(self._resource_path, self._api_version, "", body=body)
-        return TimeSeries(**items[0], omnia_client=self._omnia_client)
+        return self._cached(TimeSeries(**items[0], omnia_client=self._omnia_client))
 
     def update(self, id: str, name: str = None, description: str = None, asset_id: str = None, unit: str = None,
                external_id: str = None, step: bool = False):
@@ -85,7 +91,11 @@ class TimeSeriesAPI(object):
         # only name is mandatory
         body = dict(name=name, description=description, step=step, unit=unit, asset_id=asset_id,
                     external_id=external_id)
-        items = self._omnia_client.patch(self._resource_path, self._api_version, id, body=body)
+        # invalidate after the request as well, concurrent retrieves may cache the old metadata in the meantime
+        try:
+            items = self._omnia_client.patch(self._resource_path, self._api_version, id, body=body)
+        finally:
+            self._invalidate_metadata(id)
         return TimeSeries(**items[0], omnia_client=self._omnia_client)
 
     def delete(self, id: str):
@@ -98,7 +108,10 @@ class TimeSeriesAPI(object):
             Time series id.
 
         """
-        return self._omnia_client.delete(self._resource_path, self._api_version, id)
+        try:
+            return self._omnia_client.delete(self._resource_path, self._api_version, id)
+        finally:
+            self._invalidate_metadata(id)
 
     def list(self, name: str = None, external_id: str = None, asset_id: str = None, limit: int = None, skip: int = None,
              continuation_token: str = None):
@@ -133,9 +146,39 @@ class TimeSeriesAPI(object):
         parameters = dict(name=name, external_id=external_id, asset_id=asset_id, limit=limit, skip=skip,
                           continuation_token=continuation_token)
         items = self._omnia_client.get(self._resource_path, self._api_version, "", parameters=parameters)
-        return TimeSeriesList([TimeSeries(**item, omnia_client=self._omnia_client) for item in items])
+        return TimeSeriesList([self._cached(TimeSeries(**item, omnia_client=self._omnia_client)) for item in items],
+                              omnia_client=self._omnia_client)
+
+    def iter_list(self, name: str = None, external_id: str = None, asset_id: str = None, limit: int = None,
+                  skip: int = None):
+        """
+        Iterate over all timeseries page by page.
+
+        Parameters
+        ----------
+        name : str, optional
+            Name of the timeseries
+        external_id : str, optional
+            ID from another (external) system provided by client
+        asset_id : str, optional
+            ID of the asset this timeseries belongs to
+        limit : int, optional
+            Limit the number of results to retrieve, between 1-1000.
+        skip : int, optional
+            Retrieve results except the `skip` first ones.
+
+        Yields
+        ------
+        TimeSeriesList
+            Time series resources of each response page as soon as it is received.
+
+        """
+        parameters = dict(name=name, external_id=external_id, asset_id=asset_id, limit=limit, skip=skip)
+        for items in self._omnia_client.get_pages(self._resource_path, self._api_version, "", parameters=parameters):
+            yield TimeSeriesList([self._cached(TimeSeries(**item, omnia_client=self._omnia_client)) for item in items],
+                                 omnia_client=self._omnia_client)
 
-    def retrieve(self, id: str):
+    def retrieve(self, id: str, use_cache: bool = True):
         """
         Retrieve a single time series by id.
 
@@ -143,6 +186,8 @@ class TimeSeriesAPI(object):
         ----------
         id : str
             Time series id.
+        use_cache : bool, optional
+            Look up the time series in the metadata cache of the client before requesting it. Defaults to True.
 
         Returns
         -------
@@ -150,61 +195,274 @@ class TimeSeriesAPI(object):
             Time series instance.
 
         """
+        cache = getattr(self._omnia_client, "metadata_cache", None)
+        if cache is not None and use_cache:
+            ts = cache.get(id)
+            if ts is not None:
+                ts._omnia_client = self._omnia_client
+                return ts
+
         items = self._omnia_client.get(self._resource_path, self._api_version, id)
-        return TimeSeries(**items[0], omnia_client=self._omnia_client)
+        return self._cached(TimeSeries(**items[0], omnia_client=self._omnia_client))
 
-    def retrieve_multiple(self, ids: list):
+    def retrieve_by_external_id(self, external_id: str, use_cache: bool = True):
+        """
+        Retrieve a single time series by external id.
+
+        Parameters
+        ----------
+        external_id : str
+            ID from another (external) system provided by client.
+        use_cache : bool, optional
+            Look up the time series in the metadata cache of the client before requesting it. Defaults to True.
+
+        Returns
+        -------
+        TimeSeries
+            Time series instance, None if there is no time series with this external id.
+
+        """
+        cache = getattr(self._omnia_client, "metadata_cache", None)
+        if cache is not None and use_cache:
+            ts = cache.get_by_external_id(external_id)
+            if ts is not None:
+                ts._omnia_client = self._omnia_client
+                return ts
+
+        timeseries = self.list(external_id=external_id, limit=1)
+        return timeseries.resources[0] if len(timeseries) > 0 else None
+
+    def retrieve_multiple(self, ids: list, max_workers: int = None, on_error: str = "raise"):
         """
         Retrieve multiple time series by id.
 
+        The time series are retrieved concurrently.
+
         Parameters
         ----------
         ids : list[str]
             Times series id.
+        max_workers : int, optional
+            Maximum number of concurrent requests. Defaults to `max_workers` in the client configuration.
+        on_error : {'raise', 'skip', 'collect'}, optional
+            How to handle time series which fail. 'raise' raises the error, 'skip' logs and leaves them out and
+            'collect' leaves them out and stores the time series id and error in `TimeSeriesList.errors`.
+            Defaults to 'raise'.
 
         Returns
         -------
         TimeSeriesList
-            List of time series instances
+            List of time series instances, in the order of `ids`.
 
         """
         # TODO: Update when Timeseries API support retrieving multiple timeseries by id
-        timeseries = [self.retrieve(id) for id in ids]
-        return TimeSeriesList(timeseries, omnia_client=self._omnia_client)
+        if max_workers is None:
+            max_workers = self._omnia_client.config.max_workers
+
+        timeseries, errors = map_concurrently(self.retrieve, ids, max_workers=max_workers, on_error=on_error)
+        errors = errors if on_error == "collect" else None
+        return TimeSeriesList(timeseries, omnia_client=self._omnia_client, errors=errors)
 
     def search(self):
         raise NotImplementedError
 
-    def add_data(self, id: str, time: List, values: List, status: List, asynch: bool = False):
+    def add_data(self, id: str, time, values=None, status=None, asynch: bool = False, batch_size: int = None,
+                 max_workers: int = None, on_error: str = "raise"):
         """
         Add or update a timeseries' datapoints.
 
+        Large inputs are split into batches which are written concurrently.
+
         Parameters
         ----------
         id : str
             Id of timeseries for which to add or update datapoints.
-        time : List[datetime.datetime]
-            Datetime of each datapoint.
-        values : List[Union[float, int, str]]
-            Value of each datapoint.
-        status : List[int]
-            Status of each datapoint.
+        time : Union[List[datetime.datetime], numpy.ndarray, pandas.Series, pandas.DataFrame]
+            Datetime of each datapoint, as date time objects, numpy datetime64 array or pandas date times. Naive date
+            times are assumed to be in UTC. Alternatively a pandas Series of values with a datetime index, or a
+            pandas DataFrame with a datetime index and columns 'value' and optionally 'status'.
+        values : Union[List[Union[float, int, str]], numpy.ndarray, pandas.Series], optional
+            Value of each datapoint. Datapoints with missing (NaN or None) values are not written.
+        status : Union[List[int], numpy.ndarray, pandas.Series, int], optional
+            Status of each datapoint, or one status for all datapoints. Defaults to 0.
         asynch : bool, optional
             Determines whether the datapoints should be added or updated asynchronoulsy. If you set this to true only
             permission check will be performed and 202 Accepted will be returned. If you set this to false or do not
             supply it, the request will not be returned until the changes are committed.
+        batch_size : int, optional
+            Maximum number of datapoints per request. Defaults to `write_batch_size` in the client configuration.
+            Batches with a body larger than `write_max_body_size` are split further.
+        max_workers : int, optional
+            Maximum number of concurrent requests. Defaults to `max_workers` in the client configuration.
+        on_error : {'raise', 'collect'}, optional
+            How to handle batches which fail. 'raise' raises the error, 'collect' continues and reports the error in
+            the summary. Defaults to 'raise'.
 
+        Returns
+        -------
+        List[dict]
+            Summary of each batch with keys 'batch' (number), 'points' (number of datapoints), 'written' (number of
+            datapoints written), 'first_time' and 'last_time' (UTC time of first and last datapoint) and 'error'
+            (exception, None if successful).
+
+        Notes
+        -----
+        Each batch is retried separately if it fails transiently, writing datapoints is idempotent.
+
+        """
+        if on_error not in ("raise", "collect"):
+            raise ValueError(f"Invalid failure policy '{on_error}'. Choose one of raise, collect.")
+
+        config = self._omnia_client.config
+        batch_size = config.write_batch_size if batch_size is None else batch_size
+        max_workers = config.max_workers if max_workers is None else max_workers
+        if batch_size < 1:
+            raise ValueError("The batch size must be a positive integer.")
+
+        # convert once, batches are views of the arrays
+        arrays = to_datapoint_arrays(time, values, status)
+        n = len(arrays[0])
+        batches = [(i, slice(start, start + batch_size)) for i, start in enumerate(range(0, n, batch_size))]
+
+        def write(batch):
+            i, s = batch
+            t = arrays[0][s]
+            summary = dict(batch=i, points=len(t), written=0, first_time=from_datetime64(t[0]),
+                           last_time=from_datetime64(t[-1]), error=None)
+            try:
+                summary["written"] = self._write_batch(id, *(_[s] for _ in arrays), asynch=asynch)
+            except Exception as e:
+                if on_error == "raise":
+                    raise
+                logging.error(f"Failed writing batch {i} of time series '{id}'. {e}")
+                summary["error"] = e
+            return summary
+
+        summaries, _ = map_concurrently(write, batches, max_workers=max_workers)
+        self._invalidate_cache(id)
+        return summaries
+
+    def _write_batch(self, id: str, time: np.ndarray, values: np.ndarray, status: np.ndarray, asynch: bool = False):
         """
-        if not len(time) == len(values) == len(status):
-            raise ValueError("The number of items in `time`, `value` and `status` must be equal.")
+        Write a batch of datapoints, splitting it in halves if the request body is too large.
+
+        The datapoints are arrays as returned by `to_datetime64_array`, `to_value_array` and `to_status_array`.
+
+        Returns
+        -------
+        int
+            Number of datapoints written.
+        """
+        body = '{"datapoints": ' + encode_datapoints(time, values, status) + '}'
+        if len(body) > self._omnia_client.config.write_max_body_size and len(time) > 1:
+            half = len(time) // 2
+            return (self._write_batch(id, time[:half], values[:half], status[:half], asynch=asynch) +
+                    self._write_batch(id, time[half:], values[half:], status[half:], asynch=asynch))
 
         parameters = {"async": asynch}
-        body = dict(datapoints=[dict(time=to_omnia_datetime_string(t), value=v, status=s) for t, v, s in zip(time, values, status)])
         _ = self._omnia_client.post(self._resource_path, self._api_version, f"{id}/data", parameters=parameters,
-                                    body=body)
+                                    body=body, idempotent=True)
+        return len(time)
 
-    def add_data_on_multiple(self, id: str):
-        raise NotImplementedError
+    def add_data_on_multiple(self, data, status: int = 0, asynch: bool = False, batch_size: int = None,
+                             max_workers: int = None, on_error: str = "raise"):
+        """
+        Add or update datapoints on multiple timeseries.
+
+        The datapoints are packed into as few requests as possible which are written concurrently.
+
+        Parameters
+        ----------
+        data : Union[Dict[str, Union[tuple, pandas.Series, pandas.DataFrame]], pandas.DataFrame]
+            Datapoints per timeseries id, either as a mapping of id to (time, value, status) or any other input
+            accepted by `add_data`, or as a wide data frame with a datetime index and one column of values per
+            timeseries id. Missing (NaN) values are not written.
+        status : int, optional
+            Status of the datapoints if `data` is a data frame. Defaults to 0.
+        asynch : bool, optional
+            Determines whether the datapoints should be added or updated asynchronoulsy. If you set this to true only
+            permission check will be performed and 202 Accepted will be returned. If you set this to false or do not
+            supply it, the request will not be returned until the changes are committed.
+        batch_size : int, optional
+            Maximum number of datapoints per request. Defaults to `write_batch_size` in the client configuration.
+            Requests with a body larger than `write_max_body_size` are split further.
+        max_workers : int, optional
+            Maximum number of concurrent requests. Defaults to `max_workers` in the client configuration.
+        on_error : {'raise', 'collect'}, optional
+            How to handle requests which fail. 'raise' raises the error, 'collect' continues and reports the error in
+            the summary. Defaults to 'raise'.
+
+        Returns
+        -------
+        List[dict]
+            Summary of each request with keys 'batch' (number), 'ids' (timeseries ids), 'points' (number of
+            datapoints), 'written' (number of datapoints written) and 'error' (exception, None if successful).
+
+        """
+        if on_error not in ("raise", "collect"):
+            raise ValueError(f"Invalid failure policy '{on_error}'. Choose one of raise, collect.")
+
+        if hasattr(data, "columns") and hasattr(data, "index"):
+            # wide data frame, one column per time series
+            data = {str(column): (data[column], None, status) for column in data.columns}
+
+        config = self._omnia_client.config
+        batch_size = config.write_batch_size if batch_size is None else batch_size
+        max_workers = config.max_workers if max_workers is None else max_workers
+        if batch_size < 1:
+            raise ValueError("The batch size must be a positive integer.")
+
+        items = list()
+        for id, datapoints in data.items():
+            try:
+                arrays = to_datapoint_arrays(*(datapoints if isinstance(datapoints, tuple) else (datapoints,)))
+            except ValueError as e:
+                raise ValueError(f"Invalid datapoints of time series '{id}'. {e}")
+            if len(arrays[0]) > 0:
+                items.append((id,) + arrays)
+
+        batches = list(enumerate(_pack(items, batch_size)))
+
+        def write(batch):
+            i, pack = batch
+            summary = dict(batch=i, ids=[_[0] for _ in pack], points=sum(len(_[1]) for _ in pack), written=0,
+                           error=None)
+            try:
+                summary["written"] = self._write_multiple_batch(pack, asynch=asynch)
+            except Exception as e:
+                if on_error == "raise":
+                    raise
+                logging.error(f"Failed writing batch {i} of time series {', '.join(summary['ids'])}. {e}")
+                summary["error"] = e
+            return summary
+
+        summaries, _ = map_concurrently(write, batches, max_workers=max_workers)
+        for id, *_ in items:
+            self._invalidate_cache(id)
+        return summaries
+
+    def _write_multiple_batch(self, items: List[tuple], asynch: bool = False):
+        """
+        Write a batch of datapoints on multiple time series, splitting it if the request body is too large.
+
+        The datapoints of each time series are arrays like in `_write_batch`.
+
+        Returns
+        -------
+        int
+            Number of datapoints written.
+        """
+        n = sum(len(_[1]) for _ in items)
+        body = '{"items": [' + ", ".join('{"id": ' + json.dumps(id) + ', "datapoints": ' +
+                                         encode_datapoints(time, values, status) + '}'
+                                         for id, time, values, status in items) + ']}'
+        if len(body) > self._omnia_client.config.write_max_body_size and n > 1:
+            return sum(self._write_multiple_batch(_, asynch=asynch) for _ in _pack(items, (n + 1) // 2))
+
+        parameters = {"async": asynch}
+        _ = self._omnia_client.post(self._resource_path, self._api_version, "data", parameters=parameters,
+                                    body=body, idempotent=True)
+        return n
 
     def delete_data(self, id: str, start_time: str = None, end_time: str = None):
         """
@@ -222,8 +480,10 @@ class TimeSeriesAPI(object):
         """
         parameters = dict(start_time=start_time, end_time=end_time)
         _ = self._omnia_client.delete(self._resource_path, self._api_version, f"{id}/data", parameters=parameters)
+        self._invalidate_cache(id)
 
-    def data(self, id: str, start_time: str = None, end_time: str = None, limit=None, include_outside_points: bool = False):
+    def data(self, id: str, start_time: str = None, end_time: str = None, limit=None, include_outside_points: bool = False,
+             chunk_size: datetime.timedelta = None, max_workers: int = None, use_cache: bool = True):
         """
         Retrieves datapoints in a given time window according to applied parameters.
 
@@ -240,6 +500,15 @@ class TimeSeriesAPI(object):
         include_outside_points: bool, optional
             Determines whether or not the points immediately prior to and following the time window should be
             included in result.
+        chunk_size : datetime.timedelta, optional
+            Split the time window into sub-windows of this length which are fetched concurrently and merged. By
+            default the whole window is fetched page by page in one request chain.
+        max_workers : int, optional
+            Maximum number of concurrent requests when fetching in chunks. Defaults to `max_workers` in the client
+            configuration.
+        use_cache : bool, optional
+            Read from and fill the datapoint cache of the client, if any. Points outside the time window are never
+            cached. Defaults to True.
 
         Returns
         -------
@@ -252,16 +521,120 @@ class TimeSeriesAPI(object):
         if start_time is None:
             start_time = to_omnia_datetime_string(datetime.datetime.utcnow() - datetime.timedelta(days=1))
 
+        cache = getattr(self._omnia_client, "datapoint_cache", None)
+        if cache is not None and use_cache and not include_outside_points:
+            def fetch(start, end, limit_):
+                return self.data(id, start_time=start, end_time=end, limit=limit_, chunk_size=chunk_size,
+                                 max_workers=max_workers, use_cache=False)
+
+            return cache.data(id, start_time, end_time, fetch, limit=limit, omnia_client=self._omnia_client)
+
+        if chunk_size is not None:
+            return self._chunked_data(id, start_time, end_time, chunk_size, limit=limit,
+                                      include_outside_points=include_outside_points, max_workers=max_workers)
+
         parameters = dict(start_time=start_time, end_time=end_time, limit=limit, include_outside_points=include_outside_points)
         items = self._omnia_client.get(self._resource_path, self._api_version, f"{id}/data", parameters=parameters)
-        ts = items[0]   # should be only 1 time series
-        id = ts.get("id")
-        name = ts.get("name")
-        unit = ts.get("unit")
+        return self._datapoints(items[0])   # should be only 1 time series
+
+    def iter_data(self, id: str, start_time: str = None, end_time: str = None, limit=None,
+                  include_outside_points: bool = False):
+        """
+        Iterate over datapoints in a given time window page by page.
+
+        Parameters
+        ----------
+        id : str
+            Time series id
+        start_time: str, optional
+            Start of data window, date-time in ISO format (RFC3339), defaults to 1 day ago.
+        end_time: str, optional
+            End of data window, date-time in ISO format (RFC3339), defaults to now.
+        limit : int, optional
+            Limit of datapoints to retrieve from within the time window.
+        include_outside_points: bool, optional
+            Determines whether or not the points immediately prior to and following the time window should be
+            included in result.
+
+        Yields
+        ------
+        DataPoints
+            Time series data points of each response page as soon as it is received.
+
+        Notes
+        -----
+        Only one page is held in memory at a time, which allows processing very long time windows in constant memory.
+
+        """
+        if end_time is None:
+            end_time = to_omnia_datetime_string(datetime.datetime.utcnow())
+        if start_time is None:
+            start_time = to_omnia_datetime_string(datetime.datetime.utcnow() - datetime.timedelta(days=1))
+
+        parameters = dict(start_time=start_time, end_time=end_time, limit=limit, include_outside_points=include_outside_points)
+        for items in self._omnia_client.get_pages(self._resource_path, self._api_version, f"{id}/data",
+                                                  parameters=parameters):
+            yield self._datapoints(items[0])
+
+    def _cached(self, ts: TimeSeries):
+        """Add time series to the metadata cache of the client, if any."""
+        cache = getattr(self._omnia_client, "metadata_cache", None)
+        if cache is not None:
+            cache.put(ts)
+        return ts
+
+    def _invalidate_metadata(self, id: str):
+        """Remove time series from the metadata cache of the client, if any."""
+        cache = getattr(self._omnia_client, "metadata_cache", None)
+        if cache is not None:
+            cache.invalidate(id)
+
+    def _invalidate_cache(self, id: str):
+        """Remove cached datapoints of a time series which has been written to."""
+        cache = getattr(self._omnia_client, "datapoint_cache", None)
+        if cache is not None:
+            cache.invalidate(id)
+
+    def _datapoints(self, ts: dict):
+        """Create data points from a decoded response item."""
         dps = ts.get("datapoints")
-        time = [dp.get("time") for dp in dps]
-        value = [dp.get("value") for dp in dps]
-        return DataPoints(id=id, name=name, unit=unit, time=time, value=value, omnia_client=self._omnia_client)
+        instrumentation = getattr(self._omnia_client, "instrumentation", None)
+        stage = nullcontext() if instrumentation is None else \
+            instrumentation.stage("build", items=len(dps.get("time") or ()))
+        with stage:
+            return DataPoints(id=ts.get("id"), name=ts.get("name"), unit=ts.get("unit"),
+                              time=from_datetime_strings(dps.get("time")), value=dps.get("value"),
+                              status=dps.get("status"), omnia_client=self._omnia_client)
+
+    def _chunked_data(self, id: str, start_time: str, end_time: str, chunk_size: datetime.timedelta, limit=None,
+                      include_outside_points: bool = False, max_workers: int = None):
+        """
+        Retrieves datapoints by splitting the time window into sub-windows which are fetched concurrently.
+
+        See `data` for a description of the parameters.
+        """
+        if chunk_size <= datetime.timedelta(0):
+            raise ValueError("The chunk size must be a positive time interval.")
+        if max_workers is None:
+            max_workers = self._omnia_client.config.max_workers
+
+        start, end = to_utc_datetime(start_time), to_utc_datetime(end_time)
+        windows = list()
+        while start < end:
+            windows.append((start, min(start + chunk_size, end)))
+            start += chunk_size
+
+        def fetch(window):
+            return self.data(id, start_time=to_omnia_datetime_string(window[0]),
+                             end_time=to_omnia_datetime_string(window[1]), limit=limit,
+                             include_outside_points=include_outside_points, use_cache=False)
+
+        # the outside points of inner windows lie within neighbouring windows and are removed as duplicates
+        chunks, _ = map_concurrently(fetch, windows, max_workers=max_workers)
+        dps = DataPoints.merge(chunks, omnia_client=self._omnia_client)
+        if limit is not None and len(dps) > limit:
+            dps = dps[:limit]
+        return dps
 
     def first_data(self, id: str, after_time: str = None):
         """
@@ -287,8 +660,10 @@ class TimeSeriesAPI(object):
         id = ts.get("id")
         name = ts.get("name")
         unit = ts.get("unit")
-        dp = ts.get("datapoints")[0]
-        return DataPoint(id=id, name=name, unit=unit, **dp, omnia_client=self._omnia_client)
+        dps = ts.get("datapoints")
+        time = from_datetime64(from_datetime_strings(dps.get("time")[:1])[0])
+        return DataPoint(id=id, name=name, unit=unit, time=time, value=dps.get("value")[0],
+                         status=dps.get("status")[0], omnia_client=self._omnia_client)
 
     def latest_data(self, id: str, before_time: str = None):
         """
@@ -313,9 +688,40 @@ class TimeSeriesAPI(object):
         id = ts.get("id")
         name = ts.get("name")
         unit = ts.get("unit")
-        dp = ts.get("datapoints")[0]
-        return DataPoint(id=id, name=name, unit=unit, **dp, omnia_client=self._omnia_client)
-
+        dps = ts.get("datapoints")
+        time = from_datetime64(from_datetime_strings(dps.get("time")[:1])[0])
+        return DataPoint(id=id, name=name, unit=unit, time=time, value=dps.get("value")[0],
+                         status=dps.get("status")[0], omnia_client=self._omnia_client)
 
 
+def _pack(items: List[tuple], capacity: int):
+    """
+    Pack datapoints of multiple time series into batches of limited size.
 
+    Parameters
+    ----------
+    items : List[tuple]
+        Time series id, time, values and status of each time series.
+    capacity : int
+        Maximum number of datapoints per batch.
+
+    Returns
+    -------
+    List[List[tuple]]
+        Batches of (id, time, values, status). The datapoints of a time series are split across batches if needed.
+    """
+    batches, batch, room = list(), list(), capacity
+    for id, time, values, status in items:
+        start = 0
+        while start < len(time):
+            s = slice(start, start + min(room, len(time) - start))
+            batch.append((id, time[s], values[s], status[s]))
+            room -= s.stop - s.start
+            start = s.stop
+            if room == 0:
+                batches.append(batch)
+                batch, room = list(), capacity
+
+    if batch:
+        batches.append(batch)
+    return batches
@@ -0,0 +1,215 @@
+"""
+Buffered datapoint writer.
+"""
+import logging
+import threading
+import time
+import numpy as np
+from collections import defaultdict, deque
+from .exceptions import OmniaBufferFullError
+
+
+class BufferedWriter(object):
+    """
+    Buffer datapoints from many threads and write them in batches in the background.
+
+    Parameters
+    ----------
+    omnia_client : OmniaClient
+        OMNIA client.
+    flush_size : int, optional
+        Flush when this many datapoints are buffered. Defaults to `writer_flush_size` in the client configuration.
+    flush_interval : float, optional
+        Flush at least this often (seconds). Defaults to `writer_flush_interval` in the client configuration.
+    max_buffer : int, optional
+        Maximum number of buffered datapoints. Appending blocks while the buffer is full. Defaults to
+        `writer_max_buffer` in the client configuration.
+    asynch : bool, optional
+        Let the web API commit the datapoints asynchronously, see TimeSeriesAPI.add_data.
+
+    Notes
+    -----
+    Datapoints are grouped per time series and written with TimeSeriesAPI.add_data_on_multiple. Datapoints of a
+    failed flush are dropped after the retries of the client are exhausted, see `stats` for error counters.
+
+    Use the writer as a context manager, or call `close()`, to flush the remaining datapoints and stop the background
+    thread.
+
+        with client.buffered_writer() as writer:
+            writer.append("ts-id", datetime.now(timezone.utc), 42., 0)
+
+    """
+    def __init__(self, omnia_client, flush_size: int = None, flush_interval: float = None, max_buffer: int = None,
+                 asynch: bool = False):
+        config = omnia_client.config
+        self.flush_size = config.writer_flush_size if flush_size is None else flush_size
+        self.flush_interval = config.writer_flush_interval if flush_interval is None else flush_interval
+        self.max_buffer = config.writer_max_buffer if max_buffer is None else max_buffer
+        if not 0 < self.flush_size <= self.max_buffer:
+            raise ValueError("The flush size must be positive and not exceed the maximum buffer size.")
+        self.asynch = asynch
+        self._omnia_client = omnia_client
+        self._buffer = defaultdict(lambda: ([], [], []))   # id -> (time, value, status)
+        self._size = 0
+        self._pending = 0   # datapoints being written
+        self._closed = False
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flush_latencies = deque(maxlen=1000)
+        self._counters = dict(flushes=0, points_written=0, points_failed=0, errors=0)
+        self._thread = threading.Thread(target=self._run, name="omnia-timeseries-sdk-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, id: str, time, value, status: int = 0, timeout: float = None):
+        """
+        Append a datapoint.
+
+        Parameters
+        ----------
+        id : str
+            Time series id.
+        time : datetime.datetime
+            Datetime of the datapoint.
+        value : Union[float, int, str]
+            Value of the datapoint.
+        status : int, optional
+            Status of the datapoint. Defaults to 0.
+        timeout : float, optional
+            Maximum time (seconds) to wait while the buffer is full. Waits indefinitely by default.
+
+        Raises
+        ------
+        OmniaBufferFullError
+            If the buffer is still full after `timeout` seconds.
+        """
+        self.extend(id, [time], [value], [status], timeout=timeout)
+
+    def extend(self, id: str, time: list, values: list, status: list, timeout: float = None):
+        """
+        Append multiple datapoints of a time series.
+
+        Parameters
+        ----------
+        id : str
+            Time series id.
+        time : List[datetime.datetime]
+            Datetime of each datapoint.
+        values : List[Union[float, int, str]]
+            Value of each datapoint.
+        status : List[int]
+            Status of each datapoint.
+        timeout : float, optional
+            Maximum time (seconds) to wait while the buffer is full. Waits indefinitely by default.
+
+        Raises
+        ------
+        OmniaBufferFullError
+            If the buffer is still full after `timeout` seconds.
+        """
+        n = len(time)
+        if not n == len(values) == len(status):
+            raise ValueError("The number of items in `time`, `value` and `status` must be equal.")
+        if n > self.max_buffer:
+            raise ValueError("The number of datapoints exceeds the maximum buffer size.")
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The writer is closed.")
+
+            # backpressure, wait until pending writes have completed and made room
+            if not self._condition.wait_for(lambda: self._size + self._pending + n <= self.max_buffer or self._closed,
+                                            timeout):
+                raise OmniaBufferFullError(f"The write buffer is full ({self._size + self._pending} datapoints).")
+            if self._closed:
+                raise RuntimeError("The writer is closed.")
+
+            t, v, s = self._buffer[id]
+            t.extend(time)
+            v.extend(values)
+            s.extend(status)
+            self._size += n
+            if self._size >= self.flush_size:
+                self._condition.notify_all()
+
+    def flush(self):
+        """Write all buffered datapoints and wait for it to complete."""
+        with self._flush_lock:
+            with self._condition:
+                buffer, self._buffer = self._buffer, defaultdict(lambda: ([], [], []))
+                n, self._size = self._size, 0
+                self._pending = n
+                self._last_flush = time.monotonic()
+
+            if n == 0:
+                return
+
+            start = time.monotonic()
+            try:
+                summaries = self._omnia_client.time_series.add_data_on_multiple(dict(buffer), asynch=self.asynch,
+                                                                                on_error="collect")
+                written = sum(_["written"] for _ in summaries)
+                errors = sum(1 for _ in summaries if _["error"] is not None)
+            except Exception:
+                logging.error(f"Failed writing {n} buffered datapoints.", exc_info=True)
+                written, errors = 0, 1
+
+            with self._condition:
+                self._pending = 0
+                self._flush_latencies.append(time.monotonic() - start)
+                self._counters["flushes"] += 1
+                self._counters["points_written"] += written
+                self._counters["points_failed"] += n - written
+                self._counters["errors"] += errors
+                self._condition.notify_all()
+
+    def close(self):
+        """Flush remaining datapoints and stop the background thread."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+
+        self._thread.join()
+        self.flush()
+
+    @property
+    def stats(self):
+        """
+        dict: Counters of the writer, 'queue_depth' (buffered datapoints), 'flushes', 'points_written',
+        'points_failed', 'errors' (failed requests) and 'flush_latency' (percentiles 50, 90 and 99 in seconds).
+        """
+        with self._condition:
+            stats = dict(queue_depth=self._size + self._pending, **self._counters)
+            latencies = list(self._flush_latencies)
+
+        percentiles = (50, 90, 99)
+        stats["flush_latency"] = dict(zip(percentiles, np.percentile(latencies, percentiles).tolist())) \
+            if latencies else dict()
+        return stats
+
+    def _run(self):
+        """Flush in the background on size threshold and time interval."""
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: (self._closed or self._size >= self.flush_size or
+                             time.monotonic() - self._last_flush >= self.flush_interval),
+                    timeout=max(self.flush_interval - (time.monotonic() - self._last_flush), 0.)
+                )
+                if self._closed:
+                    return
+                due = self._size >= self.flush_size or time.monotonic() - self._last_flush >= self.flush_interval
+
+            if due:
+                self.flush()
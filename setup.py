@@ -21,6 +21,7 @@ setup(
     setup_requires=['setuptools_scm'],
     install_requires=[
         'matplotlib>=3,<4',
+        'numpy>=1.16',
         'adal>=1,<2',
         'pandas>=0.25.3,<1',
     ],
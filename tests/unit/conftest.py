@@ -1,10 +1,15 @@
 """
 Configure unit tests
 """
+import json
 import pytest
 from datetime import datetime, timedelta, timezone
+from omnia_timeseries_sdk._config import Config
+from omnia_timeseries_sdk._utils import to_utc_datetime, decode_items
+from omnia_timeseries_sdk.exceptions import OmniaTimeSeriesAPIError
 from omnia_timeseries_sdk.resources import OmniaResource, OmniaResourceList, TimeSeries, TimeSeriesList, DataPoint, \
     DataPoints, DataPointsList
+from omnia_timeseries_sdk.timeseries import TimeSeriesAPI
 
 
 @pytest.fixture(scope="module")
@@ -92,3 +97,45 @@ def new_timeseries():
 def new_timeserieslist(new_timeseries):
     return TimeSeriesList([new_timeseries])
 
+
+class FakeOmniaClient(object):
+    """Client serving an hourly synthetic time series from memory instead of the web API."""
+    def __init__(self, n=48):
+        self.config = Config
+        self.time_series = TimeSeriesAPI(omnia_client=self)
+        t0 = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        self.datapoints = [(t0 + timedelta(hours=i), float(i), 0) for i in range(n)]
+        self.requests = list()
+        self.page_size = 10
+        self.posted = list()
+        self.fail_writes = False
+
+    def get(self, resource, version, endpoint, parameters=None, body=None):
+        self.requests.append((endpoint, parameters))
+        id = endpoint.split("/")[0]
+        start, end = to_utc_datetime(parameters["start_time"]), to_utc_datetime(parameters["end_time"])
+        inside = [i for i, (t, _, _) in enumerate(self.datapoints) if start <= t < end]
+        if parameters.get("include_outside_points") and inside:
+            inside = list(range(max(inside[0] - 1, 0), min(inside[-1] + 2, len(self.datapoints))))
+        if parameters.get("limit") is not None:
+            inside = inside[:parameters["limit"]]
+        dps = [dict(time=self.datapoints[i][0].isoformat(), value=self.datapoints[i][1], status=self.datapoints[i][2])
+               for i in inside]
+        return decode_items([dict(id=id, name="fake", unit="m", datapoints=dps)])
+
+    def post(self, resource, version, endpoint, parameters=None, body=None, idempotent=None):
+        if self.fail_writes:
+            raise OmniaTimeSeriesAPIError(503, "Service Unavailable", "")
+        self.posted.append((endpoint, json.loads(body) if isinstance(body, (str, bytes)) else body))
+
+    def get_pages(self, resource, version, endpoint, parameters=None, body=None):
+        items = self.get(resource, version, endpoint, parameters=parameters, body=body)
+        columns = items[0]["datapoints"]
+        for i in range(0, len(columns["time"]), self.page_size):
+            page = {k: v[i:i + self.page_size] for k, v in columns.items()}
+            yield [dict(items[0], datapoints=page)]
+
+
+@pytest.fixture
+def fake_client():
+    return FakeOmniaClient()
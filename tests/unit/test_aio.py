@@ -0,0 +1,90 @@
+"""
+Test AsyncOmniaClient and AsyncTimeSeriesAPI classes
+"""
+import asyncio
+import threading
+import time
+import pytest
+from omnia_timeseries_sdk import AsyncOmniaClient, OmniaClient
+from omnia_timeseries_sdk.resources import TimeSeries, TimeSeriesList
+
+
+@pytest.fixture
+def in_flight(monkeypatch):
+    """Replace requests by a slow fake and record the maximum number of concurrent requests."""
+    state = dict(current=0, max=0)
+    lock = threading.Lock()
+
+    def fake_request(self, method, resource, version, endpoint, parameters=None, body=None):
+        with lock:
+            state["current"] += 1
+            state["max"] = max(state["max"], state["current"])
+        time.sleep(0.05)
+        with lock:
+            state["current"] -= 1
+        return [dict(id=endpoint, name=f"name of {endpoint}")]
+
+    monkeypatch.setattr(OmniaClient, "_do_request", fake_request)
+    return state
+
+
+def test_retrieve(in_flight):
+    async def main():
+        async with AsyncOmniaClient(max_concurrency=2) as client:
+            return await client.time_series.retrieve("a")
+
+    ts = asyncio.run(main())
+    assert isinstance(ts, TimeSeries)
+    assert ts.id == "a"
+
+
+def test_retrieve_multiple(in_flight):
+    ids = [str(i) for i in range(8)]
+
+    async def main():
+        async with AsyncOmniaClient(max_concurrency=4) as client:
+            return await client.time_series.retrieve_multiple(ids)
+
+    tsl = asyncio.run(main())
+    assert isinstance(tsl, TimeSeriesList)
+    assert [ts.id for ts in tsl] == ids
+    assert 1 < in_flight["max"] <= 4
+
+
+def test_iter_list(monkeypatch):
+    def fake_pages(self, resource, version, endpoint, parameters=None, body=None):
+        for i in range(3):
+            yield [dict(id=f"{i}-{j}") for j in range(2)]
+
+    monkeypatch.setattr(OmniaClient, "get_pages", fake_pages)
+
+    async def main():
+        async with AsyncOmniaClient(max_concurrency=2) as client:
+            return [page async for page in client.time_series.iter_list()]
+
+    pages = asyncio.run(main())
+    assert len(pages) == 3
+    assert all(isinstance(_, TimeSeriesList) for _ in pages)
+    assert [ts.id for ts in pages[2]] == ["2-0", "2-1"]
+
+
+def test_close_does_not_block(in_flight):
+    async def main():
+        ticks = list()
+
+        async def tick():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.005)
+
+        async with AsyncOmniaClient(max_concurrency=2) as client:
+            pending = asyncio.ensure_future(client.time_series.retrieve("a"))
+            await asyncio.sleep(0)
+            ticker = asyncio.ensure_future(tick())
+            closing = time.monotonic()
+        ticker.cancel()
+        await pending
+        return [_ for _ in ticks if _ >= closing]
+
+    # the event loop kept running while waiting for the pending request
+    assert len(asyncio.run(main())) > 1
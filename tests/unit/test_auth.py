@@ -0,0 +1,106 @@
+"""
+Test TokenManager class
+"""
+import threading
+import time
+import adal
+import pytest
+from omnia_timeseries_sdk._auth import TokenManager
+from omnia_timeseries_sdk.cache import SharedCache
+from omnia_timeseries_sdk.exceptions import OmniaAuthenticationError
+
+
+class FakeContext(object):
+    """Authentication context issuing numbered tokens instead of calling the identity provider."""
+    calls = list()
+    expires_in = 3600
+    fail = False
+
+    def __init__(self, authority):
+        pass
+
+    def _token(self, flow):
+        FakeContext.calls.append(flow)
+        time.sleep(0.01)
+        if FakeContext.fail:
+            raise adal.adal_error.AdalError("nope")
+        return dict(accessToken=f"token-{len(FakeContext.calls)}", refreshToken="refresh",
+                    expiresIn=FakeContext.expires_in)
+
+    def acquire_token_with_client_credentials(self, resource_id, client_id, client_secret):
+        return self._token("secret")
+
+    def acquire_token_with_refresh_token(self, refresh_token, client_id, resource_id):
+        return self._token("refresh")
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    FakeContext.calls, FakeContext.expires_in, FakeContext.fail = list(), 3600, False
+    monkeypatch.setattr(adal, "AuthenticationContext", FakeContext)
+    manager = TokenManager("https://idp", "resource", "client", client_secret="secret", refresh_margin=300.)
+    yield manager
+    manager.close()
+
+
+def test_token_cached(manager):
+    assert manager.get_token() == "token-1"
+    assert manager.get_token() == "token-1"
+    assert FakeContext.calls == ["secret"]
+    assert 3500 < manager.expires_on - time.time() <= 3600
+
+
+def test_concurrent_acquire(manager):
+    tokens = list()
+    threads = [threading.Thread(target=lambda: tokens.append(manager.get_token())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert tokens == ["token-1"] * 8
+    assert len(FakeContext.calls) == 1
+
+
+def test_expired_token(manager, monkeypatch):
+    manager.get_token()
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 3600)
+    assert manager.get_token() == "token-2"
+
+
+def test_invalidate(manager):
+    manager.get_token()
+    manager.invalidate()
+    assert manager.get_token() == "token-2"
+
+
+def test_background_refresh(manager):
+    FakeContext.expires_in = 300.2
+    assert manager.get_token() == "token-1"
+    FakeContext.expires_in = 3600
+    time.sleep(0.5)
+    assert FakeContext.calls == ["secret", "secret"]
+    assert manager.get_token() == "token-2"
+
+
+def test_failure(manager):
+    FakeContext.fail = True
+    with pytest.raises(OmniaAuthenticationError):
+        manager.get_token()
+
+
+def test_shared_token(monkeypatch, tmp_path):
+    FakeContext.calls, FakeContext.expires_in, FakeContext.fail = list(), 3600, False
+    monkeypatch.setattr(adal, "AuthenticationContext", FakeContext)
+    shared = SharedCache(str(tmp_path))
+    a = TokenManager("https://idp", "resource", "client", client_secret="secret", shared_cache=shared)
+    b = TokenManager("https://idp", "resource", "client", client_secret="secret", shared_cache=shared)
+    assert a.get_token() == b.get_token() == "token-1"
+    assert len(FakeContext.calls) == 1
+
+    # a rejected token is not reused
+    b.invalidate()
+    assert b.get_token() == "token-2"
+    a.invalidate()
+    assert a.get_token() == "token-2"
+    assert len(FakeContext.calls) == 2
@@ -0,0 +1,297 @@
+"""
+Test DatapointCache, MetadataCache and SharedCache classes
+"""
+import os
+import threading
+import time
+import numpy as np
+import pytest
+from datetime import datetime, timedelta, timezone
+from omnia_timeseries_sdk import OmniaClient
+from omnia_timeseries_sdk._config import Config
+from omnia_timeseries_sdk.cache import DatapointCache, MetadataCache, SharedCache, _subtract
+from omnia_timeseries_sdk.resources import TimeSeries
+from omnia_timeseries_sdk.timeseries import TimeSeriesAPI
+
+T0 = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def cached_client(fake_client, tmp_path):
+    fake_client.datapoint_cache = DatapointCache(str(tmp_path), max_age=60., settle_time=3600.)
+    return fake_client
+
+
+def windows(client):
+    return [(p["start_time"], p["end_time"]) for _, p in client.requests]
+
+
+def test_subtract():
+    assert _subtract(0, 10, []) == [(0, 10)]
+    assert _subtract(0, 10, [(2, 4), (6, 8)]) == [(0, 2), (4, 6), (8, 10)]
+    assert _subtract(3, 7, [(0, 4), (6, 10)]) == [(4, 6)]
+    assert _subtract(3, 7, [(0, 10)]) == []
+
+
+def test_repeated_query(cached_client):
+    api = cached_client.time_series
+    a = api.data("abc", T0, T0 + timedelta(hours=10))
+    b = api.data("abc", T0, T0 + timedelta(hours=10))
+    assert len(cached_client.requests) == 1
+    assert len(a) == len(b) == 10
+    assert np.array_equal(a.time_array, b.time_array)
+    assert b.name == "fake"
+
+
+def test_gaps_only(cached_client):
+    api = cached_client.time_series
+    api.data("abc", T0 + timedelta(hours=5), T0 + timedelta(hours=10))
+    dps = api.data("abc", T0, T0 + timedelta(hours=20))
+    assert windows(cached_client)[1:] == [("2020-01-01T00:00:00.000000Z", "2020-01-01T05:00:00.000000Z"),
+                                          ("2020-01-01T10:00:00.000000Z", "2020-01-01T20:00:00.000000Z")]
+    assert dps.value == [float(i) for i in range(20)]
+    assert dps.status == [0] * 20
+
+    assert len(api.data("abc", T0 + timedelta(hours=2), T0 + timedelta(hours=12), limit=3)) == 3
+    assert len(cached_client.requests) == 3
+
+
+def test_fetch_limit(cached_client):
+    cached_client.datapoint_cache.fetch_limit = 4
+    dps = cached_client.time_series.data("abc", T0, T0 + timedelta(hours=10))
+    assert len(cached_client.requests) == 3
+    assert dps.value == [float(i) for i in range(10)]
+
+
+def test_limit(cached_client):
+    cached_client.datapoint_cache.fetch_limit = 4
+    api = cached_client.time_series
+    assert api.data("abc", T0, T0 + timedelta(hours=40), limit=3).value == [0., 1., 2.]
+    assert len(cached_client.requests) == 1
+
+    # only what is missing of the first datapoints in the window
+    assert api.data("abc", T0, T0 + timedelta(hours=40), limit=10).value == [float(i) for i in range(10)]
+    assert [p["limit"] for _, p in cached_client.requests] == [3, 4, 3]
+    assert len(api.data("abc", T0, T0 + timedelta(hours=40))) == 40
+    assert len(api.data("abc", T0, T0 + timedelta(hours=40), limit=20)) == 20
+    assert len(cached_client.requests) == 11
+
+
+def test_client_config(tmp_path):
+    class CustomConfig(Config):
+        authenticate = False
+        datapoint_cache_dir = str(tmp_path)
+        datapoint_cache_max_age = 5.
+        datapoint_cache_settle_time = 10.
+
+    client = OmniaClient(config=CustomConfig)
+    assert client.datapoint_cache.max_age == 5.
+    assert client.datapoint_cache.settle_time == 10.
+    client.close()
+
+
+def test_chunked(cached_client):
+    api = cached_client.time_series
+    result = list()
+    # the chunks are fetched concurrently and must not wait for the cache lock held by the caller
+    worker = threading.Thread(target=lambda: result.append(api.data("abc", T0, T0 + timedelta(hours=10),
+                                                                     chunk_size=timedelta(hours=2), max_workers=4)))
+    worker.start()
+    worker.join(timeout=10.)
+    assert not worker.is_alive()
+    dps = result[0]
+    assert len(cached_client.requests) == 5
+    assert dps.value == [float(i) for i in range(10)]
+    assert dps._omnia_client is cached_client
+
+    api.data("abc", T0, T0 + timedelta(hours=10), chunk_size=timedelta(hours=2))
+    assert len(cached_client.requests) == 5
+
+
+def test_persistent(cached_client, tmp_path):
+    cached_client.time_series.data("abc", T0, T0 + timedelta(hours=10))
+    cached_client.datapoint_cache = DatapointCache(str(tmp_path))
+    assert len(cached_client.time_series.data("abc", T0, T0 + timedelta(hours=10))) == 10
+    assert len(cached_client.requests) == 1
+    assert cached_client.datapoint_cache.intervals("abc") == [(np.datetime64("2020-01-01T00:00", "ns"),
+                                                               np.datetime64("2020-01-01T10:00", "ns"))]
+
+
+def test_recent_data_expires(cached_client, monkeypatch):
+    now = datetime.now(timezone.utc)
+    cached_client.datapoints = [(now - timedelta(hours=3 - i), float(i), 0) for i in range(3)]
+    api = cached_client.time_series
+    api.data("abc", now - timedelta(hours=4), now)
+    api.data("abc", now - timedelta(hours=4), now)
+    assert len(cached_client.requests) == 1
+
+    # an hour (settle time) before the last fetch is final, the rest is fetched again
+    fetched = time.time()
+    monkeypatch.setattr(time, "time", lambda: fetched + 120.)
+    dps = api.data("abc", now - timedelta(hours=4), now)
+    assert len(cached_client.requests) == 2
+    assert len(dps) == 3
+    start = datetime.fromisoformat(windows(cached_client)[1][0].replace("Z", "+00:00"))
+    assert abs(start - (now - timedelta(hours=1))) < timedelta(seconds=5)
+
+
+def test_bypass_and_invalidate(cached_client):
+    api = cached_client.time_series
+    api.data("abc", T0, T0 + timedelta(hours=10))
+    api.data("abc", T0, T0 + timedelta(hours=10), include_outside_points=True)
+    api.data("abc", T0, T0 + timedelta(hours=10), use_cache=False)
+    assert len(cached_client.requests) == 3
+
+    api.add_data("abc", [T0], [1.], [0])
+    assert cached_client.datapoint_cache.intervals("abc") == []
+
+
+class MetadataClient(object):
+    """Client serving time series metadata from memory instead of the web API."""
+    def __init__(self):
+        self.metadata_cache = MetadataCache(ttl=60., maxsize=10)
+        self.time_series = TimeSeriesAPI(omnia_client=self)
+        self.items = {str(i): dict(id=str(i), name=f"ts-{i}", external_id=f"ext-{i}", unit="m") for i in range(3)}
+        self.requests = list()
+
+    def get(self, resource, version, endpoint, parameters=None, body=None):
+        self.requests.append(("get", endpoint, parameters))
+        if endpoint:
+            return [self.items[endpoint]]
+        return [_ for _ in self.items.values()
+                if parameters.get("external_id") in (None, _["external_id"])][:parameters.get("limit")]
+
+    def post(self, resource, version, endpoint, parameters=None, body=None, idempotent=None):
+        self.requests.append(("post", endpoint, parameters))
+        self.items["new"] = dict(body, id="new")
+        return [self.items["new"]]
+
+    def patch(self, resource, version, endpoint, parameters=None, body=None):
+        self.requests.append(("patch", endpoint, parameters))
+        self.items[endpoint].update({k: v for k, v in body.items() if v is not None})
+        return [self.items[endpoint]]
+
+    def delete(self, resource, version, endpoint, parameters=None, body=None):
+        self.requests.append(("delete", endpoint, parameters))
+        del self.items[endpoint]
+
+
+@pytest.fixture
+def metadata_client():
+    return MetadataClient()
+
+
+def test_metadata_retrieve(metadata_client):
+    a = metadata_client.time_series.retrieve("1")
+    b = metadata_client.time_series.retrieve("1")
+    assert len(metadata_client.requests) == 1
+    assert a.name == b.name == "ts-1"
+    assert a is not b
+
+    metadata_client.time_series.retrieve("1", use_cache=False)
+    assert len(metadata_client.requests) == 2
+
+
+def test_metadata_list_fills_cache(metadata_client):
+    metadata_client.time_series.list()
+    assert metadata_client.time_series.retrieve("2").name == "ts-2"
+    assert metadata_client.time_series.retrieve_by_external_id("ext-0").id == "0"
+    assert len(metadata_client.requests) == 1
+
+
+def test_metadata_retrieve_by_external_id(metadata_client):
+    assert metadata_client.time_series.retrieve_by_external_id("ext-1").id == "1"
+    assert metadata_client.time_series.retrieve_by_external_id("ext-1").id == "1"
+    assert metadata_client.time_series.retrieve_by_external_id("missing") is None
+    assert len(metadata_client.requests) == 2
+
+
+def test_metadata_create_update_delete(metadata_client):
+    metadata_client.time_series.create("new-ts", unit="m")
+    assert metadata_client.time_series.retrieve("new").name == "new-ts"
+    assert len(metadata_client.requests) == 1
+
+    metadata_client.time_series.update("new", name="renamed")
+    assert metadata_client.time_series.retrieve("new").name == "renamed"
+    assert len(metadata_client.requests) == 3
+
+    metadata_client.time_series.delete("new")
+    with pytest.raises(KeyError):
+        metadata_client.time_series.retrieve("new")
+
+
+def test_metadata_update_concurrent_retrieve(metadata_client, monkeypatch):
+    api = metadata_client.time_series
+    patch = metadata_client.patch
+
+    def slow_patch(resource, version, endpoint, parameters=None, body=None):
+        api.retrieve(endpoint)  # retrieved by another thread while the request is in flight
+        if body.get("unit") == "fail":
+            raise RuntimeError("Request failed")
+        return patch(resource, version, endpoint, parameters=parameters, body=body)
+
+    monkeypatch.setattr(metadata_client, "patch", slow_patch)
+    api.update("1", name="renamed")
+    assert api.retrieve("1").name == "renamed"
+
+    with pytest.raises(RuntimeError):
+        api.update("1", unit="fail")
+    assert metadata_client.metadata_cache.get("1") is None
+
+
+def test_metadata_ttl(monkeypatch):
+    cache = MetadataCache(ttl=10., maxsize=10)
+    cache.put(TimeSeries(id="a", external_id="x"))
+    assert cache.get_by_external_id("x").id == "a"
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11.)
+    assert cache.get("a") is None
+    assert cache.get_by_external_id("x") is None
+    assert len(cache) == 0
+
+
+def test_metadata_lru():
+    cache = MetadataCache(ttl=10., maxsize=2)
+    cache.put(TimeSeries(id="a"))
+    cache.put(TimeSeries(id="b"))
+    cache.get("a")
+    cache.put(TimeSeries(id="c"))
+    assert cache.get("b") is None
+    assert cache.get("a").id == "a"
+    assert len(cache) == 2
+
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_shared_cache(tmp_path, monkeypatch):
+    cache = SharedCache(str(tmp_path))
+    cache.set("a", dict(b=1))
+    cache.set("c", [1, 2], ttl=10.)
+    assert cache.get("a") == dict(b=1)
+    assert cache.get("missing") is None
+    assert oct(os.stat(cache._path("a")).st_mode & 0o777) == oct(0o600)
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11.)
+    assert cache.get("c") is None
+
+    cache.delete("a")
+    assert cache.get("a") is None
+    with cache.lock("a"):
+        pass
+
+
+def test_shared_metadata(tmp_path):
+    shared = SharedCache(str(tmp_path))
+    a = MetadataCache(ttl=60., maxsize=10, shared_cache=shared)
+    b = MetadataCache(ttl=60., maxsize=10, shared_cache=shared)
+    a.put(TimeSeries(id="1", name="ts-1", external_id="ext-1", created_time="2020-01-01T00:00:00Z"))
+    ts = b.get_by_external_id("ext-1")
+    assert ts.name == "ts-1"
+    assert ts.created_time == datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+    a.invalidate("1")
+    b.invalidate()
+    assert b.get("1") is None
@@ -0,0 +1,94 @@
+"""
+Test concurrent execution helpers
+"""
+import time
+import pytest
+from omnia_timeseries_sdk._concurrency import map_concurrently, AdaptiveConcurrencyLimiter
+
+
+def slow_square(x):
+    time.sleep(0.01 * (5 - x % 5))    # finish out of order
+    if x < 0:
+        raise ValueError(f"Negative number {x}")
+    return x ** 2
+
+
+def test_order():
+    results, errors = map_concurrently(slow_square, range(10), max_workers=4)
+    assert results == [x ** 2 for x in range(10)]
+    assert errors == []
+
+
+def test_sequential():
+    results, errors = map_concurrently(slow_square, range(3), max_workers=1)
+    assert results == [0, 1, 4]
+
+
+def test_raise():
+    with pytest.raises(ValueError):
+        map_concurrently(slow_square, [1, -1, 2], max_workers=4, on_error="raise")
+
+
+def test_skip():
+    results, errors = map_concurrently(slow_square, [1, -1, 2], max_workers=4, on_error="skip")
+    assert results == [1, 4]
+
+
+def test_collect():
+    results, errors = map_concurrently(slow_square, [1, -1, 2, -2], max_workers=4, on_error="collect")
+    assert results == [1, 4]
+    assert [item for item, _ in errors] == [-1, -2]
+    assert all(isinstance(e, ValueError) for _, e in errors)
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        map_concurrently(slow_square, [1], on_error="ignore")
+
+
+def test_limiter_increase():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=4)
+    for _ in range(20):
+        limiter.release(limiter.acquire(), latency=0.1)
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
+
+
+def test_limiter_decrease_on_throttling():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+    starts = [limiter.acquire() for _ in range(4)]
+    for start in starts:
+        limiter.release(start, latency=0.1, throttled=True)
+    assert limiter.limit == 4     # cut once for the burst
+
+
+def test_limiter_decrease_on_latency_spike():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, max_limit=8)
+    for _ in range(20):
+        limiter.release(limiter.acquire(), latency=0.1)
+    limiter.release(limiter.acquire(), latency=1.)
+    assert limiter.limit == 4
+
+
+def test_limiter_blocks():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2)
+    in_flight = list()
+
+    def request(_):
+        start = limiter.acquire()
+        in_flight.append(limiter.in_flight)
+        time.sleep(0.01)
+        limiter.release(start, latency=0.01)
+
+    map_concurrently(request, range(10), max_workers=5)
+    assert max(in_flight) <= 2
+
+
+def test_latency_percentiles():
+    limiter = AdaptiveConcurrencyLimiter()
+    assert limiter.latency_percentiles() == dict()
+    for latency in range(1, 101):
+        limiter.release(limiter.acquire(), latency=float(latency))
+    p = limiter.latency_percentiles((50, 99))
+    assert 50. <= p[50] <= 51.
+    assert p[99] > 98.
@@ -1,6 +1,8 @@
 """
 Test DataPoints class
 """
+import numpy as np
+import pytest
 from omnia_timeseries_sdk.resources import DataPoint, DataPoints
 from pandas import DataFrame
 
@@ -37,3 +39,44 @@ def test_topandas(new_datapoints):
     df = new_datapoints.to_pandas()
     assert isinstance(df, DataFrame)
 
+
+def test_merge(new_datapoints):
+    dps = DataPoints.merge([new_datapoints, new_datapoints])
+    assert len(dps) == len(new_datapoints)
+    assert dps.time == sorted(new_datapoints.time)
+    assert dps.id == new_datapoints.id
+
+
+def test_arrays(new_datapoints):
+    assert new_datapoints.time_array.dtype == np.dtype("datetime64[ns]")
+    assert new_datapoints.value_array.dtype == np.float64
+    assert new_datapoints.status_array is None
+
+
+def test_status():
+    dps = DataPoints(time=["2020-01-01T00:00:00Z", "2020-01-02T00:00:00Z"], value=["a", "b"], status=[0, 192])
+    assert dps.status_array.dtype == np.int32
+    assert dps.value_array.dtype == object
+    assert dps.status == [0, 192]
+    assert dps.value == ["a", "b"]
+
+
+def test_indexing(new_datapoints):
+    assert isinstance(new_datapoints[0], DataPoint)
+    assert new_datapoints[-1].time == new_datapoints.latest.time
+    assert new_datapoints[0].time.tzinfo is not None
+    sliced = new_datapoints[:1]
+    assert isinstance(sliced, DataPoints)
+    assert len(sliced) == 1
+    assert np.shares_memory(sliced.value_array, new_datapoints.value_array)
+
+
+def test_topandas_no_copy(new_datapoints):
+    df = new_datapoints.to_pandas()
+    assert np.shares_memory(df.iloc[:, 0].to_numpy(), new_datapoints.value_array)
+    assert str(df.index.tz) == "UTC"
+
+
+def test_unequal_lengths():
+    with pytest.raises(ValueError):
+        DataPoints(time=["2020-01-01T00:00:00Z"], value=[1., 2.])
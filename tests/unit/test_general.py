@@ -1,9 +1,24 @@
 """
 Test general stuff
 """
+import subprocess
+import sys
 import omnia_timeseries_sdk
 
+IMPORT_BUDGET = 1.  # seconds, importing pandas, matplotlib and adal as well takes about as long
+
 
 def test_version():
     assert isinstance(omnia_timeseries_sdk.__version__, str)
 
+
+def test_import_is_lazy():
+    # fresh interpreter, the package is already imported in this one
+    code = ("import sys, time; start = time.perf_counter(); import omnia_timeseries_sdk; "
+            "print(time.perf_counter() - start); print(' '.join(sys.modules))")
+    output = subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.PIPE,
+                            universal_newlines=True).stdout.splitlines()
+    duration, modules = float(output[0]), set(output[1].split())
+    # the version is looked up in the distribution metadata on first access
+    assert not {"pandas", "matplotlib", "adal", "pkg_resources", "importlib.metadata"} & modules
+    assert duration < IMPORT_BUDGET
@@ -0,0 +1,99 @@
+"""
+Test request instrumentation and metrics
+"""
+import json
+import pytest
+from omnia_timeseries_sdk import OmniaClient
+from omnia_timeseries_sdk._pool import Response
+from omnia_timeseries_sdk.instrumentation import Instrumentation, MetricsAggregator, REQUEST_STAGES
+from omnia_timeseries_sdk.exceptions import OmniaTimeSeriesAPIError
+
+TIMINGS = dict(connect=0.01, wait=0.1, download=0.02)
+
+
+def page(items, token=None):
+    data = json.dumps(dict(data=dict(items=items), continuationToken=token)).encode()
+    return Response(200, "OK", dict(), data, TIMINGS)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = OmniaClient()
+    client.responses = list()
+    client.events = list()
+    client.instrumentation.add_hook(client.events.append)
+    monkeypatch.setattr(client.token_manager, "get_token", lambda: "token")
+    monkeypatch.setattr(client._pool, "request", lambda *args, **kwargs: client.responses.pop(0))
+    monkeypatch.setattr(client.retry_policy, "sleep", lambda _: None)
+    return client
+
+
+def test_request_event(client):
+    client.responses = [Response(503, "Unavailable", dict(), b"", TIMINGS), page([dict(id="a")], token="next"),
+                        page([dict(id="b")])]
+    client.get("timeseries", "v1.5", "", parameters=dict(name="x"))
+    event, = client.events
+    assert event["kind"] == "request"
+    assert event["method"] == "GET"
+    assert event["url"] == "/plant/timeseries/v1.5"
+    assert event["status"] == 200
+    assert event["error"] is None
+    assert (event["pages"], event["retries"]) == (2, 1)
+    assert event["bytes_received"] == sum(len(_.data) for _ in [page([dict(id="a")], token="next"),
+                                                                    page([dict(id="b")])])
+    assert event["stages"]["wait"] == pytest.approx(0.3)
+    assert set(event["stages"]) == set(REQUEST_STAGES)
+    assert event["duration"] >= event["stages"]["decode"]
+
+
+def test_failed_request_event(client):
+    client.responses = [Response(404, "Not found", dict(), b"{}", TIMINGS)]
+    with pytest.raises(OmniaTimeSeriesAPIError):
+        client.get("timeseries", "v1.5", "a")
+    assert client.events[0]["status"] == 404
+    assert isinstance(client.events[0]["error"], OmniaTimeSeriesAPIError)
+
+
+def test_build_stage(client):
+    dps = [dict(time="2020-01-01T00:00:00Z", value=1., status=0)]
+    client.responses = [page([dict(id="a", name="a", unit="m", datapoints=dps)])]
+    client.time_series.data("a", "2020-01-01T00:00:00Z", "2020-01-02T00:00:00Z")
+    assert [_["kind"] for _ in client.events] == ["request", "stage"]
+    assert client.events[1]["stage"] == "build"
+    assert client.events[1]["items"] == 1
+
+
+def test_failing_hook(client):
+    def hook(event):
+        raise RuntimeError()
+
+    client.instrumentation.add_hook(hook)
+    client.responses = [page([dict(id="a")])]
+    assert client.get("timeseries", "v1.5", "a") == [dict(id="a")]
+    client.instrumentation.remove_hook(hook)
+    assert len(client.instrumentation.hooks) == 1
+
+
+def test_metrics_aggregator():
+    metrics = MetricsAggregator()
+    instrumentation = Instrumentation()
+    instrumentation.add_hook(metrics)
+    for i in range(10):
+        instrumentation.emit(dict(kind="request", method="GET", url="/", status=200 if i else 503, error=None,
+                                  duration=0.1 * (i + 1), stages=dict(TIMINGS), pages=2, retries=0,
+                                  bytes_received=1000))
+    with instrumentation.stage("build", items=5):
+        pass
+
+    summary = metrics.summary()
+    assert summary["requests"] == 10
+    assert summary["pages"] == 20
+    assert summary["bytes_received"] == 10000
+    assert summary["statuses"] == {200: 9, 503: 1}
+    assert summary["latency"]["request"][50] == pytest.approx(0.55)
+    assert summary["latency"]["wait"][99] == pytest.approx(0.1)
+    assert "build" in summary["latency"]
+    assert summary["requests_per_second"] > 0.
+
+    metrics.reset()
+    assert metrics.summary()["requests"] == 0
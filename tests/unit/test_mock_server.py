@@ -0,0 +1,106 @@
+"""
+Test the client against the local mock server
+"""
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+from omnia_timeseries_sdk import OmniaClient
+from omnia_timeseries_sdk.exceptions import OmniaTimeSeriesAPIError
+from omnia_timeseries_sdk.mock_server import MockTimeSeriesServer
+
+T0 = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def server():
+    with MockTimeSeriesServer(page_size=100, seed=1) as server:
+        yield server
+
+
+@pytest.fixture
+def client(server, monkeypatch):
+    client = OmniaClient(config=server.config())
+    monkeypatch.setattr(client.retry_policy, "sleep", lambda delay: None)
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def ts(client):
+    ts = client.time_series.create("mock", unit="bar")
+    time = [T0 + timedelta(seconds=i) for i in range(250)]
+    client.time_series.add_data(ts.id, time, [float(i) for i in range(250)], [0] * 250)
+    return ts
+
+
+def test_metadata(client):
+    ts = client.time_series.create("mock", unit="bar", external_id="ext")
+    assert client.time_series.retrieve(ts.id, use_cache=False).name == "mock"
+    assert [_.id for _ in client.time_series.list(external_id="ext").resources] == [ts.id]
+    assert client.time_series.update(ts.id, unit="m").unit == "m"
+
+    client.time_series.delete(ts.id)
+    with pytest.raises(OmniaTimeSeriesAPIError) as e:
+        client.time_series.retrieve(ts.id, use_cache=False)
+    assert e.value.status == 404
+
+
+def test_pagination_and_limit(client, server, ts):
+    dps = client.time_series.data(ts.id, start_time="2020-01-01T00:00:10Z", end_time="2020-01-01T00:04:00Z")
+    assert len(dps) == 230
+    assert dps.value[0] == 10. and dps.value[-1] == 239.
+    assert server.stats["requests"] == 2 + 3   # create and write, three pages
+
+    assert len(client.time_series.data(ts.id, start_time="2020-01-01T00:00:00Z", end_time="2020-01-01T01:00:00Z",
+                                       limit=150)) == 150
+    assert [len(_) for _ in client.time_series.iter_data(ts.id, start_time="2020-01-01T00:00:00Z",
+                                                         end_time="2020-01-01T01:00:00Z", limit=150)] == [100, 50]
+
+    dps = client.time_series.data(ts.id, start_time="2020-01-01T00:00:10Z", end_time="2020-01-01T00:00:20Z",
+                                  include_outside_points=True)
+    assert dps.value == [float(i) for i in range(9, 21)]
+
+
+def test_list_data_concurrently(client, server, ts):
+    for i in range(3):
+        client.time_series.create("mock", unit="bar")
+    server.latency = 0.2
+    start = time.perf_counter()
+    dpsl = client.time_series.list(name="mock").data(start_time="2020-01-01T00:00:00Z",
+                                                      end_time="2020-01-01T00:01:00Z")
+    assert time.perf_counter() - start < 0.6    # sequential requests take at least 0.8 seconds
+    assert [len(_) for _ in dpsl] == [60, 0, 0, 0]
+
+
+def test_first_latest_and_delete(client, ts):
+    assert client.time_series.first_data(ts.id).value == 0.
+    assert client.time_series.first_data(ts.id, after_time="2020-01-01T00:00:05Z").value == 6.
+    assert client.time_series.latest_data(ts.id).value == 249.
+    assert client.time_series.latest_data(ts.id, before_time="2020-01-01T00:00:05Z").value == 4.
+
+    client.time_series.delete_data(ts.id, start_time="2020-01-01T00:00:00Z", end_time="2020-01-01T00:01:00Z")
+    assert client.time_series.first_data(ts.id).value == 60.
+
+
+def test_write_multiple_overwrites(client, ts):
+    other = client.time_series.create("other")
+    client.time_series.add_data_on_multiple({ts.id: ([T0], [-1.], [1]), other.id: ([T0], [2.], [0])})
+    dps = client.time_series.data(ts.id, start_time="2020-01-01T00:00:00Z", end_time="2020-01-01T01:00:00Z")
+    assert len(dps) == 250
+    assert dps.value[0] == -1. and dps.status[0] == 1
+    assert np.array_equal(client.time_series.data(other.id, start_time="2020-01-01T00:00:00Z",
+                                                  end_time="2020-01-01T01:00:00Z").value_array, [2.])
+
+
+def test_fault_injection(client, server, ts):
+    server.throttle_rate = 0.25
+    server.retry_after = 0.
+    for _ in range(10):
+        assert client.time_series.first_data(ts.id).value == 0.
+    assert server.stats["throttled"] > 0
+
+    server.throttle_rate, server.failure_rate = 0., 1.
+    with pytest.raises(OmniaTimeSeriesAPIError) as e:
+        client.time_series.create("fails")
+    assert e.value.status == 503
@@ -0,0 +1,105 @@
+"""
+Test ConnectionPool class
+"""
+import http.client
+import pytest
+from omnia_timeseries_sdk._pool import ConnectionPool
+from omnia_timeseries_sdk.exceptions import OmniaClientConnectionError
+
+
+class FakeResponse(object):
+    status = 200
+    reason = "OK"
+    headers = dict()
+    will_close = False
+
+    def read(self):
+        return b'{"data": null}'
+
+
+class FakeConnection(object):
+    """Connection which fails on the first request if marked as stale."""
+    instances = list()
+
+    def __init__(self, host, timeout=None):
+        self.host = host
+        self.stale = False
+        self.closed = False
+        self.n_requests = 0
+        FakeConnection.instances.append(self)
+
+    def connect(self):
+        pass
+
+    def request(self, method, url, body=None, headers=None):
+        if self.stale:
+            raise http.client.RemoteDisconnected("Remote end closed connection without response")
+        self.n_requests += 1
+
+    def getresponse(self):
+        return FakeResponse()
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool():
+    FakeConnection.instances = list()
+    return ConnectionPool(maxsize=2, idle_timeout=60., connection_class=FakeConnection)
+
+
+def test_reuse(pool):
+    pool.request("somehost", "GET", "/")
+    pool.request("somehost", "GET", "/")
+    assert len(FakeConnection.instances) == 1
+    assert FakeConnection.instances[0].n_requests == 2
+    assert len(pool) == 1
+
+
+def test_per_host(pool):
+    pool.request("somehost", "GET", "/")
+    pool.request("anotherhost", "GET", "/")
+    assert len(FakeConnection.instances) == 2
+    assert len(pool) == 2
+
+
+def test_maxsize(pool):
+    connections = [pool.get("somehost")[0] for _ in range(3)]
+    for c in connections:
+        pool.put("somehost", c)
+    assert len(pool) == 2
+    assert connections[-1].closed
+
+
+def test_idle_eviction(pool):
+    pool.idle_timeout = -1.
+    pool.request("somehost", "GET", "/")
+    pool.request("somehost", "GET", "/")
+    assert len(FakeConnection.instances) == 2
+    assert FakeConnection.instances[0].closed
+
+
+def test_reconnect_stale(pool):
+    pool.request("somehost", "GET", "/")
+    FakeConnection.instances[0].stale = True
+    r = pool.request("somehost", "GET", "/")
+    assert r.status == 200
+    assert len(FakeConnection.instances) == 2
+    assert FakeConnection.instances[0].closed
+
+
+def test_fresh_connection_failure(pool, monkeypatch):
+    def failing(self, *args, **kwargs):
+        raise ConnectionResetError()
+
+    monkeypatch.setattr(FakeConnection, "request", failing)
+    with pytest.raises(OmniaClientConnectionError):
+        pool.request("somehost", "GET", "/")
+
+
+def test_close(pool):
+    pool.request("somehost", "GET", "/")
+    pool.close()
+    assert len(pool) == 0
+    assert FakeConnection.instances[0].closed
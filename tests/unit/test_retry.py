@@ -0,0 +1,147 @@
+"""
+Test retry of throttled and transiently failing requests
+"""
+import json
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+import pytest
+from omnia_timeseries_sdk import OmniaClient
+from omnia_timeseries_sdk._concurrency import AdaptiveConcurrencyLimiter
+from omnia_timeseries_sdk._pool import Response
+from omnia_timeseries_sdk._retry import RetryPolicy
+from omnia_timeseries_sdk.exceptions import OmniaAuthenticationError, OmniaTimeSeriesAPIError, \
+    OmniaClientConnectionError
+
+
+def test_backoff():
+    policy = RetryPolicy(backoff_factor=1., max_backoff=5.)
+    assert 0. <= policy.backoff(0) <= 1.
+    assert 0. <= policy.backoff(2) <= 4.
+    assert policy.backoff(10) <= 5.
+    assert policy.backoff(0, retry_after=3.) == 3.
+    assert policy.backoff(0, retry_after=60.) == 5.
+
+
+def test_is_retryable():
+    policy = RetryPolicy()
+    assert policy.is_retryable("GET", 503)
+    assert not policy.is_retryable("GET", 404)
+    assert policy.is_retryable("POST", 429)
+    assert not policy.is_retryable("POST", 503)
+    assert policy.is_retryable("POST", 503, idempotent=True)
+
+
+def test_parse_retry_after():
+    assert RetryPolicy.parse_retry_after("2") == 2.
+    assert RetryPolicy.parse_retry_after(None) is None
+    assert RetryPolicy.parse_retry_after("tomorrow") is None
+    later = format_datetime(datetime.now(tz=timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25. < RetryPolicy.parse_retry_after(later) <= 30.
+
+
+def page(items, token=None):
+    return Response(200, "OK", dict(), json.dumps(dict(data=dict(items=items), continuationToken=token)).encode())
+
+
+def failure(status, retry_after=None):
+    headers = dict() if retry_after is None else {"Retry-After": retry_after}
+    return Response(status, "Failed", headers, json.dumps(dict(message="nope")).encode())
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Client replaying canned responses and recording requested urls and delays."""
+    client = OmniaClient()
+    client.responses = list()
+    client.urls = list()
+    client.delays = list()
+
+    def fake_request(host, method, url, body=None, headers=None):
+        client.urls.append(url)
+        r = client.responses.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+    monkeypatch.setattr(client.token_manager, "get_token", lambda: "token")
+    monkeypatch.setattr(client._pool, "request", fake_request)
+    monkeypatch.setattr(client.retry_policy, "sleep", client.delays.append)
+    return client
+
+
+def test_retry_throttled(client):
+    client.responses = [failure(429, retry_after="1"), failure(503), page([dict(id="a")])]
+    items = client.get("timeseries", "v1.5", "a")
+    assert items == [dict(id="a")]
+    assert len(client.urls) == 3
+    assert client.delays[0] == 1.
+
+
+def test_retry_connection_error(client):
+    client.responses = [OmniaClientConnectionError(), page([dict(id="a")])]
+    assert client.get("timeseries", "v1.5", "a") == [dict(id="a")]
+
+
+def test_retries_exhausted(client):
+    client.retry_policy.max_retries = 1
+    client.responses = [failure(503), failure(503)]
+    with pytest.raises(OmniaTimeSeriesAPIError):
+        client.get("timeseries", "v1.5", "a")
+
+
+def test_no_retry_non_idempotent(client):
+    client.responses = [failure(503)]
+    with pytest.raises(OmniaTimeSeriesAPIError):
+        client.post("timeseries", "v1.5", "", body=dict(name="a"))
+
+
+def test_resume_from_continuation_token(client):
+    client.responses = [page([dict(id="a")], token="abc+/="), failure(503), page([dict(id="b")])]
+    items = client.get("timeseries", "v1.5", "")
+    assert items == [dict(id="a"), dict(id="b")]
+    assert "continuationToken=abc%2B%2F%3D" in client.urls[1]
+    assert client.urls[1] == client.urls[2]
+
+
+def test_reauthenticate_once(client, monkeypatch):
+    invalidated = list()
+    monkeypatch.setattr(client.token_manager, "invalidate", lambda: invalidated.append(True))
+    client.responses = [failure(401), page([dict(id="a")])]
+    assert client.get("timeseries", "v1.5", "a") == [dict(id="a")]
+    assert len(invalidated) == 1
+    assert client.delays == []
+
+    client.responses = [failure(401), failure(401)]
+    with pytest.raises(OmniaAuthenticationError) as e:
+        client.get("timeseries", "v1.5", "a")
+    assert isinstance(e.value, OmniaTimeSeriesAPIError) and e.value.status == 401
+    assert len(invalidated) == 2
+    assert client.delays == []
+
+
+def test_limiter_ignores_download_time(client):
+    client.concurrency_limiter = AdaptiveConcurrencyLimiter(initial_limit=8, max_limit=8)
+    small = Response(200, "OK", dict(), b'{"data": {"items": []}}', dict(connect=0., wait=0.01, download=0.))
+    large = Response(200, "OK", dict(), b'{"data": {"items": []}}', dict(connect=0., wait=0.01, download=0.05))
+    request = client._pool.request
+
+    def download(*args, **kwargs):
+        r = request(*args, **kwargs)
+        time.sleep(r.timings["download"])
+        return r
+
+    client._pool.request = download
+    client.responses = [small, large] * 15
+    for _ in range(30):
+        client.get("timeseries", "v1.5", "a")
+    assert client.concurrency_limiter.limit == 8
+    assert client.concurrency_limiter.latency_percentiles((50, 99)) == {50: 0.01, 99: 0.01}
+
+
+def test_limiter_ignores_connection_errors(client):
+    client.concurrency_limiter = AdaptiveConcurrencyLimiter(initial_limit=8, max_limit=8)
+    client.responses = [OmniaClientConnectionError(), page([dict(id="a")])]
+    assert client.get("timeseries", "v1.5", "a") == [dict(id="a")]
+    assert client.concurrency_limiter.limit == 8
+    assert client.concurrency_limiter.in_flight == 0
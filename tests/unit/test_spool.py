@@ -0,0 +1,123 @@
+"""
+Test WriteSpool class
+"""
+import json
+import os
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+from omnia_timeseries_sdk.exceptions import OmniaTimeSeriesAPIError
+from omnia_timeseries_sdk.spool import WriteSpool
+
+T0 = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def written(client):
+    return [(item["id"], dp["time"], dp["value"]) for _, body in client.posted for item in body["items"]
+            for dp in item["datapoints"]]
+
+
+def series(n, offset=0):
+    return [T0 + timedelta(seconds=offset + i) for i in range(n)], [float(offset + i) for i in range(n)], [0] * n
+
+
+def test_append_and_flush(fake_client, tmp_path):
+    with WriteSpool(fake_client, str(tmp_path), drain_interval=60.) as spool:
+        spool.append("a", *series(5))
+        spool.append("b", *series(3))
+        spool.flush()
+        assert spool.stats["pending_bytes"] == 0
+        assert spool.stats["points_drained"] == 8
+
+    dps = written(fake_client)
+    assert len(dps) == 8
+    assert dps[0] == ("a", "2020-01-01T00:00:00.000000Z", 0.)
+
+
+def test_background_drain(fake_client, tmp_path):
+    with WriteSpool(fake_client, str(tmp_path), drain_interval=0.01) as spool:
+        spool.append("a", *series(5))
+        for _ in range(200):
+            if spool.stats["points_drained"] == 5:
+                break
+            spool._stop.wait(0.01)
+    assert len(written(fake_client)) == 5
+
+
+def test_numpy_input(fake_client, tmp_path):
+    t = np.array(["2020-01-01T00:00:00", "2020-01-01T00:00:01"], dtype="datetime64[ns]")
+    with WriteSpool(fake_client, str(tmp_path), drain_interval=60.) as spool:
+        spool.append("a", t, np.array([1., 2.]), np.zeros(2, dtype=int))
+        spool.flush()
+    assert written(fake_client)[1] == ("a", "2020-01-01T00:00:01.000000Z", 2.)
+
+
+def test_batches_and_segments(fake_client, tmp_path):
+    with WriteSpool(fake_client, str(tmp_path), segment_size=200, batch_size=10, drain_interval=60.) as spool:
+        for i in range(10):
+            spool.append("a", *series(3, offset=3 * i))
+        spool.flush()
+        assert spool.stats["segments"] == 1   # written segments are removed
+
+    assert sorted(_[2] for _ in written(fake_client)) == [float(i) for i in range(30)]   # batches are concurrent
+    assert all(len(body["items"][0]["datapoints"]) <= 10 for _, body in fake_client.posted)
+
+
+def test_resume_after_failure(fake_client, tmp_path):
+    fake_client.fail_writes = True
+    with WriteSpool(fake_client, str(tmp_path), drain_interval=60.) as spool:
+        spool.append("a", *series(5))
+        with pytest.raises(Exception):
+            spool.flush()
+        assert spool.stats["pending_bytes"] > 0
+
+    # reopen, e.g. after a restart
+    fake_client.fail_writes = False
+    with WriteSpool(fake_client, str(tmp_path), drain_interval=60.) as spool:
+        spool.append("a", *series(5, offset=5))
+        spool.flush()
+    assert [_[2] for _ in written(fake_client)] == [float(i) for i in range(10)]
+
+
+def test_rejected_batch(fake_client, tmp_path, monkeypatch):
+    post = fake_client.post
+
+    def reject(resource, version, endpoint, parameters=None, body=None, idempotent=None):
+        if any(_["id"] == "bad" for _ in json.loads(body)["items"]):
+            raise OmniaTimeSeriesAPIError(400, "Bad Request", "Invalid value")
+        return post(resource, version, endpoint, parameters=parameters, body=body, idempotent=idempotent)
+
+    monkeypatch.setattr(fake_client, "post", reject)
+    with WriteSpool(fake_client, str(tmp_path), batch_size=5, drain_interval=60.) as spool:
+        spool.append("bad", *series(5))
+        spool.append("a", *series(5))
+        spool.flush()
+        assert spool.stats["points_rejected"] == 5
+        assert spool.stats["pending_bytes"] == 0
+
+    assert [_[2] for _ in written(fake_client)] == [float(i) for i in range(5)]
+    with open(os.path.join(str(tmp_path), "rejected.jsonl"), "r") as f:
+        assert [json.loads(_)["id"] for _ in f] == ["bad"]
+
+
+def test_torn_record(fake_client, tmp_path):
+    with WriteSpool(fake_client, str(tmp_path), drain_interval=60.) as spool:
+        spool.append("a", *series(2))
+        path = spool._segment_path(spool._active)
+
+    # simulate a crash while appending
+    with open(path, "ab") as f:
+        f.write(b'{"id": "a", "time": ["2020-01-01T00:00:0')
+
+    with WriteSpool(fake_client, str(tmp_path), drain_interval=60.) as spool:
+        spool.append("a", *series(2, offset=2))
+        spool.flush()
+    assert [_[2] for _ in written(fake_client)] == [0., 1., 2., 3.]
+    assert not os.path.exists(path)
+
+
+def test_closed(fake_client, tmp_path):
+    spool = WriteSpool(fake_client, str(tmp_path), drain_interval=60.)
+    spool.close()
+    with pytest.raises(RuntimeError):
+        spool.append("a", *series(1))
@@ -0,0 +1,173 @@
+"""
+Test TimeSeriesAPI class
+"""
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+import pytest
+from omnia_timeseries_sdk.resources import DataPoints
+from omnia_timeseries_sdk.timeseries import _pack
+
+START = "2020-01-01T00:00:00Z"
+END = "2020-01-02T00:00:00Z"
+
+
+def test_data(fake_client):
+    dps = fake_client.time_series.data("abc", start_time=START, end_time=END)
+    assert isinstance(dps, DataPoints)
+    assert len(dps) == 24
+    assert dps.status == [0] * 24
+
+
+def test_chunked_data(fake_client):
+    dps = fake_client.time_series.data("abc", start_time=START, end_time=END, chunk_size=timedelta(hours=5))
+    assert len(fake_client.requests) == 5
+    assert dps.value == fake_client.time_series.data("abc", start_time=START, end_time=END).value
+    assert dps.id == "abc"
+
+
+def test_chunked_data_outside_points(fake_client):
+    start = "2020-01-01T02:30:00Z"
+    dps = fake_client.time_series.data("abc", start_time=start, end_time=END, chunk_size=timedelta(hours=4),
+                                       include_outside_points=True)
+    expected = fake_client.time_series.data("abc", start_time=start, end_time=END, include_outside_points=True)
+    assert dps.value == expected.value
+    assert dps.time == sorted(set(dps.time))
+
+
+def test_chunked_data_limit(fake_client):
+    dps = fake_client.time_series.data("abc", start_time=START, end_time=END, chunk_size=timedelta(hours=5),
+                                       limit=7)
+    assert dps.value == [float(i) for i in range(7)]
+
+
+def test_chunked_data_offsets(fake_client):
+    expected = fake_client.time_series.data("abc", start_time=START, end_time=END).value
+    for start, end in [("2019-12-31T19:00:00-05:00", "2020-01-01T19:00:00-05:00"),
+                       ("2020-01-01T00:00:00", "2020-01-02T00:00:00"), ("2020-01-01", "2020-01-02")]:
+        dps = fake_client.time_series.data("abc", start_time=start, end_time=end, chunk_size=timedelta(hours=5))
+        assert dps.value == expected
+
+
+def test_invalid_chunk_size(fake_client):
+    with pytest.raises(ValueError):
+        fake_client.time_series.data("abc", start_time=START, end_time=END, chunk_size=timedelta(0))
+
+
+def test_iter_data(fake_client):
+    pages = list(fake_client.time_series.iter_data("abc", start_time=START, end_time=END))
+    assert [len(_) for _ in pages] == [10, 10, 4]
+    assert all(isinstance(_, DataPoints) for _ in pages)
+    assert sum([_.value for _ in pages], []) == fake_client.time_series.data("abc", start_time=START,
+                                                                            end_time=END).value
+
+
+def new_data(n):
+    t0 = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    return [t0 + timedelta(seconds=i) for i in range(n)], [float(i) for i in range(n)], [0] * n
+
+
+def test_add_data_batches(fake_client):
+    summary = fake_client.time_series.add_data("abc", *new_data(25), batch_size=10)
+    assert [_["points"] for _ in summary] == [10, 10, 5]
+    assert [_["written"] for _ in summary] == [10, 10, 5]
+    assert sorted(len(body["datapoints"]) for _, body in fake_client.posted) == [5, 10, 10]
+    assert fake_client.posted[0][1]["datapoints"][0]["time"] == "2020-01-01T00:00:00.000000Z"
+
+
+def test_add_data_max_body_size(fake_client, monkeypatch):
+    monkeypatch.setattr(fake_client.config, "write_max_body_size", 1000)
+    summary = fake_client.time_series.add_data("abc", *new_data(40), batch_size=40)
+    assert summary[0]["written"] == 40
+    assert len(fake_client.posted) > 1
+    assert sum(len(body["datapoints"]) for _, body in fake_client.posted) == 40
+
+
+def test_add_data_collect_errors(fake_client):
+    fake_client.fail_writes = True
+    summary = fake_client.time_series.add_data("abc", *new_data(25), batch_size=10, on_error="collect")
+    assert [_["written"] for _ in summary] == [0, 0, 0]
+    assert all(_["error"] is not None for _ in summary)
+
+
+def test_add_data_unequal_lengths(fake_client):
+    time, value, status = new_data(3)
+    with pytest.raises(ValueError):
+        fake_client.time_series.add_data("abc", time, value, status[:2])
+
+
+def test_pack():
+    time, value, status = new_data(7)
+    items = [("a", time[:3], value[:3], status[:3]), ("b", time, value, status)]
+    batches = _pack(items, 4)
+    assert [sum(len(_[1]) for _ in batch) for batch in batches] == [4, 4, 2]
+    assert [[_[0] for _ in batch] for batch in batches] == [["a", "b"], ["b"], ["b"]]
+
+
+def test_add_data_on_multiple(fake_client):
+    data = {"a": new_data(3), "b": new_data(7), "c": new_data(0)}
+    summary = fake_client.time_series.add_data_on_multiple(data, batch_size=4)
+    assert sum(_["written"] for _ in summary) == 10
+    assert len(fake_client.posted) == 3
+    assert all(endpoint == "data" for endpoint, _ in fake_client.posted)
+    first = [body for _, body in fake_client.posted if body["items"][0]["id"] == "a"][0]
+    assert [_["id"] for _ in first["items"]] == ["a", "b"]
+
+
+def test_add_data_on_multiple_dataframe(fake_client):
+    time, _, _ = new_data(3)
+    df = pd.DataFrame({"a": [1., np.nan, 3.], "b": [4., 5., 6.]}, index=pd.DatetimeIndex(time))
+    summary = fake_client.time_series.add_data_on_multiple(df, status=192)
+    assert summary[0]["points"] == 5
+    items = fake_client.posted[0][1]["items"]
+    assert [len(_["datapoints"]) for _ in items] == [2, 3]
+    assert items[0]["datapoints"][1] == dict(time="2020-01-01T00:00:02.000000Z", value=3., status=192)
+
+
+def test_add_data_numpy(fake_client):
+    t = np.array(["2020-01-01T00:00", "2020-01-01T01:00", "2020-01-01T02:00"], dtype="datetime64[ns]")
+    fake_client.time_series.add_data("abc", t, np.array([1., np.nan, 3.]), np.array([0, 1, 2]))
+    dps = fake_client.posted[0][1]["datapoints"]
+    assert [_["value"] for _ in dps] == [1., 3.]
+    assert [_["status"] for _ in dps] == [0, 2]
+
+
+def test_add_data_pandas(fake_client):
+    index = pd.date_range("2020-01-01 01:00", periods=3, freq="h", tz="Europe/Oslo")
+    fake_client.time_series.add_data("abc", pd.Series([1., 2., None], index=index))
+    fake_client.time_series.add_data("abc", pd.DataFrame(dict(value=[4., 5., 6.], status=[1, 1, 1]), index=index))
+    fake_client.time_series.add_data("abc", index.to_series(), pd.Series([7., 8., 9.]), 2)
+    first, second, third = [body["datapoints"] for _, body in fake_client.posted]
+    assert first == [dict(time="2020-01-01T00:00:00.000000Z", value=1., status=0),
+                     dict(time="2020-01-01T01:00:00.000000Z", value=2., status=0)]
+    assert [_["status"] for _ in second] == [1, 1, 1]
+    assert [_["value"] for _ in third] == [7., 8., 9.]
+    assert third[-1] == dict(time="2020-01-01T02:00:00.000000Z", value=9., status=2)
+
+
+def test_add_data_pandas_column(fake_client):
+    df = pd.DataFrame(dict(time=pd.date_range("2020-01-01 01:00", periods=3, freq="h", tz="Europe/Oslo"),
+                           value=[1., 2., 3.]))
+    fake_client.time_series.add_data("abc", df["time"], df["value"], [0, 0, 0])
+    dps = fake_client.posted[0][1]["datapoints"]
+    assert [_["time"] for _ in dps] == ["2020-01-01T00:00:00.000000Z", "2020-01-01T01:00:00.000000Z",
+                                        "2020-01-01T02:00:00.000000Z"]
+
+
+def test_add_data_invalid(fake_client):
+    with pytest.raises(ValueError):
+        fake_client.time_series.add_data("abc", np.array(["NaT"], dtype="datetime64[ns]"), [1.], [0])
+    with pytest.raises(ValueError):
+        fake_client.time_series.add_data("abc", [datetime(2020, 1, 1)])
+
+
+def test_datapoints_update(fake_client):
+    dps = DataPoints(time=np.array(["2020-01-01T00:00"], dtype="datetime64[ns]"), value=[1.], status=[0],
+                     omnia_client=fake_client)
+    with pytest.raises(ValueError):
+        dps.update()
+
+    dps.id = "abc"
+    dps.update()
+    assert fake_client.posted[0] == ("abc/data", dict(datapoints=[dict(time="2020-01-01T00:00:00.000000Z", value=1.,
+                                                                        status=0)]))
@@ -0,0 +1,52 @@
+"""
+Test tracing of requests and responses
+"""
+import json
+import logging
+from omnia_timeseries_sdk import OmniaClient
+from omnia_timeseries_sdk import _trace
+from omnia_timeseries_sdk._pool import Response
+from omnia_timeseries_sdk._trace import redact_headers, summarize_body, trace_request
+
+
+def test_redact_headers():
+    headers = dict(Authorization="Bearer secret", Host="example.com")
+    assert redact_headers(headers) == dict(Authorization="Bearer [redacted]", Host="example.com")
+    assert redact_headers(dict(authorization="secret"))["authorization"] == "[redacted]"
+    assert headers["Authorization"] == "Bearer secret"
+
+
+def test_summarize_body():
+    assert summarize_body(None, 10) is None
+    assert summarize_body(b'{"a": 1}', 10) == '{"a": 1}'
+    assert summarize_body("x" * 100, 10) == "x" * 10 + "... [100 bytes]"
+    assert summarize_body("x" * 100, None) == "x" * 100
+
+
+def test_nothing_formatted_unless_enabled(caplog, monkeypatch):
+    def fail(*args):
+        raise AssertionError("formatted although tracing is disabled")
+
+    monkeypatch.setattr(_trace, "summarize_body", fail)
+    monkeypatch.setattr(_trace, "redact_headers", fail)
+    with caplog.at_level(logging.INFO):
+        trace_request("post", "/plant/timeseries", dict(Authorization="Bearer secret"), "{}", 10)
+    assert caplog.records == []
+
+
+def test_client_traces(caplog, monkeypatch):
+    client = OmniaClient()
+    body = json.dumps(dict(data=dict(items=[dict(id="a")]))).encode()
+    monkeypatch.setattr(client.token_manager, "get_token", lambda: "secret")
+    monkeypatch.setattr(client._pool, "request", lambda *args, **kwargs: Response(200, "OK", dict(), body))
+    monkeypatch.setattr(client.config, "trace_body_length", 20)
+
+    with caplog.at_level(logging.DEBUG):
+        client.post("timeseries", "v1.5", "a/data", body=dict(datapoints=[dict(value=float(i)) for i in range(1000)]))
+
+    traces = [_.trace for _ in caplog.records if hasattr(_, "trace")]
+    assert [_["kind"] for _ in traces] == ["request", "response"]
+    assert traces[0]["headers"]["Authorization"] == "Bearer [redacted]"
+    assert traces[0]["body"].endswith("bytes]") and len(traces[0]["body"]) < 50
+    assert traces[1]["status"] == 200
+    assert "secret" not in caplog.text
@@ -1,7 +1,13 @@
 """
 Test utility functions
 """
-from omnia_timeseries_sdk._utils import from_datetime_string, to_omnia_datetime_string, to_camel_case, to_snake_case
+import json
+import numpy as np
+import pytest
+from datetime import datetime, timezone
+from omnia_timeseries_sdk._utils import from_datetime_string, to_omnia_datetime_string, to_camel_case, to_snake_case, \
+    from_datetime_strings, decode_items, extend_items, encode_datapoints, to_datetime64_array, to_value_array, \
+    to_status_array
 
 
 def test_snake_dict(data):
@@ -36,4 +42,60 @@ def test_datetime_strings():
     s = "2008-09-03T20:56:35.450686Z"
     assert s == to_omnia_datetime_string(from_datetime_string("2008-09-03T20:56:35.450686Z"))
     assert s == to_omnia_datetime_string(from_datetime_string("2008-09-03T20:56:35.450686+00:00"))
+    assert s == to_omnia_datetime_string(from_datetime_string("2008-09-03T10:26:35.4506861-10:30"))
+    assert s == to_omnia_datetime_string(from_datetime_string("2008-09-03T20:56:35.450686"))
+    assert to_omnia_datetime_string(from_datetime_string("2008-09-03")) == "2008-09-03T00:00:00.000000Z"
 
+
+def test_datetime_strings_vectorized():
+    s = ["2008-09-03T20:56:35.450686Z", "2008-09-03T20:56:35.4506861+00:00", "2008-09-03T22:56:35.450686+02:00",
+         "2008-09-03T10:26:35.450686-10:30", "2008-09-03T20:56:35"]
+    t = from_datetime_strings(s)
+    assert t.dtype == np.dtype("datetime64[ns]")
+    assert t[0] == np.datetime64("2008-09-03T20:56:35.450686")
+    assert t[1] == np.datetime64("2008-09-03T20:56:35.4506861")
+    assert t[2] == t[0]
+    assert t[3] == t[0]
+    assert t[4] == np.datetime64("2008-09-03T20:56:35")
+
+
+def test_datetime_strings_vectorized_matches_scalar():
+    s = ["2008-09-03T20:56:35.450686Z", "2020-01-01T00:00:00.000001+05:30"]
+    expected = [from_datetime_string(_).astimezone(timezone.utc).replace(tzinfo=None) for _ in s]
+    assert from_datetime_strings(s).astype("datetime64[us]").tolist() == expected
+
+
+def test_datetime_strings_vectorized_empty():
+    assert len(from_datetime_strings([])) == 0
+
+
+def test_decode_items():
+    items = [dict(id="a", name="x", unitOfMeasure="m", datapoints=[dict(time="t0", value=1., status=0),
+                                                                   dict(time="t1", value=2., status=1)])]
+    d = decode_items(items)[0]
+    assert d["unit_of_measure"] == "m"
+    assert d["datapoints"] == dict(time=["t0", "t1"], value=[1., 2.], status=[0, 1])
+
+
+def test_decode_items_without_datapoints(data):
+    assert decode_items([data]) == [to_snake_case(data)]
+
+
+def test_extend_items():
+    results = decode_items([dict(id="a", datapoints=[dict(time="t0", value=1., status=0)])])
+    extend_items(results, decode_items([dict(id="a", datapoints=[dict(time="t1", value=2., status=0)])]))
+    assert len(results) == 1
+    assert results[0]["datapoints"]["time"] == ["t0", "t1"]
+
+
+def test_encode_datapoints():
+    """Assert that datapoints are encoded like json.dumps of a list of dicts."""
+    t = [datetime(2020, 1, 1, 12, 30, 15, 123456, tzinfo=timezone.utc), datetime(2020, 1, 2)]
+    for values, status in (([1.5, 2.], [0, 192]), (["a", 'b"c'], [0, None]), ([float("nan"), 1e-300], [1, 2])):
+        s = encode_datapoints(to_datetime64_array(t), to_value_array(values), to_status_array(status))
+        expected = json.dumps([dict(time=to_omnia_datetime_string(a), value=b, status=c)
+                               for a, b, c in zip(t, values, status)])
+        assert s == expected
+
+    with pytest.raises(ValueError):
+        encode_datapoints(np.array(["NaT"], dtype="datetime64[ns]"), np.ones(1), np.zeros(1, dtype=int))
@@ -0,0 +1,79 @@
+"""
+Test BufferedWriter class
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+from omnia_timeseries_sdk.exceptions import OmniaBufferFullError
+from omnia_timeseries_sdk.writer import BufferedWriter
+
+T0 = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def written(client):
+    return sum(len(item["datapoints"]) for _, body in client.posted for item in body["items"])
+
+
+def test_flush_on_exit(fake_client):
+    with BufferedWriter(fake_client, flush_size=100, flush_interval=60.) as writer:
+        for i in range(10):
+            writer.append("a", T0 + timedelta(seconds=i), float(i))
+        assert len(writer) == 10
+    assert written(fake_client) == 10
+    assert writer.stats["points_written"] == 10
+    assert writer.stats["queue_depth"] == 0
+
+
+def test_flush_on_size(fake_client):
+    with BufferedWriter(fake_client, flush_size=5, flush_interval=60.) as writer:
+        writer.extend("a", [T0 + timedelta(seconds=i) for i in range(5)], [1.] * 5, [0] * 5)
+        for _ in range(100):
+            if fake_client.posted:
+                break
+            time.sleep(0.01)
+        assert written(fake_client) == 5
+
+
+def test_flush_on_interval(fake_client):
+    with BufferedWriter(fake_client, flush_size=100, flush_interval=0.05) as writer:
+        writer.append("a", T0, 1.)
+        time.sleep(0.3)
+        assert written(fake_client) == 1
+        assert writer.stats["flushes"] >= 1
+        assert len(writer.stats["flush_latency"]) == 3
+
+
+def test_many_threads(fake_client):
+    with BufferedWriter(fake_client, flush_size=50, flush_interval=60.) as writer:
+        def produce(id):
+            for i in range(100):
+                writer.append(id, T0 + timedelta(seconds=i), float(i))
+
+        threads = [threading.Thread(target=produce, args=(str(i),)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    assert written(fake_client) == 400
+
+
+def test_backpressure(fake_client):
+    writer = BufferedWriter(fake_client, flush_size=2, flush_interval=60., max_buffer=2)
+    writer._flush_lock.acquire()    # hold up the background flush
+    try:
+        writer.extend("a", [T0, T0 + timedelta(seconds=1)], [1., 2.], [0, 0])
+        with pytest.raises(OmniaBufferFullError):
+            writer.append("a", T0 + timedelta(seconds=2), 3., timeout=0.05)
+    finally:
+        writer._flush_lock.release()
+    writer.close()
+    assert written(fake_client) == 2
+
+
+def test_failed_flush(fake_client):
+    fake_client.fail_writes = True
+    with BufferedWriter(fake_client, flush_size=100, flush_interval=60.) as writer:
+        writer.append("a", T0, 1.)
+    assert writer.stats["points_failed"] == 1
+    assert writer.stats["errors"] == 1